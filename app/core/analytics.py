@@ -0,0 +1,117 @@
+"""
+Agregados de vendas para os relatórios administrativos.
+
+`DailySales` (receita por dia) e `BookSales` (unidades e receita por livro)
+são atualizados de forma incremental por `record_sale`, na mesma transação
+em que o pagamento marca o pedido como pago: um upsert por tabela com os
+itens daquele pedido. Os relatórios (`/api/v1/reports`) leem só esses
+agregados, então o custo não cresce com o histórico de pedidos.
+
+O comando abaixo reconstrói os agregados a partir de `Order`/`OrderItem`
+(após uma importação, uma correção manual ou ao ligar o recurso em um banco
+com histórico), em uma única transação:
+
+    python -m app.core.analytics --rebuild
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.database import dialect_name
+from app.models import BookSales, DailySales, Order, OrderItem
+
+# Status que contam como venda (o pedido passou por `pay_order`)
+SOLD_STATUSES = ("paid", "shipped")
+
+
+def _upsert(session: AsyncSession, model, key: str, rows: List[Dict]):
+    """INSERT ... ON CONFLICT (key) DO UPDATE somando as colunas de contagem."""
+    insert = postgresql.insert if dialect_name(session) == "postgresql" else sqlite.insert
+    statement = insert(model).values(rows)
+    table = model.__table__
+    return statement.on_conflict_do_update(
+        index_elements=[key],
+        set_={
+            column: table.c[column] + statement.excluded[column]
+            for column in ("orders", "units", "revenue")
+        },
+    )
+
+
+async def record_sale(session: AsyncSession, order_id: int, paid_at: datetime) -> None:
+    """Soma os itens do pedido aos agregados, na transação da sessão (sem commit)."""
+    items: List[Tuple[int, int, float]] = (await session.exec(
+        select(OrderItem.book_id, OrderItem.quantity, OrderItem.item_price)
+        .where(OrderItem.order_id == order_id)
+    )).all()
+    if not items:
+        return
+
+    await session.exec(_upsert(session, DailySales, "day", [{
+        "day": paid_at.date(),
+        "orders": 1,
+        "units": sum(quantity for _, quantity, _ in items),
+        "revenue": sum(quantity * price for _, quantity, price in items),
+    }]))
+    await session.exec(_upsert(session, BookSales, "book_id", [
+        {"book_id": book_id, "orders": 1, "units": quantity, "revenue": quantity * price}
+        for book_id, quantity, price in items
+    ]))
+
+
+async def rebuild(session: AsyncSession) -> Dict[str, int]:
+    """Recalcula os agregados a partir do histórico de pedidos (sem commit)."""
+    await session.exec(delete(DailySales))
+    await session.exec(delete(BookSales))
+
+    sold = Order.status.in_(SOLD_STATUSES)
+    line_revenue = OrderItem.quantity * OrderItem.item_price
+    day = func.date(func.coalesce(Order.paid_at, Order.created_at))
+
+    await session.exec(
+        DailySales.__table__.insert().from_select(
+            ["day", "orders", "units", "revenue"],
+            select(day, func.count(func.distinct(Order.id)), func.sum(OrderItem.quantity), func.sum(line_revenue))
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .where(sold)
+            .group_by(day),
+        )
+    )
+    await session.exec(
+        BookSales.__table__.insert().from_select(
+            ["book_id", "orders", "units", "revenue"],
+            select(OrderItem.book_id, func.count(OrderItem.order_id), func.sum(OrderItem.quantity), func.sum(line_revenue))
+            .join(Order, Order.id == OrderItem.order_id)
+            .where(sold)
+            .group_by(OrderItem.book_id),
+        )
+    )
+    days = (await session.exec(select(func.count()).select_from(DailySales))).one()
+    books = (await session.exec(select(func.count()).select_from(BookSales))).one()
+    return {"days": days, "books": books}
+
+
+async def _rebuild_cli() -> Dict[str, int]:
+    from app.core.database import async_engine
+    async with AsyncSession(async_engine) as session:
+        counts = await rebuild(session)
+        await session.commit()
+    await async_engine.dispose()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agregados de vendas dos relatórios")
+    parser.add_argument("--rebuild", action="store_true", help="recalcula tudo a partir dos pedidos")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.error("nada a fazer (use --rebuild)")
+
+    counts = asyncio.run(_rebuild_cli())
+    print(f"Agregados reconstruídos: {counts['days']} dia(s), {counts['books']} livro(s)")
@@ -0,0 +1,230 @@
+"""
+Assets estáticos do frontend: fingerprint, pré-compressão e cache longo.
+
+Sem etapa de build separada: `build_assets` lê `frontend/`, dá a cada arquivo
+um nome com o hash do conteúdo (`app.3f2a9c1b7e4d.js`), reescreve as
+referências `/static/...` do `index.html` para esses nomes e pré-comprime
+tudo em gzip (e brotli, se o pacote `brotli` estiver instalado). A API faz
+isso uma vez, em memória, na inicialização; o mesmo resultado pode ser
+gravado em disco para um proxy ou CDN servir:
+
+    python -m app.core.assets --output build/static
+
+`StaticAssets` serve o resultado em `/static`:
+
+- nomes com hash: `Cache-Control: public, max-age=31536000, immutable`
+  (um conteúdo novo ganha outro nome, então o navegador nunca revalida);
+- nomes originais e `index.html`: `no-cache`, revalidados pelo ETag;
+- ETag forte por conteúdo e codificação, com `304` em `If-None-Match`;
+- a codificação sai do `Accept-Encoding` (br > gzip > identidade), com
+  `Vary: Accept-Encoding`.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependência opcional
+    brotli = None
+
+INDEX = "index.html"
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Preferência quando o cliente aceita mais de uma codificação
+ENCODINGS = ("br", "gzip")
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+@dataclass
+class Asset:
+    content_type: str
+    digest: str  # hash do conteúdo original
+    cache_control: str
+    variants: Dict[str, bytes] = field(default_factory=dict)  # codificação -> corpo
+
+    def etag(self, encoding: str) -> str:
+        # ETags fortes precisam diferir entre representações (gzip, br)
+        return f'"{self.digest}"' if encoding == "identity" else f'"{self.digest}-{encoding}"'
+
+
+@dataclass
+class AssetBundle:
+    assets: Dict[str, Asset]  # caminho servido -> asset
+    manifest: Dict[str, str]  # nome original -> nome com hash
+
+
+def _compress(data: bytes) -> Dict[str, bytes]:
+    """Variantes comprimidas que ficam menores que o original."""
+    variants = {"identity": data}
+    # mtime=0: a mesma entrada gera os mesmos bytes (builds reprodutíveis)
+    candidates = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        candidates["br"] = brotli.compress(data, quality=11)
+    for encoding, body in candidates.items():
+        if len(body) < len(data):
+            variants[encoding] = body
+    return variants
+
+
+def _content_type(name: str) -> str:
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+def _fingerprinted(name: str, digest: str) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{digest[:12]}{ext}"
+
+
+def build_assets(directory: str) -> AssetBundle:
+    """Lê `directory`, aplica fingerprint e compressão e reescreve o `index.html`."""
+    assets: Dict[str, Asset] = {}
+    manifest: Dict[str, str] = {}
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, directory).replace(os.sep, "/")
+            if name == INDEX:
+                continue
+            with open(path, "rb") as fp:
+                data = fp.read()
+            digest = hashlib.sha256(data).hexdigest()
+            variants = _compress(data)
+            content_type = _content_type(name)
+            manifest[name] = _fingerprinted(name, digest)
+            assets[manifest[name]] = Asset(content_type, digest, IMMUTABLE, variants)
+            # Nome original continua válido (links antigos), sem cache longo
+            assets[name] = Asset(content_type, digest, REVALIDATE, variants)
+
+    index_path = os.path.join(directory, INDEX)
+    if os.path.exists(index_path):
+        with open(index_path, encoding="utf-8") as fp:
+            html = fp.read()
+        # Nomes mais longos primeiro: "app.js" não pode casar dentro de "vendor/app.js"
+        for name in sorted(manifest, key=len, reverse=True):
+            html = html.replace(f'"/static/{name}"', f'"/static/{manifest[name]}"')
+        data = html.encode("utf-8")
+        assets[INDEX] = Asset(
+            _content_type(INDEX), hashlib.sha256(data).hexdigest(), REVALIDATE, _compress(data)
+        )
+    return AssetBundle(assets, manifest)
+
+
+def write_assets(bundle: AssetBundle, output: str) -> int:
+    """Grava os arquivos com hash, suas variantes (.gz/.br), o index e o manifest. Retorna quantos."""
+    written = 0
+    for name in list(bundle.manifest.values()) + ([INDEX] if INDEX in bundle.assets else []):
+        asset = bundle.assets[name]
+        for encoding, body in asset.variants.items():
+            path = os.path.join(output, name + SUFFIXES.get(encoding, ""))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as fp:
+                fp.write(body)
+            written += 1
+    with open(os.path.join(output, "manifest.json"), "w", encoding="utf-8") as fp:
+        json.dump(bundle.manifest, fp, indent=2, sort_keys=True)
+    return written
+
+
+def negotiate(accept_encoding: str, available) -> str:
+    """Melhor codificação disponível aceita pelo cliente (respeita `q=0`)."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if token:
+            accepted[token.strip().lower()] = quality
+    for encoding in ENCODINGS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if encoding in available and quality > 0:
+            return encoding
+    return "identity"
+
+
+class StaticAssets:
+    """App ASGI que serve o `AssetBundle` (construído na primeira chamada de `load`)."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._bundle: Optional[AssetBundle] = None
+        self._lock = Lock()
+
+    def load(self) -> AssetBundle:
+        with self._lock:
+            if self._bundle is None:
+                self._bundle = build_assets(self.directory)
+            return self._bundle
+
+    def response(self, name: str, headers: Headers) -> Response:
+        asset = self.load().assets.get(name)
+        if asset is None:
+            return Response("Not Found", status_code=404, media_type="text/plain")
+
+        encoding = negotiate(headers.get("accept-encoding", ""), asset.variants)
+        response_headers = {
+            "ETag": asset.etag(encoding),
+            "Cache-Control": asset.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = headers.get("if-none-match", "")
+        if asset.etag(encoding) in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=response_headers)
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+        return Response(asset.variants[encoding], headers=response_headers, media_type=asset.content_type)
+
+    async def __call__(self, scope, receive, send):
+        if scope["method"] not in ("GET", "HEAD"):
+            response = Response("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+        else:
+            path = scope["path"]
+            root_path = scope.get("root_path", "")
+            if root_path and path.startswith(root_path):
+                path = path[len(root_path):]
+            response = self.response(path.lstrip("/"), Headers(scope=scope))
+        await response(scope, receive, send)
+
+
+static_assets = StaticAssets(settings.STATIC_DIR)
+
+
+class ApiGZipMiddleware(GZipMiddleware):
+    """GZip das respostas da API; o frontend já sai pré-comprimido e negocia sozinho."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and (scope["path"] == "/" or scope["path"].startswith("/static/")):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera os assets do frontend com hash e pré-comprimidos")
+    parser.add_argument("--source", default=settings.STATIC_DIR)
+    parser.add_argument("--output", required=True, help="diretório de saída")
+    args = parser.parse_args()
+
+    bundle = build_assets(args.source)
+    count = write_assets(bundle, args.output)
+    print(f"{count} arquivo(s) gravado(s) em {args.output} (brotli: {'sim' if brotli else 'não instalado'})")
@@ -0,0 +1,190 @@
+"""
+Importação em massa do catálogo a partir de um corpo NDJSON ou CSV.
+
+O corpo é lido em streaming: cada linha é validada assim que chega e as
+linhas válidas são acumuladas em lotes de `BULK_IMPORT_BATCH_SIZE`. Cada lote
+vira um INSERT e um UPDATE em `executemany`, em uma transação própria, então
+a memória usada depende do tamanho do lote e não do arquivo. O relatório de
+erros guarda no máximo `BULK_IMPORT_MAX_ERRORS` linhas.
+
+A chave natural do upsert é (título, autor): o modelo não tem ISBN. Ela não
+é única no banco, porque `POST /books/` e a importação com `upsert=false`
+podem criar livros repetidos (ex.: edições diferentes). Por isso o upsert é
+de melhor esforço: havendo mais de um livro com a mesma chave, só o de menor
+id é atualizado, e duas importações simultâneas com o mesmo livro novo podem
+inseri-lo duas vezes (sem índice único não há ON CONFLICT).
+"""
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.catalog import invalidate_books
+from app.core.config import settings
+from app.core.typeahead import load_index, typeahead_index
+from app.models import Book, BookCreate, BulkImportError, BulkImportResult
+
+FORMATS = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+    "application/csv": "csv",
+}
+
+BookKey = Tuple[str, str]
+
+
+def detect_format(content_type: Optional[str]) -> Optional[str]:
+    """Formato (ndjson/csv) a partir do Content-Type da requisição."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return FORMATS.get(media_type)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Quebra um fluxo de bytes em linhas de texto sem carregar o corpo inteiro."""
+    buffer = b""
+    first = True
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if first:
+                line = line.removeprefix(b"\xef\xbb\xbf")  # BOM do Excel
+                first = False
+            yield line.rstrip(b"\r").decode("utf-8", errors="replace")
+    if buffer:
+        if first:
+            buffer = buffer.removeprefix(b"\xef\xbb\xbf")
+        yield buffer.rstrip(b"\r").decode("utf-8", errors="replace")
+
+
+async def iter_records(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Gera (número da linha de dados, registro). Um registro que não pôde ser
+    decodificado vem como a exceção, para entrar no relatório.
+    """
+    row = 0
+    if fmt == "ndjson":
+        async for line in lines:
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                yield row, json.loads(line)
+            except ValueError as exc:
+                yield row, exc
+        return
+
+    header: Optional[List[str]] = None
+    pending = ""
+    async for line in lines:
+        # Campo entre aspas com quebra de linha: junta até as aspas fecharem
+        pending = f"{pending}\n{line}" if pending else line
+        if pending.count('"') % 2:
+            continue
+        record, pending = pending, ""
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield row, ValueError(f"esperadas {len(header)} colunas, recebidas {len(values)}")
+            continue
+        # Célula vazia = campo ausente (usa o padrão do modelo)
+        yield row, {name: value for name, value in zip(header, values) if value != ""}
+    if pending:
+        yield row + 1, ValueError("aspas não fechadas no fim do arquivo")
+
+
+class BookImporter:
+    """Acumula linhas válidas e grava o catálogo em lotes."""
+
+    def __init__(self, session: AsyncSession, upsert: bool = True,
+                 batch_size: Optional[int] = None, max_errors: Optional[int] = None):
+        self.session = session
+        self.upsert = upsert
+        self.batch_size = batch_size or settings.BULK_IMPORT_BATCH_SIZE
+        self.max_errors = settings.BULK_IMPORT_MAX_ERRORS if max_errors is None else max_errors
+        self.result = BulkImportResult()
+        self._batch: Dict[Any, Dict[str, Any]] = {}
+
+    def _error(self, row: int, detail: str) -> None:
+        self.result.failed += 1
+        if len(self.result.errors) < self.max_errors:
+            self.result.errors.append(BulkImportError(row=row, detail=detail))
+        else:
+            self.result.errors_truncated = True
+
+    async def add(self, row: int, record: Any) -> None:
+        self.result.received += 1
+        if isinstance(record, Exception):
+            self._error(row, f"Linha inválida: {record}")
+            return
+        if not isinstance(record, dict):
+            self._error(row, "Linha inválida: esperado um objeto")
+            return
+        try:
+            book = BookCreate.model_validate(record)
+        except ValidationError as exc:
+            detail = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                for error in exc.errors()
+            )
+            self._error(row, detail)
+            return
+        values = book.model_dump()
+        # No upsert, linhas repetidas no mesmo lote: vale a última
+        key = (values["title"], values["author"]) if self.upsert else row
+        self._batch[key] = values
+        if len(self._batch) >= self.batch_size:
+            await self.flush()
+
+    async def _existing_ids(self, keys: List[BookKey]) -> Dict[BookKey, int]:
+        titles = {title for title, _ in keys}
+        rows = await self.session.exec(
+            select(Book.id, Book.title, Book.author)
+            .where(Book.title.in_(titles))
+            .order_by(Book.id)
+        )
+        wanted = set(keys)
+        existing: Dict[BookKey, int] = {}
+        for book_id, title, author in rows:
+            if (title, author) in wanted:
+                existing.setdefault((title, author), book_id)
+        return existing
+
+    async def flush(self) -> None:
+        """Grava o lote atual em uma transação: INSERT e UPDATE em executemany."""
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, {}
+        existing = await self._existing_ids(list(batch)) if self.upsert else {}
+        to_insert = [values for key, values in batch.items() if key not in existing]
+        to_update = [{"id": existing[key], **values} for key, values in batch.items() if key in existing]
+
+        if to_insert:
+            await self.session.exec(insert(Book), params=to_insert)
+        if to_update:
+            await self.session.exec(update(Book), params=to_update)
+        await self.session.commit()
+
+        self.result.inserted += len(to_insert)
+        self.result.updated += len(to_update)
+        invalidate_books(*(values["id"] for values in to_update))
+
+    async def run(self, records: AsyncIterator[Tuple[int, Any]]) -> BulkImportResult:
+        async for row, record in records:
+            await self.add(row, record)
+        await self.flush()
+        if typeahead_index.loaded and (self.result.inserted or self.result.updated):
+            # Ids dos livros inseridos em executemany não voltam: remonta o índice uma vez
+            await load_index(self.session)
+        return self.result
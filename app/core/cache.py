@@ -0,0 +1,163 @@
+"""
+Cache em processo (LRU com TTL e limite de tamanho).
+
+`CacheBackend` define a interface usada pelas rotas; `LRUCache` é a
+implementação local. Outro backend (ex.: Redis) pode ser plugado implementando
+a mesma interface. Todo cache criado fica registrado para expor estatísticas
+e para ser limpo de uma vez (útil nos testes).
+"""
+import time
+from collections import OrderedDict
+from threading import RLock
+from typing import Any, Dict, Hashable, Iterable, Optional, Set
+
+MISS = object()
+
+_registry: Dict[str, "CacheBackend"] = {}
+
+
+class CacheBackend:
+    """Interface mínima de um cache com invalidação por tags."""
+
+    name: str
+
+    def get(self, key: Hashable) -> Any:
+        """Retorna o valor ou `MISS`."""
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), generation: Optional[int] = None) -> None:
+        """
+        Armazena `value`. Se `generation` for informado e alguma invalidação
+        ocorreu desde então, o valor (possivelmente obsoleto) é descartado.
+        """
+        raise NotImplementedError
+
+    def generation(self) -> int:
+        """Contador incrementado a cada invalidação."""
+        raise NotImplementedError
+
+    def invalidate(self, *keys: Hashable) -> None:
+        raise NotImplementedError
+
+    def invalidate_tags(self, *tags: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class LRUCache(CacheBackend):
+    """LRU thread-safe com expiração por TTL e índice reverso de tags."""
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[str, Set[Hashable]] = {}
+        self._lock = RLock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISS
+            value, expires_at, _ = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return MISS
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), generation: Optional[int] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if key in self._data:
+                self._remove(key)
+            tags = tuple(tags)
+            self._data[key] = (value, time.monotonic() + self.ttl, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def generation(self) -> int:
+        return self._generation
+
+    def invalidate(self, *keys: Hashable) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if key in self._data:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def invalidate_tags(self, *tags: str) -> None:
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+def register_cache(cache: CacheBackend) -> CacheBackend:
+    """Registra o cache para estatísticas e limpeza global."""
+    _registry[cache.name] = cache
+    return cache
+
+
+def get_caches() -> Dict[str, CacheBackend]:
+    return dict(_registry)
+
+
+def clear_caches() -> None:
+    """Esvazia todos os caches registrados."""
+    for cache in _registry.values():
+        cache.clear()
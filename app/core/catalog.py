@@ -0,0 +1,239 @@
+"""
+Cache de leitura do catálogo e regras de invalidação.
+
+Entradas de livro individual recebem a tag `book:<id>`; listagens recebem a
+tag de listagem mais a tag de cada livro que contêm. Assim:
+
+- criar/editar/remover livro invalida todas as listagens (a ordenação ou o
+  filtro podem mudar) e o livro em questão;
+- baixa de estoque invalida apenas o livro e as listagens que o contêm.
+
+`CatalogVersion` guarda um contador no banco, incrementado na mesma
+transação de qualquer escrita em `Book` que não seja só de estoque (ORM ou
+`insert/update/delete` em massa), detectada por eventos da sessão. Baixas e
+devoluções de estoque (checkout, varredura) marcam o UPDATE com
+`STOCK_ONLY` e não tocam no contador, então não disputam a linha dele.
+
+Cada entrada do cache guarda a versão com que foi lida e um ETag derivado
+do próprio corpo (`CatalogEntry`). Uma entrada lida antes da versão atual
+é descartada, então outro processo que edita o catálogo invalida o cache
+deste em até `CATALOG_VERSION_TTL_SECONDS` (o tempo que a versão lida do
+banco fica em memória); mudanças de estoque de outros processos aparecem em
+até `CATALOG_CACHE_TTL_SECONDS`. O ETag sempre descreve o corpo enviado, e
+um `304` sobre uma entrada em cache não consulta o banco.
+
+Uma segunda linha (`NAMES_VERSION_ID`) muda só quando títulos ou autores
+podem ter mudado; o índice de sugestões se reconstrói por ela.
+"""
+import hashlib
+import time
+from typing import Any, Hashable, NamedTuple, Optional
+
+from fastapi import Request
+from sqlalchemy import event, inspect, update
+from sqlalchemy.orm import Session as ORMSession
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.cache import MISS, CacheBackend, LRUCache, register_cache
+from app.core.config import settings
+from app.core.database import is_replica, pin_to_primary
+from app.models import Book, CatalogVersion
+
+LIST_TAG = "books:list"
+
+# Chave de `pin_to_primary`: depois de uma escrita no catálogo neste processo,
+# as leituras do catálogo ficam no primário por READ_YOUR_WRITES_SECONDS
+CATALOG_PIN = "catalog"
+
+# Campos do BookRead, na ordem: as leituras em volume buscam só estas colunas,
+# como tuplas, e serializam direto (app.core.fast_json)
+BOOK_COLUMNS = ["id", "title", "author", "description", "price", "stock_quantity"]
+
+_catalog_cache: CacheBackend = register_cache(
+    LRUCache(
+        "catalog",
+        maxsize=settings.CATALOG_CACHE_MAX_ENTRIES if settings.CATALOG_CACHE_ENABLED else 0,
+        ttl=settings.CATALOG_CACHE_TTL_SECONDS,
+    )
+)
+
+
+def get_catalog_cache() -> CacheBackend:
+    return _catalog_cache
+
+
+def set_catalog_cache(backend: CacheBackend) -> None:
+    """Substitui o backend do cache do catálogo (ex.: por um cache compartilhado)."""
+    global _catalog_cache
+    _catalog_cache = register_cache(backend)
+
+
+def book_key(book_id: int) -> Hashable:
+    return ("book", book_id)
+
+
+def book_tag(book_id: int) -> str:
+    return f"book:{book_id}"
+
+
+def list_key(**params: Any) -> Hashable:
+    return ("books",) + tuple(sorted(params.items()))
+
+
+# Momento (monotonic) da última invalidação neste processo
+_last_invalidation = float("-inf")
+
+
+def invalidate_books(*book_ids: int) -> None:
+    """Livros criados, editados ou removidos: listagens e os próprios livros."""
+    global _last_invalidation
+    _last_invalidation = time.monotonic()
+    _catalog_cache.invalidate_tags(LIST_TAG, *(book_tag(book_id) for book_id in book_ids))
+
+
+def invalidate_stock(*book_ids: int) -> None:
+    """Estoque alterado: só as entradas que contêm esses livros."""
+    global _last_invalidation
+    _last_invalidation = time.monotonic()
+    _catalog_cache.invalidate_tags(*(book_tag(book_id) for book_id in book_ids))
+
+
+def may_cache(session: AsyncSession) -> bool:
+    """
+    Se o resultado de uma leitura pode ir para o cache. Uma réplica lida logo
+    após uma invalidação pode ainda não ter a escrita: a resposta sai, mas não
+    fica no cache (onde serviria dados antigos a todos até o TTL).
+    """
+    return not is_replica(session) or time.monotonic() - _last_invalidation > settings.READ_YOUR_WRITES_SECONDS
+
+
+# --- Versão do catálogo (ETag / If-None-Match) ---
+
+# Linhas de CatalogVersion
+CATALOG_VERSION_ID = 1  # qualquer escrita em livros, exceto só de estoque
+NAMES_VERSION_ID = 2  # títulos e autores (índice de sugestões)
+
+# execution_options dos UPDATEs que só mexem em `stock_quantity`
+STOCK_ONLY = {"catalog_stock_only": True}
+_STOCK_FIELDS = {"stock_quantity"}
+_NAME_FIELDS = {"title", "author"}
+
+
+class CatalogEntry(NamedTuple):
+    """Resposta do catálogo em cache: versão da leitura, ETag e corpo JSON pronto."""
+    version: int
+    etag: str
+    body: bytes
+    next_cursor: Optional[str] = None
+
+
+def catalog_entry(version: int, body: bytes, next_cursor: Optional[str] = None) -> CatalogEntry:
+    return CatalogEntry(version, catalog_etag(version, body), body, next_cursor)
+
+# Um único valor; registrado como cache para aparecer em /ops/cache e ser limpo com os demais
+_version_cache: CacheBackend = register_cache(
+    LRUCache("catalog_version", maxsize=1, ttl=settings.CATALOG_VERSION_TTL_SECONDS)
+)
+
+
+async def _read_version(session: AsyncSession, row_id: int) -> int:
+    return (await session.exec(
+        select(CatalogVersion.version).where(CatalogVersion.id == row_id)
+    )).first() or 0
+
+
+async def catalog_version(session: AsyncSession) -> int:
+    """Versão atual do catálogo (em memória por até `CATALOG_VERSION_TTL_SECONDS`)."""
+    version = _version_cache.get("version")
+    if version is MISS:
+        generation = _version_cache.generation()
+        version = await _read_version(session, CATALOG_VERSION_ID)
+        _version_cache.set("version", version, generation=generation)
+    return version
+
+
+async def names_version(session: AsyncSession) -> int:
+    """Versão de títulos e autores (sem cache)."""
+    return await _read_version(session, NAMES_VERSION_ID)
+
+
+def catalog_etag(version: int, body: bytes) -> str:
+    """ETag fraco: versão do catálogo + hash do corpo."""
+    digest = hashlib.sha1(body).hexdigest()[:16]
+    return f'W/"{version}-{digest}"'
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """`If-None-Match` com comparação fraca (ignora o prefixo `W/`)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+
+def _touches_books(session: ORMSession, names: bool) -> None:
+    changed = session.info.setdefault("catalog_changed", set())
+    changed.add(CATALOG_VERSION_ID)
+    if names:
+        changed.add(NAMES_VERSION_ID)
+
+
+@event.listens_for(ORMSession, "do_orm_execute")
+def _on_bulk_statement(state) -> None:
+    if (state.is_insert or state.is_update or state.is_delete) and any(
+        mapper.class_ is Book for mapper in state.all_mappers
+    ):
+        if not state.execution_options.get("catalog_stock_only"):
+            # Em massa não dá para saber quais colunas mudaram: conta como tudo
+            _touches_books(state.session, names=True)
+
+
+@event.listens_for(ORMSession, "after_flush")
+def _on_flush(session: ORMSession, flush_context) -> None:
+    for obj in (*session.new, *session.deleted):
+        if isinstance(obj, Book):
+            _touches_books(session, names=True)
+    for obj in session.dirty:
+        if not isinstance(obj, Book):
+            continue
+        state = inspect(obj)
+        changed = {attr.key for attr in state.mapper.column_attrs if state.attrs[attr.key].history.has_changes()}
+        if changed - _STOCK_FIELDS:
+            _touches_books(session, names=bool(changed & _NAME_FIELDS))
+
+
+@event.listens_for(ORMSession, "before_commit")
+def _bump_version(session: ORMSession) -> None:
+    # Última escrita da transação: a linha do contador fica travada o mínimo possível
+    session.flush()
+    changed = session.info.pop("catalog_changed", None)
+    if not changed:
+        return
+    for row_id in sorted(changed):
+        result = session.execute(
+            update(CatalogVersion)
+            .where(CatalogVersion.id == row_id)
+            .values(version=CatalogVersion.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            session.add(CatalogVersion(id=row_id, version=1))
+            session.flush()
+    session.info["catalog_committed"] = True
+
+
+@event.listens_for(ORMSession, "after_commit")
+def _on_catalog_commit(session: ORMSession) -> None:
+    if session.info.pop("catalog_committed", False):
+        _version_cache.invalidate("version")
+        pin_to_primary(CATALOG_PIN)
+
+
+@event.listens_for(ORMSession, "after_rollback")
+def _on_rollback(session: ORMSession) -> None:
+    session.info.pop("catalog_changed", None)
+    session.info.pop("catalog_committed", None)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "BookMarket API"
@@ -7,12 +7,112 @@ class Settings(BaseSettings):
     
     # Configurações de Banco de Dados
     DATABASE_URL: str = "sqlite:///./bookmarket.db"
+    DB_ECHO: bool = False  # loga cada query SQL (apenas para debug)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0  # espera máxima por uma conexão livre
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # -1 desativa
+    DB_POOL_PRE_PING: bool = True
+    # PRAGMAs aplicados a cada conexão SQLite
+    SQLITE_WAL: bool = True  # journal_mode=WAL + synchronous=NORMAL
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024
+    # Réplicas de leitura (JSON: ["postgresql://...", ...]); vazio = tudo no primário
+    DATABASE_REPLICA_URLS: List[str] = []
+    REPLICA_HEALTH_CHECK_INTERVAL_SECONDS: float = 5.0
+    REPLICA_HEALTH_CHECK_TIMEOUT_SECONDS: float = 2.0
+    # Depois de uma escrita, as leituras do mesmo usuário ficam no primário por esse tempo
+    READ_YOUR_WRITES_SECONDS: float = 10.0
+    # Aplica migrações pendentes na inicialização (em produção, prefira false
+    # e `python -m app.core.migrations` no deploy)
+    MIGRATE_ON_STARTUP: bool = True
     
+    # Frontend (assets com hash e pré-comprimidos, ver app/core/assets.py)
+    STATIC_DIR: str = "frontend"
+    # Compressão gzip das respostas da API (JSON grande, exportações)
+    GZIP_ENABLED: bool = True
+    GZIP_MINIMUM_SIZE: int = 1024  # bytes; respostas menores vão sem compressão
+    GZIP_LEVEL: int = 5
+
+    # Métricas Prometheus em GET /metrics
+    METRICS_ENABLED: bool = True
+
+    # Diagnóstico de queries (desenvolvimento e testes)
+    QUERY_DEBUG_HEADERS: bool = False  # X-Query-Count / X-DB-Time nas respostas
+    SLOW_QUERY_MS: float = 500.0  # loga queries mais lentas (0 desativa)
+    N_PLUS_ONE_THRESHOLD: int = 10  # SELECT repetido N vezes na requisição (0 desativa)
+
     # Configurações de Segurança (JWT)
     # IMPORTANTE: Em produção, gere uma chave segura e mantenha em segredo!
     SECRET_KEY: str = "uma_chave_super_secreta_e_segura_para_desenvolvimento"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Se True, confia nas claims assinadas do token (is_active, is_superuser)
+    # e não consulta o usuário no banco. Mudanças de permissão só valem
+    # quando o token expirar.
+    TRUST_TOKEN_CLAIMS: bool = False
+
+    # Hashing de senhas (bcrypt em pool de processos)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 0  # 0 = número de CPUs
+    PASSWORD_HASH_MAX_PENDING: int = 256
+
+    # Rate limiting (token bucket por IP e por conta)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_TRUST_PROXY: bool = False  # usa o primeiro IP de X-Forwarded-For
+    RATE_LIMIT_MAX_KEYS: int = 100000  # buckets em memória (LRU)
+    RATE_LIMIT_AUTH_IP_PER_MINUTE: float = 30.0  # /auth/token e /auth/register
+    RATE_LIMIT_AUTH_IP_BURST: int = 10
+    RATE_LIMIT_AUTH_ACCOUNT_PER_MINUTE: float = 5.0
+    RATE_LIMIT_AUTH_ACCOUNT_BURST: int = 5
+    RATE_LIMIT_CATALOG_PER_SECOND: float = 20.0  # leituras do catálogo
+    RATE_LIMIT_CATALOG_BURST: int = 100
+    # Recusa login/cadastro com mais que N hashes na fila por processo (0 desativa)
+    AUTH_ADMISSION_QUEUE_PER_WORKER: int = 4
+
+    # Emails (outbox transacional + dispatcher assíncrono)
+    EMAIL_TRANSPORT: str = "stdout"  # "stdout" ou "file:<caminho>"
+    OUTBOX_DISPATCHER_ENABLED: bool = True  # roda o dispatcher junto com a API
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_CONCURRENCY: int = 10
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_BACKOFF_SECONDS: float = 5.0
+    OUTBOX_LEASE_SECONDS: float = 60.0
+
+    # Reserva de estoque de pedidos pendentes
+    ORDER_HOLD_TTL_SECONDS: int = 900  # prazo para pagar antes do estoque voltar
+    HOLD_SWEEPER_ENABLED: bool = True  # roda a varredura junto com a API
+    HOLD_SWEEP_BATCH_SIZE: int = 500
+    HOLD_SWEEP_INTERVAL_SECONDS: float = 30.0
+
+    # Idempotency-Key em POST /orders/ e POST /orders/{id}/pay
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 3600  # por quanto tempo a resposta é reenviada
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0  # espera por uma repetição ainda em andamento
+    IDEMPOTENCY_LOCK_SECONDS: float = 60.0  # depois disso, uma execução sem resposta é abandonada
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: float = 3600.0
+    IDEMPOTENCY_PURGE_BATCH_SIZE: int = 1000
+
+    # Cache do usuário autenticado (evita um SELECT por requisição)
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 30.0
+
+    # Cache de leitura do catálogo (LRU em processo)
+    CATALOG_CACHE_ENABLED: bool = True
+    CATALOG_CACHE_MAX_ENTRIES: int = 2048
+    CATALOG_CACHE_TTL_SECONDS: float = 60.0
+    # Por quanto tempo a versão do catálogo (ETag) lida do banco é reaproveitada
+    CATALOG_VERSION_TTL_SECONDS: float = 1.0
+    # Índice de sugestões (GET /books/suggest): reconstruído se o catálogo mudou em outro processo
+    TYPEAHEAD_REFRESH_INTERVAL_SECONDS: float = 60.0
+
+    # Importação em massa de livros (POST /books/bulk)
+    BULK_IMPORT_BATCH_SIZE: int = 1000  # linhas por transação
+    BULK_IMPORT_MAX_ERRORS: int = 1000  # erros listados no relatório
+
+    # Exportação em streaming (GET /books/export, GET /orders/export)
+    EXPORT_BATCH_SIZE: int = 1000  # linhas buscadas do cursor por vez
 
     class Config:
         env_file = ".env"
@@ -1,20 +1,391 @@
-from sqlmodel import SQLModel, create_engine, Session
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from fastapi import Depends
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlmodel import create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.cache import MISS, LRUCache, register_cache
 from app.core.config import settings
 
-# connects_args check_same_thread é necessário apenas para SQLite
-connect_args = {"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+logger = logging.getLogger(__name__)
+
+# Drivers assíncronos por banco. A URL de DATABASE_URL pode usar tanto o
+# driver síncrono (sqlite://, postgresql://) quanto o assíncrono
+# (sqlite+aiosqlite://, postgresql+asyncpg://): as duas engines são derivadas dela.
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+def async_database_url(url: str) -> str:
+    """URL com driver assíncrono (aiosqlite/asyncpg), usada pela API."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Banco sem driver assíncrono suportado: {backend}")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+def sync_database_url(url: str) -> str:
+    """URL com o driver síncrono padrão, usada por scripts, CLI e testes."""
+    parsed = make_url(url)
+    if parsed.get_driver_name() in ASYNC_DRIVERS.values():
+        parsed = parsed.set(drivername=parsed.get_backend_name())
+    return parsed.render_as_string(hide_password=False)
+
+
+# --- Estatísticas do pool ---
+
+class PoolStats:
+    """Contadores de checkout de um pool: quantas esperas, quanto tempo, quantos timeouts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+            }
+
+# Indexado pelo logging_name do pool, que sobrevive a engine.dispose()
+_pool_stats: Dict[str, PoolStats] = {}
+_engines: Dict[str, Any] = {}
+
+class _TimedCheckout:
+    """Mixin de pool que mede o tempo de espera por uma conexão livre."""
+
+    def _do_get(self):
+        stats = _pool_stats.setdefault(self._orig_logging_name or "default", PoolStats())
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        stats.record(time.perf_counter() - start)
+        return connection
+
+class MonitoredQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class MonitoredAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Ocupação atual e histórico de espera dos pools das engines registradas."""
+    report = {}
+    for name, registered in _engines.items():
+        pool = registered.pool
+        entry: Dict[str, Any] = {"pool": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            entry.update(
+                size=pool.size(),
+                max_overflow=pool._max_overflow,
+                in_use=pool.checkedout(),
+                idle=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+            )
+        entry.update(_pool_stats.get(name, PoolStats()).snapshot())
+        report[name] = entry
+    return report
+
+
+# --- Configuração das engines ---
+
+def _is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+def engine_options(url: str, name: str, is_async: bool = False) -> Dict[str, Any]:
+    """Argumentos de create_engine a partir das configurações DB_*."""
+    options: Dict[str, Any] = {"echo": settings.DB_ECHO}
+    if make_url(url).get_backend_name() == "sqlite":
+        # check_same_thread é necessário apenas para SQLite (síncrono)
+        options["connect_args"] = {} if is_async else {"check_same_thread": False}
+    if _is_memory_sqlite(url):
+        # Banco em memória vive em uma única conexão: mantém o pool padrão
+        return options
+    options.update(
+        poolclass=MonitoredAsyncQueuePool if is_async else MonitoredQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_logging_name=name,
+    )
+    return options
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    if settings.SQLITE_WAL:
+        # WAL: leitores não bloqueiam o escritor; NORMAL é seguro em WAL
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    # Valor negativo = tamanho em KiB, independente do page_size
+    cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+    cursor.close()
+
+def apply_sqlite_pragmas(target) -> None:
+    """Aplica os PRAGMAs SQLITE_* a cada nova conexão da engine (síncrona ou assíncrona)."""
+    sync_target: Engine = getattr(target, "sync_engine", target)
+    if sync_target.dialect.name == "sqlite":
+        event.listen(sync_target, "connect", _set_sqlite_pragmas)
+
+def register_engine(name: str, target) -> None:
+    """Registra a engine em `pool_stats` e configura os PRAGMAs do SQLite."""
+    apply_sqlite_pragmas(target)
+    _engines[name] = target
+
+# Engine síncrona: scripts, criação de tabelas e ferramentas de linha de comando
+_sync_url = sync_database_url(settings.DATABASE_URL)
+engine = create_engine(_sync_url, **engine_options(_sync_url, "sync"))
+register_engine("sync", engine)
+
+# Engine assíncrona: atende as rotas sem ocupar uma thread por requisição
+_async_url = async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(_async_url, **engine_options(_async_url, "async", is_async=True))
+register_engine("async", async_engine)
+
+async_session_factory = async_sessionmaker(
+    async_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+async def get_session():
+    """Dependência para obter uma sessão assíncrona do banco de dados."""
+    async with async_session_factory() as session:
+        yield session
+
+
+# --- Réplicas de leitura ---
 
-engine = create_engine(
-    settings.DATABASE_URL, 
-    echo=True, # Loga queries SQL no terminal (bom para debug)
-    connect_args=connect_args
+class ReplicaSet:
+    """
+    Engines das réplicas (`DATABASE_REPLICA_URLS`) em round-robin. Uma
+    réplica que falha no health check ou em uma leitura sai do rodízio até
+    o próximo health check bem-sucedido.
+    """
+
+    def __init__(self, engines: List[AsyncEngine], timeout: float = settings.REPLICA_HEALTH_CHECK_TIMEOUT_SECONDS):
+        self.engines = engines
+        self.timeout = timeout
+        self._healthy = {id(replica): True for replica in engines}
+        self._counter = itertools.count()
+        self.reads = 0
+        self.failures = 0
+
+    def choose(self) -> Optional[AsyncEngine]:
+        """Próxima réplica saudável, ou None (as leituras vão para o primário)."""
+        healthy = [replica for replica in self.engines if self._healthy[id(replica)]]
+        if not healthy:
+            return None
+        self.reads += 1
+        return healthy[next(self._counter) % len(healthy)]
+
+    def mark_down(self, replica: AsyncEngine) -> None:
+        if self._healthy.get(id(replica)):
+            logger.warning("Réplica %s fora do rodízio", replica.url.render_as_string())
+        self._healthy[id(replica)] = False
+        self.failures += 1
+
+    async def _ping(self, replica: AsyncEngine) -> bool:
+        try:
+            async with replica.connect() as connection:
+                await asyncio.wait_for(connection.execute(text("SELECT 1")), self.timeout)
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return False
+
+    async def check_health(self) -> int:
+        """Testa todas as réplicas e atualiza o rodízio. Retorna quantas estão saudáveis."""
+        results = await asyncio.gather(*(self._ping(replica) for replica in self.engines))
+        for replica, ok in zip(self.engines, results):
+            if ok and not self._healthy[id(replica)]:
+                logger.info("Réplica %s de volta ao rodízio", replica.url.render_as_string())
+            if not ok:
+                self.mark_down(replica)
+            self._healthy[id(replica)] = ok
+        return sum(results)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "replicas": [
+                {"url": replica.url.render_as_string(), "healthy": self._healthy[id(replica)]}
+                for replica in self.engines
+            ],
+            "reads": self.reads,
+            "failures": self.failures,
+        }
+
+
+def build_replica_set(urls: List[str]) -> ReplicaSet:
+    engines = []
+    for index, url in enumerate(urls):
+        name = f"replica{index}"
+        async_url = async_database_url(url)
+        replica = create_async_engine(async_url, **engine_options(async_url, name, is_async=True))
+        register_engine(name, replica)
+        engines.append(replica)
+    return ReplicaSet(engines)
+
+replicas = build_replica_set(settings.DATABASE_REPLICA_URLS)
+
+
+class ReplicaMonitor:
+    """Health check periódico das réplicas."""
+
+    def __init__(self, replica_set: ReplicaSet, interval: float = settings.REPLICA_HEALTH_CHECK_INTERVAL_SECONDS):
+        self.replica_set = replica_set
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.replica_set.check_health()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Falha no health check das réplicas")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None and self.replica_set.engines:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def build_replica_monitor() -> ReplicaMonitor:
+    return ReplicaMonitor(replicas)
+
+
+# Ler a própria escrita: chaves (ex.: o usuário que acabou de criar um pedido)
+# cujas leituras ficam no primário por READ_YOUR_WRITES_SECONDS, neste processo
+_primary_pins = register_cache(
+    LRUCache("primary_pins", maxsize=10000, ttl=settings.READ_YOUR_WRITES_SECONDS)
 )
 
-def get_session():
-    """Dependência para obter uma sessão do banco de dados."""
-    with Session(engine) as session:
+def pin_to_primary(key: str) -> None:
+    """Manda as próximas leituras de `key` para o primário (réplicas podem estar atrasadas)."""
+    if replicas.engines:
+        _primary_pins.set(key, True)
+
+def is_pinned(key: str) -> bool:
+    return _primary_pins.get(key) is not MISS
+
+class ReplicaSession(AsyncSession):
+    """
+    Sessão ligada a uma réplica. Se a conexão com a réplica falha em uma
+    consulta, a réplica sai do rodízio e a consulta (e as seguintes) é
+    refeita em `primary`, em vez de virar um 500.
+    """
+
+    def __init__(self, replica: AsyncEngine, primary: AsyncSession):
+        super().__init__(replica, expire_on_commit=False)
+        self.replica = replica
+        self.primary = primary
+        self.info["replica"] = True
+
+    async def _read(self, method: str, *args, **kwargs):
+        if self.info["replica"]:
+            try:
+                return await getattr(super(), method)(*args, **kwargs)
+            except (OperationalError, InterfaceError):
+                logger.warning("Leitura na réplica falhou; refazendo no primário", exc_info=True)
+                replicas.mark_down(self.replica)
+                self.info["replica"] = False
+                try:
+                    await super().rollback()
+                except Exception:
+                    pass
+        return await getattr(self.primary, method)(*args, **kwargs)
+
+    async def exec(self, *args, **kwargs):
+        return await self._read("exec", *args, **kwargs)
+
+    async def execute(self, *args, **kwargs):
+        return await self._read("execute", *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await self._read("get", *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await self._read("scalar", *args, **kwargs)
+
+@asynccontextmanager
+async def routed_read_session(primary: AsyncSession, pin_key: Optional[str] = None):
+    """
+    Sessão de leitura: uma réplica saudável, ou `primary` se não houver
+    réplicas, se todas estiverem fora ou se `pin_key` escreveu há pouco.
+    Consultas que encontram a réplica fora do ar são refeitas no primário
+    (ver `ReplicaSession`).
+    """
+    replica = None if pin_key is not None and is_pinned(pin_key) else replicas.choose()
+    if replica is None:
+        yield primary
+        return
+    async with ReplicaSession(replica, primary) as session:
+        try:
+            yield session
+        except (OperationalError, InterfaceError):
+            # Falha de conexão: sai do rodízio até o próximo health check
+            replicas.mark_down(replica)
+            raise
+
+def is_replica(session) -> bool:
+    """Se a sessão veio de `routed_read_session` e lê de uma réplica (falso depois de um failover)."""
+    return session.info.get("replica", False)
+
+async def get_read_session(primary: AsyncSession = Depends(get_session)):
+    """
+    Dependência para rotas só de leitura que toleram o atraso da réplica
+    e não precisam ler a própria escrita. O primário vem de `get_session`, então substituí-la nos
+    testes também cobre esta dependência.
+    """
+    async with routed_read_session(primary) as session:
         yield session
 
+def dialect_name(session) -> str:
+    """Nome do dialeto (sqlite, postgresql) de uma sessão síncrona ou assíncrona."""
+    return session.get_bind().dialect.name
+
 def create_db_and_tables():
-    """Cria as tabelas no banco de dados com base nos modelos."""
-    SQLModel.metadata.create_all(engine)
+    """Cria ou atualiza o schema aplicando as migrações pendentes (scripts e benchmarks)."""
+    from app.core.migrations import migrate
+    migrate(engine)
@@ -1,11 +1,14 @@
-from typing import Generator, Optional
+from typing import Any, Dict, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
-from sqlmodel import Session
+from sqlalchemy import event
+from sqlalchemy.orm import Session as ORMSession, object_session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import security
+from app.core.cache import MISS, LRUCache, register_cache
 from app.core.config import settings
 from app.core.database import get_session
 from app.models import User
@@ -14,36 +17,104 @@ reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/auth/token"
 )
 
-def get_current_user(
-    session: Session = Depends(get_session),
+# Dados do usuário autenticado por id. O TTL curto limita por quanto tempo
+# outro processo (worker, script) pode ficar com uma permissão desatualizada.
+principal_cache = register_cache(
+    LRUCache(
+        "principals",
+        maxsize=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+        ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    )
+)
+
+_PRINCIPAL_FIELDS = ("id", "email", "full_name", "is_active", "is_superuser")
+
+def principal_claims(user: User) -> Dict[str, Any]:
+    """Claims do usuário embutidas no token de acesso."""
+    return {
+        "email": user.email,
+        "is_active": user.is_active,
+        "is_superuser": user.is_superuser,
+    }
+
+def _principal_from_claims(user_id: int, payload: Dict[str, Any]) -> Optional[User]:
+    """Monta o usuário a partir das claims assinadas, se habilitado."""
+    if not settings.TRUST_TOKEN_CLAIMS:
+        return None
+    if not all(claim in payload for claim in ("email", "is_active", "is_superuser")):
+        return None
+    return User(
+        id=user_id,
+        email=payload["email"],
+        is_active=payload["is_active"],
+        is_superuser=payload["is_superuser"],
+    )
+
+async def _load_principal(session: AsyncSession, user_id: int) -> User:
+    """Busca o usuário no cache e, na falta, no banco."""
+    cached = principal_cache.get(user_id)
+    if cached is MISS:
+        generation = principal_cache.generation()
+        user = await session.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="Usuário não encontrado")
+        cached = {field: getattr(user, field) for field in _PRINCIPAL_FIELDS}
+        principal_cache.set(user_id, cached, generation=generation)
+    # Instância nova (não vinculada à sessão) para não compartilhar estado
+    return User(**cached)
+
+def invalidate_principal(user_id: int) -> None:
+    """Remove o usuário do cache (ex.: após desativar, promover ou rebaixar)."""
+    principal_cache.invalidate(user_id)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _on_user_changed(mapper, connection, target: User) -> None:
+    # Invalida no flush e de novo no commit: uma leitura concorrente entre os
+    # dois ainda veria o valor antigo já commitado.
+    invalidate_principal(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("dirty_principals", set()).add(target.id)
+
+@event.listens_for(ORMSession, "after_commit")
+def _on_commit(session: ORMSession) -> None:
+    for user_id in session.info.pop("dirty_principals", ()):
+        invalidate_principal(user_id)
+
+async def get_current_user(
+    session: AsyncSession = Depends(get_session),
     token: str = Depends(reusable_oauth2)
 ) -> User:
-    """Valida o token JWT e retorna o usuário atual."""
+    """
+    Valida o token JWT e retorna o usuário atual.
+    O usuário vem do cache de principals (ou das claims do token, com
+    `TRUST_TOKEN_CLAIMS`), então a requisição típica não consulta o banco.
+    """
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
         )
         token_data = payload.get("sub")
-        
+
         if token_data is None:
              raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Credenciais não puderam ser validadas",
             )
-    except (JWTError, ValidationError):
+        user_id = int(token_data)
+    except (JWTError, ValidationError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Credenciais não puderam ser validadas",
         )
-        
-    user = session.get(User, int(token_data))
-    if not user:
-        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+
+    user = _principal_from_claims(user_id, payload) or await _load_principal(session, user_id)
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Usuário inativo")
     return user
 
-def get_current_active_superuser(
+async def get_current_active_superuser(
     current_user: User = Depends(get_current_user),
 ) -> User:
     """Verifica se o usuário é um superusuário (admin)."""
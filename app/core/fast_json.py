@@ -0,0 +1,61 @@
+"""
+Serialização JSON rápida para respostas de listagem.
+
+Nas rotas de leitura em volume (`GET /books/`, `GET /orders/`, exportações),
+as linhas vêm do banco como tuplas de colunas (sem objetos ORM nem identity
+map) e viram JSON direto com orjson. A rota devolve um `FastJSONResponse`,
+então o FastAPI não revalida o conteúdo pelo `response_model`: o modelo
+continua declarado só para o schema do OpenAPI, e quem monta as linhas é
+responsável por produzir exatamente os campos dele.
+
+Sem orjson instalado, cai para o `json` da biblioteca padrão (mesma saída,
+mais lento).
+"""
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Sequence
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependência opcional
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    """JSON compacto em UTF-8 (datas em ISO 8601)."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def dumps_lines(values: Iterable[Any]) -> bytes:
+    """Um documento JSON por linha (NDJSON)."""
+    if orjson is not None:
+        return b"".join(orjson.dumps(value, option=orjson.OPT_APPEND_NEWLINE) for value in values)
+    return b"".join(dumps(value) + b"\n" for value in values)
+
+
+def rows_to_dicts(columns: Sequence[str], rows: Iterable[Sequence]) -> List[Dict[str, Any]]:
+    """Tuplas de colunas (na ordem de `columns`) para dicionários."""
+    return [dict(zip(columns, row)) for row in rows]
+
+
+class FastJSONResponse(Response):
+    """
+    Resposta JSON serializada com orjson. Aceita bytes já serializados
+    (ex.: vindos do cache), que vão para o corpo sem reprocessamento.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
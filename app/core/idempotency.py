@@ -0,0 +1,277 @@
+"""
+Idempotency-Key para as rotas de pedidos.
+
+A primeira requisição com uma chave registra a chave (`in_progress`), executa
+a rota e grava a resposta (`done`). Repetições com a mesma chave recebem a
+resposta gravada, com o header `Idempotent-Replayed: true`, sem refazer o
+pedido nem a baixa de estoque. Uma repetição que chega enquanto a original
+ainda executa espera por ela: no mesmo processo, por um future; entre
+processos, consultando a linha da chave.
+
+A resposta de sucesso é gravada pela própria rota (`record_response`), na
+mesma transação do pedido: se o commit acontece, a chave já está `done`, e
+uma falha depois dele não deixa a repetição criar outro pedido. Erros 4xx
+definitivos também são gravados; erros transitórios (409, 429, 503), 5xx e
+exceções inesperadas liberam a chave para que o cliente possa tentar de
+novo. As chaves valem por `IDEMPOTENCY_TTL_SECONDS` e o
+`IdempotencyKeyPurger` apaga as vencidas.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Intervalo de consulta ao banco quando a original roda em outro processo
+_POLL_SECONDS = 0.05
+
+# Execuções em andamento neste processo, por (user_id, chave)
+_inflight: Dict[Tuple[int, str], asyncio.Future] = {}
+
+# Chaves em `session.info`: a chave em execução e a resposta gravada pela rota
+_PENDING_INFO = "idempotency_pending"
+_RESPONSE_INFO = "idempotency_response"
+
+# Erros que o cliente deve repetir (com a mesma chave): não são gravados
+TRANSIENT_STATUSES = {409, 429, 503}
+
+
+def request_fingerprint(method: str, path: str, payload: Any = None) -> str:
+    """Hash da requisição: a mesma chave com outro corpo ou rota é rejeitada."""
+    body = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{method} {path}\n{body}".encode("utf-8")).hexdigest()
+
+
+def _json_response(status_code: int, body: str, replayed: bool = False) -> Response:
+    headers = {REPLAYED_HEADER: "true"} if replayed else None
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+async def _claim(engine, user_id: int, key: str, fingerprint: str) -> Optional[IdempotencyKey]:
+    """
+    Registra a chave. Retorna None se este chamador ficou com ela; senão a
+    linha existente. Chaves vencidas e execuções abandonadas (sem resposta
+    após `IDEMPOTENCY_LOCK_SECONDS`) são descartadas e a chave é registrada de novo.
+    """
+    match = (IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        for _ in range(3):
+            now = datetime.utcnow()
+            session.add(IdempotencyKey(
+                user_id=user_id,
+                key=key,
+                fingerprint=fingerprint,
+                created_at=now,
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS),
+            ))
+            try:
+                await session.commit()
+                return None
+            except IntegrityError:
+                await session.rollback()
+
+            existing = (await session.exec(select(IdempotencyKey).where(*match))).first()
+            if existing is None:
+                continue  # liberada entre o INSERT e o SELECT
+            stale = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+            if existing.expires_at > now and not (existing.status == "in_progress" and existing.created_at <= stale):
+                return existing
+            # Condicional: dois chamadores não descartam a mesma linha duas vezes
+            await session.exec(
+                delete(IdempotencyKey)
+                .where(IdempotencyKey.id == existing.id, IdempotencyKey.created_at == existing.created_at)
+            )
+            await session.commit()
+    raise HTTPException(status_code=409, detail="Não foi possível registrar a Idempotency-Key, tente novamente")
+
+
+async def _store(engine, user_id: int, key: str, status_code: int, body: str) -> None:
+    async with AsyncSession(engine) as session:
+        await session.exec(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            .values(status="done", response_status=status_code, response_body=body)
+        )
+        await session.commit()
+
+
+async def record_response(session: AsyncSession, result: Any) -> None:
+    """
+    Marca a chave em execução como `done` com a resposta de `result`, na
+    transação da sessão (chamar antes do commit da rota). Sem Idempotency-Key, não faz nada.
+    """
+    pending = session.info.get(_PENDING_INFO)
+    if pending is None:
+        return
+    user_id, key, response_model = pending
+    body = response_model.model_validate(result).model_dump_json()
+    await session.exec(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .values(status="done", response_status=200, response_body=body)
+    )
+    session.info[_RESPONSE_INFO] = body
+
+
+async def _release(engine, user_id: int, key: str) -> None:
+    async with AsyncSession(engine) as session:
+        await session.exec(
+            delete(IdempotencyKey)
+            .where(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.key == key,
+                IdempotencyKey.status == "in_progress",
+            )
+        )
+        await session.commit()
+
+
+async def run_idempotent(
+    session: AsyncSession,
+    user_id: int,
+    key: str,
+    fingerprint: str,
+    handler: Callable[[], Awaitable[Any]],
+    response_model: Type[BaseModel],
+) -> Response:
+    """
+    Executa `handler` uma única vez por (usuário, chave) e devolve a resposta
+    serializada com `response_model`; repetições recebem a resposta gravada.
+    O `handler` deve chamar `record_response` antes do seu commit.
+    """
+    engine = session.bind
+    slot = (user_id, key)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.IDEMPOTENCY_WAIT_SECONDS
+
+    while True:
+        existing = await _claim(engine, user_id, key, fingerprint)
+        if existing is None:
+            break
+        if existing.fingerprint != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key já usada com outra requisição"
+            )
+        if existing.status == "done":
+            return _json_response(existing.response_status, existing.response_body, replayed=True)
+
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise HTTPException(
+                status_code=409,
+                detail="Requisição com esta Idempotency-Key ainda em processamento"
+            )
+        inflight = _inflight.get(slot)
+        if inflight is not None and inflight.get_loop() is loop:
+            try:
+                await asyncio.wait_for(asyncio.shield(inflight), remaining)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(min(_POLL_SECONDS, remaining))
+
+    done = loop.create_future()
+    _inflight[slot] = done
+    session.info[_PENDING_INFO] = (user_id, key, response_model)
+    # Depois que o handler retorna, o pedido pode estar gravado: a chave
+    # nunca mais é liberada (na pior hipótese, a repetição recebe 409)
+    keep_key = False
+    try:
+        try:
+            result = await handler()
+        except HTTPException as exc:
+            if exc.status_code >= 500 or exc.status_code in TRANSIENT_STATUSES:
+                raise
+            await _store(engine, user_id, key, exc.status_code, json.dumps({"detail": exc.detail}))
+            keep_key = True
+            raise
+        keep_key = True
+        body = session.info.pop(_RESPONSE_INFO, None)
+        if body is None:
+            # Handler sem `record_response`: grava depois, em outra transação
+            body = response_model.model_validate(result).model_dump_json()
+            await _store(engine, user_id, key, 200, body)
+        return _json_response(200, body)
+    finally:
+        session.info.pop(_PENDING_INFO, None)
+        session.info.pop(_RESPONSE_INFO, None)
+        if not keep_key:
+            await _release(engine, user_id, key)
+        _inflight.pop(slot, None)
+        done.set_result(None)
+
+
+class IdempotencyKeyPurger:
+    """Apaga periodicamente, em lotes, as chaves de idempotência vencidas."""
+
+    def __init__(
+        self,
+        engine,  # AsyncEngine
+        batch_size: int = settings.IDEMPOTENCY_PURGE_BATCH_SIZE,
+        interval: float = settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS,
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def purge_once(self) -> int:
+        """Apaga um lote de chaves vencidas. Retorna quantas foram apagadas."""
+        async with AsyncSession(self.engine) as session:
+            expired = (
+                select(IdempotencyKey.id)
+                .where(IdempotencyKey.expires_at <= datetime.utcnow())
+                .limit(self.batch_size)
+            )
+            result = await session.exec(delete(IdempotencyKey).where(IdempotencyKey.id.in_(expired)))
+            await session.commit()
+        return result.rowcount
+
+    async def run(self) -> None:
+        """Loop contínuo: apaga lotes cheios em sequência e espera quando não há mais vencidas."""
+        while True:
+            try:
+                purged = await self.purge_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Falha ao apagar chaves de idempotência vencidas")
+                purged = 0
+            if purged < self.batch_size:
+                await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def build_purger() -> IdempotencyKeyPurger:
+    from app.core.database import async_engine
+    return IdempotencyKeyPurger(async_engine)
@@ -0,0 +1,191 @@
+"""
+Reserva de estoque para pedidos.
+
+A baixa é feita de forma set-based: uma query carrega todos os livros do
+pedido e um único `UPDATE ... WHERE stock_quantity >= quantidade` desconta
+todas as linhas. Se alguma linha não satisfaz a condição, o número de linhas
+afetadas fica menor que o de livros e a transação é desfeita, então dois
+checkouts concorrentes nunca deixam o estoque negativo.
+
+`Book.stock_quantity` é o estoque disponível: um pedido pendente segura suas
+unidades até `Order.expires_at`. O pagamento converte a reserva em venda
+(nada muda no estoque); se o prazo vence antes, o `HoldSweeper` marca o
+pedido como `expired` e devolve as unidades, em lotes:
+
+    python -m app.core.inventory          # loop contínuo
+    python -m app.core.inventory --once   # varre um lote e sai
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import case, func, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.catalog import STOCK_ONLY, invalidate_stock
+from app.core.config import settings
+from app.core.database import dialect_name
+from app.models import Book, Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+
+def merge_items(items: Iterable) -> Dict[int, int]:
+    """Soma as quantidades de linhas repetidas do mesmo livro."""
+    quantities: Dict[int, int] = {}
+    for item in items:
+        quantities[item.book_id] = quantities.get(item.book_id, 0) + item.quantity
+    return quantities
+
+
+async def reserve_stock(session: AsyncSession, quantities: Dict[int, int]) -> Dict[int, Book]:
+    """
+    Desconta `quantities` ({book_id: quantidade}) do estoque na transação da
+    sessão e retorna os livros por id. Levanta 404/400 sem alterar nada.
+    """
+    book_ids = sorted(quantities)
+    query = select(Book).where(Book.id.in_(book_ids)).order_by(Book.id)
+    if dialect_name(session) == "postgresql":
+        # Trava as linhas em ordem de id: checkouts concorrentes não entram em deadlock
+        query = query.with_for_update()
+    books = {book.id: book for book in await session.exec(query)}
+
+    for book_id in book_ids:
+        if book_id not in books:
+            raise HTTPException(status_code=404, detail=f"Livro {book_id} não encontrado")
+
+    wanted = case(quantities, value=Book.id)
+    result = await session.exec(
+        update(Book)
+        .where(Book.id.in_(book_ids), Book.stock_quantity >= wanted)
+        .values(stock_quantity=Book.stock_quantity - wanted)
+        .execution_options(synchronize_session="fetch", **STOCK_ONLY)
+    )
+    if result.rowcount != len(book_ids):
+        await session.rollback()
+        for book_id in book_ids:
+            book = await session.get(Book, book_id)
+            if book.stock_quantity < quantities[book_id]:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Estoque insuficiente para o livro '{book.title}'. Restam apenas {book.stock_quantity}."
+                )
+        # Estoque mudou entre o UPDATE e a releitura; trata como conflito
+        raise HTTPException(status_code=409, detail="Estoque alterado durante o pedido, tente novamente")
+    return books
+
+
+async def release_holds(session: AsyncSession, order_ids: List[int]) -> Tuple[List[int], List[int]]:
+    """
+    Expira os pedidos ainda pendentes entre `order_ids` e devolve o estoque
+    deles, na transação da sessão (sem commit). Retorna (pedidos expirados,
+    livros cujo estoque voltou), para invalidar o cache após o commit.
+
+    A troca de status é condicional (`WHERE status = 'pending'`): um pedido
+    pago ao mesmo tempo não é expirado, e um pedido expirado não é devolvido duas vezes.
+    """
+    if not order_ids:
+        return [], []
+    expired = (await session.exec(
+        update(Order)
+        .where(Order.id.in_(order_ids), Order.status == "pending")
+        .values(status="expired")
+        .returning(Order.id)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+    if not expired:
+        return [], []
+
+    quantities = dict((await session.exec(
+        select(OrderItem.book_id, func.sum(OrderItem.quantity))
+        .where(OrderItem.order_id.in_(expired))
+        .group_by(OrderItem.book_id)
+    )).all())
+    if quantities:
+        returned = case(quantities, value=Book.id)
+        await session.exec(
+            update(Book)
+            .where(Book.id.in_(list(quantities)))
+            .values(stock_quantity=Book.stock_quantity + returned)
+            .execution_options(synchronize_session=False, **STOCK_ONLY)
+        )
+    return list(expired), list(quantities)
+
+
+class HoldSweeper:
+    """Devolve ao estoque, em lotes, as reservas de pedidos pendentes vencidos."""
+
+    def __init__(
+        self,
+        engine,  # AsyncEngine
+        batch_size: int = settings.HOLD_SWEEP_BATCH_SIZE,
+        interval: float = settings.HOLD_SWEEP_INTERVAL_SECONDS,
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def sweep_once(self) -> int:
+        """Expira um lote. Retorna quantos pedidos foram expirados."""
+        async with AsyncSession(self.engine) as session:
+            order_ids = (await session.exec(
+                select(Order.id)
+                .where(Order.status == "pending", Order.expires_at <= datetime.utcnow())
+                .order_by(Order.expires_at)
+                .limit(self.batch_size)
+            )).all()
+            expired, book_ids = await release_holds(session, list(order_ids))
+            await session.commit()
+        invalidate_stock(*book_ids)
+        if expired:
+            logger.info("%s reserva(s) de estoque expirada(s)", len(expired))
+        return len(expired)
+
+    async def run(self) -> None:
+        """Loop contínuo: varre lotes cheios em sequência e espera quando não há mais vencidos."""
+        while True:
+            try:
+                expired = await self.sweep_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Falha ao expirar reservas de estoque")
+                expired = 0
+            if expired < self.batch_size:
+                await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def build_sweeper() -> HoldSweeper:
+    from app.core.database import async_engine
+    return HoldSweeper(async_engine)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Expira reservas de estoque vencidas")
+    parser.add_argument("--once", action="store_true", help="varre um lote e sai")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sweeper = build_sweeper()
+    if args.once:
+        print(f"{asyncio.run(sweeper.sweep_once())} pedido(s) expirado(s)")
+    else:
+        asyncio.run(sweeper.run())
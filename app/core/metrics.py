@@ -0,0 +1,270 @@
+"""
+Métricas no formato de texto do Prometheus, sem dependências externas.
+
+- `MetricsMiddleware` (ASGI puro) mede cada requisição: latência por rota,
+  status, requisições em andamento e, via `query_tracer`, quantas queries e
+  quanto tempo de banco a requisição usou.
+- Gauges de coleta (thread pool do anyio, pools de conexão) são lidos só no
+  momento do scrape em `GET /metrics`.
+
+A rota entra no label pelo template (`/api/v1/books/{book_id}`), nunca pelo
+caminho concreto, para a cardinalidade ficar limitada.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.query_tracer import add_query_listener, route_template, trace_queries
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: LabelValues = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in items
+        ]
+
+
+class Gauge(Metric):
+    """Gauge com valor definido pelo código ou lido de uma função no scrape."""
+    kind = "gauge"
+
+    def __init__(self, *args, collect: Optional[Callable[[], Iterable[Tuple[LabelValues, float]]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._collect = collect
+
+    def inc(self, labels: LabelValues = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: LabelValues = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+    def value(self, labels: LabelValues = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        if self._collect is not None:
+            items = list(self._collect())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in items
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Por label: contagens por bucket (a última é +Inf), soma e total
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, labels: LabelValues = ()) -> int:
+        state = self._values.get(labels)
+        return state[2] if state else 0
+
+    def sum(self, labels: LabelValues = ()) -> float:
+        state = self._values.get(labels)
+        return state[1] if state else 0.0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(labels, (list(state[0]), state[1], state[2])) for labels, state in self._values.items()]
+        lines = self.header()
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    "http_requests_total", "Requisições HTTP atendidas.", ("method", "route", "status")))
+LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP.", ("method", "route")))
+IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "Requisições HTTP em andamento."))
+REQUEST_QUERIES = registry.register(Histogram(
+    "http_request_db_queries", "Queries SQL por requisição.", ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS))
+REQUEST_DB_TIME = registry.register(Histogram(
+    "http_request_db_seconds", "Tempo total de banco por requisição.", ("method", "route")))
+DB_QUERIES = registry.register(Counter(
+    "db_queries_total", "Queries SQL executadas (inclui tarefas de fundo)."))
+DB_TIME = registry.register(Counter(
+    "db_query_seconds_total", "Tempo total gasto em queries SQL."))
+
+
+# --- Banco: contadores globais (inclui tarefas de fundo) ---
+
+def _count_query(statement: str, elapsed: float) -> None:
+    DB_QUERIES.inc()
+    DB_TIME.inc(amount=elapsed)
+
+add_query_listener(_count_query)
+
+
+# --- Middleware ---
+
+class MetricsMiddleware:
+    """Middleware ASGI: latência, status e uso de banco por rota."""
+
+    def __init__(self, app, exclude: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.exclude = set(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        with trace_queries() as trace:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                elapsed = time.perf_counter() - start
+                IN_FLIGHT.dec()
+                labels = (scope["method"], route_template(scope))
+                REQUESTS.inc(labels + (str(status["code"]),))
+                LATENCY.observe(elapsed, labels)
+                REQUEST_QUERIES.observe(trace.queries, labels)
+                REQUEST_DB_TIME.observe(trace.db_seconds, labels)
+
+
+# --- Gauges lidos no scrape ---
+
+def _thread_pool_gauges():
+    """Ocupação do thread pool do anyio (rotas e dependências síncronas)."""
+    try:
+        from anyio import to_thread
+        limiter = to_thread.current_default_thread_limiter()
+    except Exception:  # fora de um event loop
+        return []
+    statistics = limiter.statistics()
+    return [
+        (("size",), limiter.total_tokens),
+        (("in_use",), statistics.borrowed_tokens),
+        (("waiting",), statistics.tasks_waiting),
+    ]
+
+
+def _db_pool_gauges():
+    from app.core.database import pool_stats
+    items = []
+    for engine_name, stats in pool_stats().items():
+        for field in ("size", "in_use", "idle", "overflow"):
+            if field in stats:
+                items.append(((engine_name, field), stats[field]))
+    return items
+
+
+registry.register(Gauge(
+    "threadpool_workers", "Thread pool do anyio: tamanho, em uso e tarefas esperando.",
+    ("state",), collect=_thread_pool_gauges))
+registry.register(Gauge(
+    "db_pool_connections", "Conexões dos pools do banco por estado.",
+    ("engine", "state"), collect=_db_pool_gauges))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render_metrics() -> str:
+    return registry.render()
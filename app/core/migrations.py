@@ -0,0 +1,290 @@
+"""
+Migrações versionadas do schema.
+
+Cada `Migration` tem um número, um nome e uma função que recebe a conexão
+dentro de uma transação. `migrate` aplica, em ordem, as que ainda não estão
+em `schema_version` e registra cada uma na mesma transação da mudança. As
+migrações são idempotentes (criam só o que falta), então também servem para
+bancos criados pelo antigo `create_all`, em qualquer estado intermediário.
+
+O DDL de cada migração é congelado aqui (tabelas `Table` próprias e nomes
+de índices explícitos), nunca lido dos modelos atuais: uma migração já
+publicada produz sempre o mesmo schema, e mudanças nos modelos entram como
+migrações novas.
+
+Na inicialização, a API só compara `max(version)` com a última migração
+(`check_schema`, uma query). Com `MIGRATE_ON_STARTUP=false`, um schema
+desatualizado impede a subida e as migrações rodam no deploy:
+
+    python -m app.core.migrations            # aplica as pendentes
+    python -m app.core.migrations --status   # versão atual e pendentes
+
+Para evoluir o schema, altere o modelo e acrescente uma `Migration` no fim
+de `MIGRATIONS` (nunca edite uma já publicada).
+"""
+import argparse
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table,
+    UniqueConstraint, inspect, text
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Field, SQLModel
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaVersion(SQLModel, table=True):
+    """Uma linha por migração aplicada."""
+    __tablename__ = "schema_version"
+
+    version: int = Field(primary_key=True)
+    name: str
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+# --- Helpers idempotentes ---
+
+def _create_tables(connection: Connection, metadata: MetaData) -> None:
+    """Cria as tabelas (com seus índices) de `metadata` que ainda não existem."""
+    metadata.create_all(connection, checkfirst=True)
+
+
+def _add_column(connection: Connection, table_name: str, column: Column) -> None:
+    """ALTER TABLE ADD COLUMN, se a coluna ainda não existe."""
+    existing = {existing["name"] for existing in inspect(connection).get_columns(table_name)}
+    if column.name in existing:
+        return
+    preparer = connection.dialect.identifier_preparer
+    connection.execute(text(
+        f"ALTER TABLE {preparer.quote(table_name)} ADD COLUMN "
+        f"{preparer.quote(column.name)} {column.type.compile(dialect=connection.dialect)}"
+    ))
+
+
+def _create_index(connection: Connection, name: str, table_name: str, *columns: str, unique: bool = False) -> None:
+    """CREATE INDEX, se o índice ainda não existe."""
+    existing = {index["name"] for index in inspect(connection).get_indexes(table_name)}
+    if name in existing:
+        return
+    logger.info("Criando índice %s", name)
+    preparer = connection.dialect.identifier_preparer
+    connection.execute(text(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX {preparer.quote(name)} "
+        f"ON {preparer.quote(table_name)} ({', '.join(preparer.quote(column) for column in columns)})"
+    ))
+
+
+# --- Migrações (em ordem; só acrescente no fim) ---
+
+# Schema da primeira versão do projeto
+_initial_schema = MetaData()
+Table(
+    "user", _initial_schema,
+    Column("email", String, nullable=False),
+    Column("is_active", Boolean, nullable=False),
+    Column("is_superuser", Boolean, nullable=False),
+    Column("full_name", String),
+    Column("id", Integer, primary_key=True),
+    Column("hashed_password", String, nullable=False),
+    Index("ix_user_email", "email", unique=True),
+)
+Table(
+    "book", _initial_schema,
+    Column("title", String, nullable=False),
+    Column("author", String, nullable=False),
+    Column("description", String),
+    Column("price", Float, nullable=False),
+    Column("stock_quantity", Integer, nullable=False),
+    Column("id", Integer, primary_key=True),
+    Index("ix_book_title", "title"),
+)
+Table(
+    "order", _initial_schema,
+    Column("status", String, nullable=False),
+    Column("id", Integer, primary_key=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("user_id", Integer, ForeignKey("user.id")),
+)
+Table(
+    "orderitem", _initial_schema,
+    Column("order_id", Integer, ForeignKey("order.id"), primary_key=True),
+    Column("book_id", Integer, ForeignKey("book.id"), primary_key=True),
+    Column("quantity", Integer, nullable=False),
+    Column("item_price", Float, nullable=False),
+)
+
+
+def _initial(connection: Connection) -> None:
+    _create_tables(connection, _initial_schema)
+
+
+def _order_lifecycle_columns(connection: Connection) -> None:
+    # Reserva de estoque (expiração do pedido pendente) e relatórios de vendas
+    _add_column(connection, "order", Column("expires_at", DateTime))
+    _add_column(connection, "order", Column("paid_at", DateTime))
+
+
+def _hot_lookup_indexes(connection: Connection) -> None:
+    _create_index(connection, "ix_book_price", "book", "price")
+    _create_index(connection, "ix_order_user_id_created_at", "order", "user_id", "created_at")
+    _create_index(connection, "ix_order_status_expires_at", "order", "status", "expires_at")
+    _create_index(connection, "ix_order_status_created_at", "order", "status", "created_at")
+    _create_index(connection, "ix_orderitem_book_id", "orderitem", "book_id")
+
+
+# Tabelas de apoio (outbox de emails, idempotência, versão do catálogo, agregados de vendas)
+_feature_tables = MetaData()
+Table(
+    "emailoutbox", _feature_tables,
+    Column("id", Integer, primary_key=True),
+    Column("recipient", String, nullable=False),
+    Column("subject", String, nullable=False),
+    Column("body", String, nullable=False),
+    Column("status", String, nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("next_attempt_at", DateTime, nullable=False),
+    Column("claim_token", String),
+    Column("last_error", String),
+    Column("created_at", DateTime, nullable=False),
+    Column("sent_at", DateTime),
+    Index("ix_emailoutbox_status_next_attempt", "status", "next_attempt_at"),
+)
+Table(
+    "idempotencykey", _feature_tables,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, nullable=False),
+    Column("key", String, nullable=False),
+    Column("fingerprint", String, nullable=False),
+    Column("status", String, nullable=False),
+    Column("response_status", Integer),
+    Column("response_body", String),
+    Column("created_at", DateTime, nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+    UniqueConstraint("user_id", "key", name="uq_idempotencykey_user_key"),
+    Index("ix_idempotencykey_expires_at", "expires_at"),
+)
+Table(
+    "catalogversion", _feature_tables,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+)
+Table(
+    "dailysales", _feature_tables,
+    Column("day", Date, primary_key=True),
+    Column("orders", Integer, nullable=False),
+    Column("units", Integer, nullable=False),
+    Column("revenue", Float, nullable=False),
+)
+Table(
+    "booksales", _feature_tables,
+    Column("book_id", Integer, primary_key=True),
+    Column("orders", Integer, nullable=False),
+    Column("units", Integer, nullable=False),
+    Column("revenue", Float, nullable=False),
+    Index("ix_booksales_units", "units"),
+    Index("ix_booksales_revenue", "revenue"),
+)
+
+
+def _feature_tables_and_search(connection: Connection) -> None:
+    _create_tables(connection, _feature_tables)
+    # Índice de busca textual (FTS5 no SQLite, GIN no PostgreSQL), com os livros existentes
+    from app.core.search import ensure_search_index
+    ensure_search_index(connection)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "initial", _initial),
+    Migration(2, "order_lifecycle_columns", _order_lifecycle_columns),
+    Migration(3, "hot_lookup_indexes", _hot_lookup_indexes),
+    Migration(4, "feature_tables_and_search", _feature_tables_and_search),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+# --- Execução ---
+
+def current_version(connection: Connection) -> int:
+    """Maior versão aplicada (0 em um banco sem `schema_version`)."""
+    if not inspect(connection).has_table(SchemaVersion.__tablename__):
+        return 0
+    return connection.execute(text("SELECT max(version) FROM schema_version")).scalar() or 0
+
+
+def migrate(engine: Engine, target: Optional[int] = None) -> List[Migration]:
+    """Aplica as migrações pendentes até `target` (padrão: a última). Retorna as aplicadas."""
+    target = LATEST_VERSION if target is None else target
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version > target:
+            break
+        with engine.begin() as connection:
+            if connection.dialect.name == "postgresql":
+                # Dois processos migrando ao mesmo tempo: o segundo espera e pula
+                connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('schema_version'))"))
+            SchemaVersion.__table__.create(connection, checkfirst=True)
+            if migration.version <= current_version(connection):
+                continue
+            logger.info("Aplicando migração %s (%s)", migration.version, migration.name)
+            migration.upgrade(connection)
+            connection.execute(
+                SchemaVersion.__table__.insert().values(
+                    version=migration.version, name=migration.name, applied_at=datetime.utcnow()
+                )
+            )
+        applied.append(migration)
+    return applied
+
+
+def check_schema(engine: Engine) -> int:
+    """
+    Verificação da inicialização: uma query de versão. Se o banco está
+    atrasado, migra (`MIGRATE_ON_STARTUP`) ou falha com instruções.
+    """
+    with engine.connect() as connection:
+        version = current_version(connection)
+    if version >= LATEST_VERSION:
+        return version
+    if not settings.MIGRATE_ON_STARTUP:
+        raise RuntimeError(
+            f"Schema do banco na versão {version}, a aplicação espera {LATEST_VERSION}. "
+            "Rode `python -m app.core.migrations` antes de subir a API."
+        )
+    migrate(engine)
+    return LATEST_VERSION
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrações do schema do banco")
+    parser.add_argument("--status", action="store_true", help="mostra a versão atual e as pendentes")
+    parser.add_argument("--target", type=int, help="migra só até esta versão")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from app.core.database import engine
+
+    if args.status:
+        with engine.connect() as connection:
+            version = current_version(connection)
+        print(f"Versão atual: {version} (última: {LATEST_VERSION})")
+        for migration in MIGRATIONS:
+            if migration.version > version:
+                print(f"  pendente: {migration.version} {migration.name}")
+    else:
+        applied = migrate(engine, args.target)
+        print(f"{len(applied)} migração(ões) aplicada(s)")
@@ -0,0 +1,235 @@
+"""
+Outbox transacional de emails.
+
+As rotas chamam `enqueue_email` antes do commit, então o email só existe se o
+usuário/pedido existir, e sobrevive a reinícios. O `OutboxDispatcher` drena a
+tabela em lotes com concorrência limitada (asyncio), com retentativas e
+backoff exponencial. Ele pode rodar junto com a API ou como processo separado:
+
+    python -m app.core.outbox          # loop contínuo
+    python -m app.core.outbox --once   # drena um lote e sai
+"""
+import argparse
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(session: AsyncSession, recipient: str, subject: str, message: str = "") -> EmailOutbox:
+    """Adiciona um email à outbox. Não faz commit: vai junto com a transação da rota."""
+    email = EmailOutbox(recipient=recipient, subject=subject, body=message)
+    session.add(email)
+    return email
+
+
+# --- Transportes ---
+
+class EmailTransport:
+    """Interface de envio. Implementações levantam exceção em caso de falha."""
+
+    async def send(self, email: EmailOutbox) -> None:
+        raise NotImplementedError
+
+
+class StdoutTransport(EmailTransport):
+    """Substituto local: imprime o email no terminal."""
+
+    async def send(self, email: EmailOutbox) -> None:
+        print(f"\n[EMAIL_SERVICE] Enviando email para: {email.recipient}")
+        print(f"[EMAIL_SERVICE] Assunto: {email.subject}")
+        print(f"[EMAIL_SERVICE] Mensagem: {email.body}")
+        print("[EMAIL_SERVICE] Enviado com sucesso!\n")
+
+
+class FileTransport(EmailTransport):
+    """Substituto local: grava cada email como uma linha JSON em um arquivo."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _append(self, line: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as fp:
+            fp.write(line + "\n")
+
+    async def send(self, email: EmailOutbox) -> None:
+        line = json.dumps(
+            {"to": email.recipient, "subject": email.subject, "body": email.body},
+            ensure_ascii=False,
+        )
+        await asyncio.to_thread(self._append, line)
+
+
+def get_transport(spec: Optional[str] = None) -> EmailTransport:
+    """Cria o transporte a partir de `EMAIL_TRANSPORT` ("stdout" ou "file:<caminho>")."""
+    spec = spec or settings.EMAIL_TRANSPORT
+    if spec == "stdout":
+        return StdoutTransport()
+    if spec.startswith("file:"):
+        return FileTransport(spec[len("file:"):])
+    raise ValueError(f"EMAIL_TRANSPORT inválido: {spec!r}")
+
+
+# --- Dispatcher ---
+
+class OutboxDispatcher:
+    """
+    Drena a outbox em lotes.
+
+    Cada lote é reivindicado com um `claim_token` e um lease (`next_attempt_at`
+    no futuro), então vários dispatchers podem rodar ao mesmo tempo e um lote
+    abandonado (processo morto) volta a ficar disponível quando o lease vence.
+    """
+
+    def __init__(
+        self,
+        engine,  # AsyncEngine
+        transport: EmailTransport,
+        batch_size: int = settings.OUTBOX_BATCH_SIZE,
+        concurrency: int = settings.OUTBOX_CONCURRENCY,
+        max_attempts: int = settings.OUTBOX_MAX_ATTEMPTS,
+        backoff_seconds: float = settings.OUTBOX_BACKOFF_SECONDS,
+        lease_seconds: float = settings.OUTBOX_LEASE_SECONDS,
+        poll_interval: float = settings.OUTBOX_POLL_INTERVAL_SECONDS,
+    ):
+        self.engine = engine
+        self.transport = transport
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _claim_batch(self) -> List[EmailOutbox]:
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+        claimable = (
+            EmailOutbox.status.in_(("pending", "sending")),
+            EmailOutbox.next_attempt_at <= now,
+        )
+        async with AsyncSession(self.engine, expire_on_commit=False) as session:
+            ids = (await session.exec(
+                select(EmailOutbox.id)
+                .where(*claimable)
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(self.batch_size)
+            )).all()
+            if not ids:
+                return []
+            # A condição é repetida no UPDATE: outro dispatcher pode ter levado a linha
+            await session.exec(
+                update(EmailOutbox)
+                .where(EmailOutbox.id.in_(ids), *claimable)
+                .values(
+                    status="sending",
+                    claim_token=token,
+                    next_attempt_at=now + timedelta(seconds=self.lease_seconds),
+                )
+            )
+            await session.commit()
+            return (await session.exec(
+                select(EmailOutbox).where(EmailOutbox.claim_token == token)
+            )).all()
+
+    async def _record_results(self, results: Dict[int, Optional[str]]) -> None:
+        """Grava o resultado do lote: `None` para enviado, mensagem de erro para falha."""
+        now = datetime.utcnow()
+        async with AsyncSession(self.engine) as session:
+            emails = await session.exec(select(EmailOutbox).where(EmailOutbox.id.in_(list(results))))
+            for email in emails:
+                error = results[email.id]
+                email.claim_token = None
+                if error is None:
+                    email.status = "sent"
+                    email.sent_at = now
+                    email.last_error = None
+                    continue
+                email.attempts += 1
+                email.last_error = error[:500]
+                if email.attempts >= self.max_attempts:
+                    email.status = "failed"
+                    logger.error("Email %s descartado após %s tentativas: %s", email.id, email.attempts, error)
+                else:
+                    email.status = "pending"
+                    delay = self.backoff_seconds * 2 ** (email.attempts - 1)
+                    email.next_attempt_at = now + timedelta(seconds=delay)
+                session.add(email)
+            await session.commit()
+
+    async def dispatch_once(self) -> int:
+        """Envia um lote. Retorna quantos emails foram processados."""
+        batch = await self._claim_batch()
+        if not batch:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: Dict[int, Optional[str]] = {}
+
+        async def deliver(email: EmailOutbox) -> None:
+            async with semaphore:
+                try:
+                    await self.transport.send(email)
+                    results[email.id] = None
+                except Exception as exc:
+                    results[email.id] = f"{type(exc).__name__}: {exc}"
+
+        await asyncio.gather(*(deliver(email) for email in batch))
+        await self._record_results(results)
+        return len(batch)
+
+    async def run(self) -> None:
+        """Loop contínuo: drena lotes cheios em sequência e espera quando a fila esvazia."""
+        while True:
+            try:
+                processed = await self.dispatch_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Falha ao processar a outbox de emails")
+                processed = 0
+            if processed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def build_dispatcher() -> OutboxDispatcher:
+    from app.core.database import async_engine
+    return OutboxDispatcher(async_engine, get_transport())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dispatcher da outbox de emails")
+    parser.add_argument("--once", action="store_true", help="drena um lote e sai")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    dispatcher = build_dispatcher()
+    if args.once:
+        print(f"{asyncio.run(dispatcher.dispatch_once())} email(s) processado(s)")
+    else:
+        asyncio.run(dispatcher.run())
@@ -0,0 +1,94 @@
+"""
+Paginação por cursor (keyset).
+
+O cursor é opaco para o cliente: codifica a ordenação usada e o par
+`(chave_de_ordenação, id)` da última linha entregue. A próxima página vira um
+único range seek no índice, em vez de um OFFSET que descarta as linhas anteriores.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, Float, Integer, Numeric, String, literal, tuple_
+from sqlalchemy.types import TypeDecorator
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort: str, value: Any, row_id: int) -> str:
+    """Codifica a posição da última linha em um cursor opaco (base64 url-safe)."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """Decodifica um cursor e garante que ele pertence à ordenação pedida."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_name, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        row_id = int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if sort_name != sort:
+        raise HTTPException(
+            status_code=400, detail="Cursor não corresponde à ordenação solicitada"
+        )
+    return value, row_id
+
+
+def _cursor_value(sort_column, value: Any) -> Any:
+    """Confere (e converte) o valor do cursor para o tipo da coluna; senão, 400."""
+    column_type = sort_column.type
+    if isinstance(column_type, TypeDecorator):  # ex.: AutoString do SQLModel
+        column_type = column_type.impl
+    try:
+        if isinstance(column_type, DateTime):
+            return datetime.fromisoformat(value)
+        if isinstance(column_type, Integer) and isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(column_type, (Float, Numeric)) and isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+        if isinstance(column_type, String) and isinstance(value, str):
+            return value
+    except (ValueError, TypeError):
+        pass
+    raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def apply_keyset(
+    query,
+    sort_column,
+    id_column,
+    position: Optional[Tuple[Any, int]] = None,
+    descending: bool = False,
+):
+    """
+    Ordena `query` por `(sort_column, id_column)` e, se houver `position`,
+    continua estritamente depois dela.
+    """
+    if position is not None:
+        value, row_id = position
+        value = _cursor_value(sort_column, value)
+        key = tuple_(sort_column, id_column)
+        bound = tuple_(literal(value, sort_column.type), literal(row_id, id_column.type))
+        query = query.where(key < bound if descending else key > bound)
+
+    if descending:
+        return query.order_by(sort_column.desc(), id_column.desc())
+    return query.order_by(sort_column, id_column)
+
+
+def split_page(rows: list, limit: int, sort: str, sort_attr: str) -> Tuple[list, Optional[str]]:
+    """
+    Recebe até `limit + 1` linhas e devolve a página e o cursor da próxima
+    (ou None quando esta é a última página).
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(sort, getattr(last, sort_attr), last.id)
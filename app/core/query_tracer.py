@@ -0,0 +1,176 @@
+"""
+Rastreamento de queries por requisição.
+
+Eventos do SQLAlchemy (`before/after_cursor_execute`) registram cada query
+no `QueryTrace` das requisições em andamento no contexto atual. Com isso:
+
+- `QueryTracerMiddleware` adiciona `X-Query-Count` e `X-DB-Time` (ms) às
+  respostas quando `QUERY_DEBUG_HEADERS` está ligado e avisa no log quando o
+  mesmo formato de SELECT se repete `N_PLUS_ONE_THRESHOLD` vezes na mesma
+  requisição (o padrão N+1 de relacionamentos lazy);
+- queries mais lentas que `SLOW_QUERY_MS` vão para o log com o ponto do
+  código da aplicação que as disparou;
+- observadores (`observe_requests`) recebem o trace de cada requisição: é o
+  que o fixture `query_budget` dos testes usa.
+"""
+import contextlib
+import contextvars
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+
+try:
+    import greenlet
+except ImportError:  # pragma: no cover - o SQLAlchemy assíncrono depende dele
+    greenlet = None
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = "X-Query-Count"
+DB_TIME_HEADER = "X-DB-Time"
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class QueryTrace:
+    """Queries de uma requisição: total, tempo de banco e contagem por formato."""
+    __slots__ = ("queries", "db_seconds", "shapes")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.queries += 1
+        self.db_seconds += elapsed
+        self.shapes[statement] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """SELECTs idênticos (mesmo SQL, parâmetros diferentes) repetidos `threshold`+ vezes."""
+        return [
+            (statement, count)
+            for statement, count in self.shapes.most_common()
+            if count >= threshold and statement.lstrip().upper().startswith("SELECT")
+        ]
+
+
+# Traces ativos no contexto (a requisição e, se houver, o middleware de métricas).
+# Os eventos rodam no greenlet da sessão assíncrona, que herda o contexto.
+_active: contextvars.ContextVar[Tuple[QueryTrace, ...]] = contextvars.ContextVar(
+    "query_traces", default=()
+)
+_request_observers: List[Callable[[str, str, QueryTrace], None]] = []
+# Chamados a cada query, em qualquer contexto (ex.: contadores globais de métricas)
+_query_listeners: List[Callable[[str, float], None]] = []
+
+
+@contextlib.contextmanager
+def trace_queries() -> Iterator[QueryTrace]:
+    """Registra as queries executadas no contexto atual enquanto o bloco roda."""
+    trace = QueryTrace()
+    token = _active.set(_active.get() + (trace,))
+    try:
+        yield trace
+    finally:
+        _active.reset(token)
+
+
+def add_query_listener(listener: Callable[[str, float], None]) -> None:
+    _query_listeners.append(listener)
+
+
+@contextlib.contextmanager
+def observe_requests(observer: Callable[[str, str, QueryTrace], None]) -> Iterator[None]:
+    """Chama `observer(método, rota, trace)` ao fim de cada requisição enquanto o bloco roda."""
+    _request_observers.append(observer)
+    try:
+        yield
+    finally:
+        _request_observers.remove(observer)
+
+
+def _call_site() -> Optional[str]:
+    """Primeiro frame da aplicação (fora deste módulo) que levou à query."""
+    frame = sys._getframe(2)
+    # Na sessão assíncrona a query roda em um greenlet; o código da rota está
+    # na pilha do greenlet pai, suspenso no await
+    current = greenlet.getcurrent() if greenlet else None
+    parent_frame = current.parent.gr_frame if current is not None and current.parent is not None else None
+    for start in (frame, parent_frame):
+        while start is not None:
+            filename = start.f_code.co_filename
+            if filename.startswith(_APP_DIR) and filename != __file__:
+                return f"{os.path.relpath(filename, os.path.dirname(_APP_DIR))}:{start.f_lineno} em {start.f_code.co_name}"
+            start = start.f_back
+    return None
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    for trace in _active.get():
+        trace.record(statement, elapsed)
+    for listener in _query_listeners:
+        listener(statement, elapsed)
+    if settings.SLOW_QUERY_MS and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        logger.warning(
+            "Query lenta (%.1f ms) em %s: %s",
+            elapsed * 1000, _call_site() or "?", " ".join(statement.split())[:500]
+        )
+
+
+def route_template(scope) -> str:
+    """Template da rota resolvida (`/api/v1/books/{book_id}`), para logs e labels."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class QueryTracerMiddleware:
+    """Middleware ASGI: headers de debug, aviso de N+1 e observadores por requisição."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with trace_queries() as trace:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start" and settings.QUERY_DEBUG_HEADERS:
+                    headers = list(message.get("headers", []))
+                    headers.append((QUERY_COUNT_HEADER.lower().encode(), str(trace.queries).encode()))
+                    headers.append((DB_TIME_HEADER.lower().encode(), f"{trace.db_seconds * 1000:.2f}".encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = route_template(scope)
+                if settings.N_PLUS_ONE_THRESHOLD:
+                    for statement, count in trace.repeated(settings.N_PLUS_ONE_THRESHOLD):
+                        logger.warning(
+                            "Possível N+1 em %s %s: %d× %s",
+                            scope["method"], route, count, " ".join(statement.split())[:300]
+                        )
+                for observer in list(_request_observers):
+                    observer(scope["method"], route, trace)
@@ -0,0 +1,185 @@
+"""
+Rate limiting por token bucket e controle de admissão das rotas de autenticação.
+
+Cada política (`auth_ip`, `auth_account`, `catalog`) tem uma taxa de reposição
+e um burst. O bucket é identificado por política + chave (IP do cliente ou
+conta), e a verificação é O(1): um lookup no dicionário e uma conta de
+reposição, sem timers nem varreduras.
+
+`RateLimitBackend` define a interface; `MemoryRateLimitBackend` guarda os
+buckets em processo, com limite de chaves e eviction LRU (um bucket
+despejado volta cheio, o que só favorece clientes ociosos há mais tempo).
+Um backend compartilhado (ex.: Redis) pode ser plugado com `set_backend`.
+
+Além dos buckets, `limit_auth` recusa logins e cadastros quando a fila do
+pool de bcrypt já passa de `AUTH_ADMISSION_QUEUE_PER_WORKER` por processo:
+a resposta rápida evita a query no banco e o trabalho que só ia esperar.
+"""
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict
+
+from fastapi import HTTPException, Request
+
+from app.core.config import settings
+from app.core.metrics import Counter, registry
+from app.core.security import password_hasher
+
+REJECTIONS = registry.register(Counter(
+    "rate_limit_rejections_total", "Requisições recusadas pelo rate limit ou pela admissão.", ("policy",)))
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    name: str
+    per_second: float  # taxa de reposição de tokens
+    burst: int  # capacidade do bucket
+
+
+class RateLimitBackend:
+    """Interface mínima de um armazenamento de token buckets."""
+
+    def acquire(self, key: str, limit: RateLimit, cost: float = 1.0) -> float:
+        """Consome `cost` tokens. Retorna 0 se permitido ou os segundos até haver tokens."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Buckets em processo, thread-safe, com no máximo `maxsize` chaves (LRU)."""
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # chave -> [tokens, instante]
+        self._lock = Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def acquire(self, key: str, limit: RateLimit, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(limit.burst), now]
+                if len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(limit.burst, bucket[0] + (now - bucket[1]) * limit.per_second)
+                bucket[1] = now
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                self.allowed += 1
+                return 0.0
+            self.rejected += 1
+            if limit.per_second <= 0:
+                return float("inf")
+            return (cost - bucket[0]) / limit.per_second
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "keys": len(self._buckets),
+                "maxsize": self.maxsize,
+                "allowed": self.allowed,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+            }
+
+
+_backend: RateLimitBackend = MemoryRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS)
+
+
+def set_backend(backend: RateLimitBackend) -> None:
+    global _backend
+    _backend = backend
+
+
+def get_backend() -> RateLimitBackend:
+    return _backend
+
+
+def policies() -> Dict[str, RateLimit]:
+    """Políticas lidas das configurações (a cada chamada, para poderem mudar em testes)."""
+    return {
+        "auth_ip": RateLimit(
+            "auth_ip", settings.RATE_LIMIT_AUTH_IP_PER_MINUTE / 60, settings.RATE_LIMIT_AUTH_IP_BURST),
+        "auth_account": RateLimit(
+            "auth_account", settings.RATE_LIMIT_AUTH_ACCOUNT_PER_MINUTE / 60, settings.RATE_LIMIT_AUTH_ACCOUNT_BURST),
+        "catalog": RateLimit(
+            "catalog", settings.RATE_LIMIT_CATALOG_PER_SECOND, settings.RATE_LIMIT_CATALOG_BURST),
+    }
+
+
+def client_ip(request: Request) -> str:
+    """IP do cliente; o primeiro de `X-Forwarded-For` só com `RATE_LIMIT_TRUST_PROXY`."""
+    if settings.RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",", 1)[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _too_many(policy: str, retry_after: float) -> HTTPException:
+    REJECTIONS.inc((policy,))
+    seconds = max(1, math.ceil(retry_after)) if retry_after != float("inf") else 3600
+    return HTTPException(
+        status_code=429,
+        detail="Muitas requisições, tente novamente mais tarde",
+        headers={"Retry-After": str(seconds)},
+    )
+
+
+def check(policy: str, key: str) -> None:
+    """Consome um token do bucket (política, chave) ou levanta 429 com `Retry-After`."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    retry_after = _backend.acquire(f"{policy}:{key}", policies()[policy])
+    if retry_after:
+        raise _too_many(policy, retry_after)
+
+
+def _check_admission() -> None:
+    """Recusa trabalho de bcrypt que só ficaria esperando na fila do pool."""
+    per_worker = settings.AUTH_ADMISSION_QUEUE_PER_WORKER
+    if not per_worker:
+        return
+    stats = password_hasher.stats()
+    if stats["queued"] >= per_worker * stats["workers"]:
+        REJECTIONS.inc(("auth_admission",))
+        raise HTTPException(
+            status_code=503,
+            detail="Serviço de autenticação sobrecarregado, tente novamente",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def limit_auth(request: Request) -> None:
+    """Dependência das rotas de autenticação: bucket por IP e admissão pelo pool de bcrypt."""
+    check("auth_ip", client_ip(request))
+    _check_admission()
+
+
+def limit_account(account: str) -> None:
+    """Bucket por conta (email), contra tentativas distribuídas entre vários IPs."""
+    check("auth_account", account.strip().lower())
+
+
+async def limit_catalog(request: Request) -> None:
+    """Dependência das leituras do catálogo: bucket por IP, com orçamento bem maior."""
+    check("catalog", client_ip(request))
@@ -0,0 +1,121 @@
+"""
+Busca textual do catálogo.
+
+SQLite usa uma tabela virtual FTS5 (conteúdo externo apontando para `book`),
+mantida em sincronia por triggers; PostgreSQL usa um índice GIN sobre o
+`tsvector` de título, autor e descrição. Como a sincronização fica no próprio
+banco, qualquer escrita em `book` (create/update/delete) atualiza o índice.
+"""
+import re
+
+from sqlalchemy import event, func, literal_column, or_, text
+from sqlalchemy.sql import column, table
+from sqlmodel import SQLModel
+
+from app.models import Book
+
+FTS_TABLE = "book_fts"
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, author, description,
+        content='book', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON book BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON book BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+    END""",
+    # Só reindexa quando campos pesquisáveis mudam (baixa de estoque não conta)
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF title, author, description ON book BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END""",
+]
+
+# A expressão da query precisa ser idêntica à do índice para o GIN ser usado
+_PG_DOCUMENT = (
+    "to_tsvector('simple', coalesce(title, '') || ' ' || "
+    "coalesce(author, '') || ' ' || coalesce(description, ''))"
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def create_search_index(target, connection, **kw):
+    """Cria o índice de busca (idempotente) após o `create_all`."""
+    ensure_search_index(connection)
+
+
+def ensure_search_index(connection) -> None:
+    """Cria o índice de busca se ainda não existe (também usado pelas migrações)."""
+    if connection.dialect.name == "sqlite":
+        exists = connection.exec_driver_sql(
+            f"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '{FTS_TABLE}'"
+        ).first()
+        if exists:
+            return
+        for statement in _SQLITE_DDL:
+            connection.exec_driver_sql(statement)
+        # Indexa livros que já existiam antes da tabela FTS
+        connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_book_search ON book USING GIN ({_PG_DOCUMENT})"
+        )
+
+
+@event.listens_for(SQLModel.metadata, "before_drop")
+def drop_search_index(target, connection, **kw):
+    """Remove a tabela FTS junto com as tabelas do modelo."""
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def tokenize(search: str) -> list:
+    """Quebra o termo de busca em tokens alfanuméricos (descarta operadores)."""
+    return _TOKEN_RE.findall(search.lower())
+
+
+def apply_search(query, search: str, dialect: str, rank: bool = True):
+    """
+    Filtra `query` (um select de Book) pelo termo de busca e, com `rank`,
+    ordena por relevância. Cada token é tratado como prefixo, então
+    "tolk sene" encontra "O Senhor dos Anéis" de "J.R.R. Tolkien".
+    """
+    tokens = tokenize(search)
+    if not tokens:
+        return query
+
+    if dialect == "sqlite":
+        fts = table(FTS_TABLE, column("rowid"), column("rank"))
+        match = " ".join(f'"{token}"*' for token in tokens)
+        query = query.join(fts, fts.c.rowid == Book.id).where(
+            text(f"{FTS_TABLE} MATCH :fts_query").bindparams(fts_query=match)
+        )
+        return query.order_by(fts.c.rank, Book.id) if rank else query
+
+    if dialect == "postgresql":
+        document = literal_column(_PG_DOCUMENT)
+        ts_query = func.to_tsquery("simple", " & ".join(f"{token}:*" for token in tokens))
+        query = query.where(document.op("@@")(ts_query))
+        if rank:
+            query = query.order_by(func.ts_rank(document, ts_query).desc(), Book.id)
+        return query
+
+    # Outros bancos: sem índice textual, mantém o comportamento de LIKE
+    query = query.where(
+        or_(
+            Book.title.contains(search),
+            Book.author.contains(search),
+            Book.description.contains(search),
+        )
+    )
+    return query.order_by(Book.id) if rank else query
@@ -0,0 +1,200 @@
+"""
+Índice em memória para o autocompletar da busca (`GET /books/suggest`).
+
+Títulos e autores são normalizados (minúsculas, sem acentos, espaços
+simples) e cada livro entra em uma lista ordenada com uma chave por início
+de palavra: "O Senhor dos Anéis" gera "o senhor dos aneis", "senhor dos
+aneis", "dos aneis" e "aneis". Uma sugestão é um `bisect` até o prefixo
+digitado e uma varredura curta a partir dali, sem consultar o banco.
+
+O índice é montado na inicialização e atualizado pelas rotas que escrevem
+livros (`add`/`remove`). Escritas de outros processos (outros workers,
+scripts) são cobertas pelo `TypeaheadRefresher`, que reconstrói o índice
+quando a versão de títulos e autores (`names_version`, que não muda com
+estoque) muda, no máximo a cada `TYPEAHEAD_REFRESH_INTERVAL_SECONDS`.
+"""
+import asyncio
+import logging
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.catalog import names_version
+from app.core.config import settings
+from app.models import Book
+
+logger = logging.getLogger(__name__)
+
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize(value: str) -> str:
+    """Minúsculas, sem acentos e com espaços simples ("Anéis  X" -> "aneis x")."""
+    decomposed = unicodedata.normalize("NFKD", value)
+    folded = "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+    return _SPACES_RE.sub(" ", folded).strip()
+
+
+def _keys(title: str, author: str) -> List[str]:
+    """Chaves de um livro: o texto a partir de cada início de palavra do título e do autor."""
+    keys = set()
+    for text in (normalize(title), normalize(author)):
+        words = text.split(" ")
+        for start in range(len(words)):
+            keys.add(" ".join(words[start:]))
+    keys.discard("")
+    return sorted(keys)
+
+
+class TypeaheadIndex:
+    """Lista ordenada de (chave, id do livro) com busca por prefixo."""
+
+    def __init__(self):
+        self._entries: List[Tuple[str, int]] = []
+        self._books: Dict[int, Tuple[str, str, List[str]]] = {}  # id -> (título, autor, chaves)
+        self._lock = Lock()
+        self.load_lock = asyncio.Lock()  # um único build sob demanda por vez (`ensure_loaded`)
+        self.version: Optional[int] = None  # `names_version` usada no último build
+
+    @property
+    def loaded(self) -> bool:
+        return self.version is not None
+
+    def build(self, rows: Iterable[Tuple[int, str, str]], version: int = 0) -> None:
+        """Substitui o índice pelas linhas (id, título, autor)."""
+        books = {book_id: (title, author, _keys(title, author)) for book_id, title, author in rows}
+        entries = sorted((key, book_id) for book_id, (_, _, keys) in books.items() for key in keys)
+        with self._lock:
+            self._books, self._entries, self.version = books, entries, version
+
+    def add(self, book_id: int, title: str, author: str) -> None:
+        """Inclui ou atualiza um livro."""
+        keys = _keys(title, author)
+        with self._lock:
+            self._remove(book_id)
+            self._books[book_id] = (title, author, keys)
+            for key in keys:
+                insort(self._entries, (key, book_id))
+
+    def remove(self, book_id: int) -> None:
+        with self._lock:
+            self._remove(book_id)
+
+    def _remove(self, book_id: int) -> None:
+        book = self._books.pop(book_id, None)
+        if book is None:
+            return
+        for key in book[2]:
+            position = bisect_left(self._entries, (key, book_id))
+            if position < len(self._entries) and self._entries[position] == (key, book_id):
+                del self._entries[position]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._books, self._entries, self.version = {}, [], None
+        self.load_lock = asyncio.Lock()
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Até `limit` livros cujo título ou autor tem uma palavra começando por `query`."""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        results: List[Dict[str, Any]] = []
+        seen = set()
+        with self._lock:
+            position = bisect_left(self._entries, (prefix,))
+            while position < len(self._entries) and len(results) < limit:
+                key, book_id = self._entries[position]
+                if not key.startswith(prefix):
+                    break
+                if book_id not in seen:
+                    seen.add(book_id)
+                    title, author, _ = self._books[book_id]
+                    results.append({"id": book_id, "title": title, "author": author})
+                position += 1
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"books": len(self._books), "keys": len(self._entries), "version": self.version}
+
+
+typeahead_index = TypeaheadIndex()
+
+
+async def load_index(session: AsyncSession, index: TypeaheadIndex = typeahead_index) -> int:
+    """(Re)constrói o índice a partir do banco. Retorna quantos livros entraram."""
+    version = await names_version(session)
+    rows = (await session.exec(select(Book.id, Book.title, Book.author))).all()
+    # Normalizar e ordenar o catálogo inteiro fora do event loop
+    await asyncio.to_thread(index.build, rows, version)
+    return len(rows)
+
+
+async def ensure_loaded(session: AsyncSession, index: TypeaheadIndex = typeahead_index) -> None:
+    """
+    Monta o índice se o `TypeaheadRefresher` ainda não montou. Requisições
+    que chegam juntas esperam o mesmo build em vez de ler o catálogo cada uma.
+    """
+    if index.loaded:
+        return
+    async with index.load_lock:
+        if not index.loaded:
+            await load_index(session, index)
+
+
+class TypeaheadRefresher:
+    """Monta o índice na inicialização e o reconstrói quando títulos ou autores mudam."""
+
+    def __init__(
+        self,
+        engine,  # AsyncEngine
+        index: TypeaheadIndex = typeahead_index,
+        interval: float = settings.TYPEAHEAD_REFRESH_INTERVAL_SECONDS,
+    ):
+        self.engine = engine
+        self.index = index
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh_once(self) -> bool:
+        """Reconstrói se o índice está vazio ou desatualizado. Retorna se reconstruiu."""
+        async with AsyncSession(self.engine) as session:
+            if self.index.loaded and await names_version(session) == self.index.version:
+                return False
+            count = await load_index(session, self.index)
+        logger.info("Índice de sugestões montado com %s livro(s)", count)
+        return True
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.refresh_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Falha ao atualizar o índice de sugestões")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def build_refresher() -> TypeaheadRefresher:
+    from app.core.database import async_engine
+    return TypeaheadRefresher(async_engine)
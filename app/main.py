@@ -1,9 +1,17 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from app.core.assets import INDEX, ApiGZipMiddleware, static_assets
 from app.core.config import settings
-from app.core.database import create_db_and_tables
-from app.routers import auth, books, orders
+from app.core.idempotency import build_purger
+from app.core.inventory import build_sweeper
+from app.core.metrics import CONTENT_TYPE, MetricsMiddleware, render_metrics
+from app.core.outbox import build_dispatcher
+from app.core.query_tracer import QueryTracerMiddleware
+from app.core.security import password_hasher
+from app.core.typeahead import build_refresher
+from app.core.database import build_replica_monitor, engine
+from app.core.migrations import check_schema
+from app.routers import auth, books, orders, ops, reports
 import os
 
 app = FastAPI(
@@ -11,21 +19,65 @@ app = FastAPI(
     openapi_url=f"{settings.API_V1_STR}/openapi.json"
 )
 
-# Servir arquivos estáticos (CSS, JS)
+# Queries por requisição: headers de debug, aviso de N+1 e budgets dos testes
+app.add_middleware(QueryTracerMiddleware)
+
+# Latência, status e queries por rota, expostos em /metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Compressão das respostas grandes da API (exportações já comprimidas passam direto)
+if settings.GZIP_ENABLED:
+    app.add_middleware(ApiGZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE, compresslevel=settings.GZIP_LEVEL)
+
+# Servir arquivos estáticos (CSS, JS) com hash no nome, pré-comprimidos e cache longo
 # Assume que a pasta 'frontend' está na raiz do projeto
-app.mount("/static", StaticFiles(directory="frontend"), name="static")
+app.mount("/static", static_assets, name="static")
+
+outbox_dispatcher = build_dispatcher()
+hold_sweeper = build_sweeper()
+idempotency_purger = build_purger()
+replica_monitor = build_replica_monitor()
+typeahead_refresher = build_refresher()
 
-# Evento de inicialização para criar as tabelas
 @app.on_event("startup")
-def on_startup():
-    create_db_and_tables()
+async def on_startup():
+    # Evento de inicialização: confere a versão do schema (migra só se atrasado)
+    check_schema(engine)
+    static_assets.load()
+    password_hasher.start()
+    if settings.OUTBOX_DISPATCHER_ENABLED:
+        outbox_dispatcher.start()
+    if settings.HOLD_SWEEPER_ENABLED:
+        hold_sweeper.start()
+    idempotency_purger.start()
+    replica_monitor.start()
+    typeahead_refresher.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await outbox_dispatcher.stop()
+    await hold_sweeper.stop()
+    await idempotency_purger.stop()
+    await replica_monitor.stop()
+    await typeahead_refresher.stop()
+    password_hasher.shutdown()
 
 # Incluindo Rotas
 app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["auth"])
 app.include_router(books.router, prefix=f"{settings.API_V1_STR}/books", tags=["books"])
 app.include_router(orders.router, prefix=f"{settings.API_V1_STR}/orders", tags=["orders"])
+app.include_router(ops.router, prefix=f"{settings.API_V1_STR}/ops", tags=["ops"])
+app.include_router(reports.router, prefix=f"{settings.API_V1_STR}/reports", tags=["reports"])
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """Métricas no formato de texto do Prometheus."""
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=404)
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
 
 @app.get("/")
-def read_index():
-    return FileResponse("frontend/index.html")
+def read_index(request: Request):
+    return static_assets.response(INDEX, request.headers)
 
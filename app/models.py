@@ -1,9 +1,13 @@
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
+from sqlalchemy import Index, UniqueConstraint
 from sqlmodel import Field, Relationship, SQLModel
 
 # --- Tabela de Associação (Muitos-para-Muitos com Atributos Extras) ---
 class OrderItem(SQLModel, table=True):
+    # A PK (order_id, book_id) não serve buscas só por livro (vendas, remoção)
+    __table_args__ = (Index("ix_orderitem_book_id", "book_id"),)
+
     order_id: Optional[int] = Field(default=None, foreign_key="order.id", primary_key=True)
     book_id: Optional[int] = Field(default=None, foreign_key="book.id", primary_key=True)
     quantity: int = 1
@@ -36,26 +40,66 @@ class BookBase(SQLModel):
     title: str = Field(index=True)
     author: str
     description: Optional[str] = None
-    price: float
+    price: float = Field(index=True)
     stock_quantity: int = 0
 
 class Book(BookBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     order_items: List[OrderItem] = Relationship(back_populates="book") # Para relação M:N, mas na prática acessamos via Link se precisar
 
+class CatalogVersion(SQLModel, table=True):
+    """
+    Contadores de versão do catálogo (ver `app.core.catalog`).
+
+    id=1: incrementada a cada commit que altera livros, exceto UPDATEs só de
+    estoque marcados com `STOCK_ONLY` (reservas e liberações de pedidos).
+    id=2: incrementada só quando um título ou autor pode ter mudado (índice de sugestões).
+    """
+    id: int = Field(default=1, primary_key=True)
+    version: int = 0
+
 class BookCreate(BookBase):
     pass
 
 class BookRead(BookBase):
     id: int
 
+class BookSuggestion(SQLModel):
+    id: int
+    title: str
+    author: str
+
+class BulkImportError(SQLModel):
+    row: int  # número da linha de dados (sem contar o cabeçalho do CSV)
+    detail: str
+
+class BulkImportResult(SQLModel):
+    received: int = 0
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[BulkImportError] = Field(default_factory=list)
+    errors_truncated: bool = False  # mais erros que BULK_IMPORT_MAX_ERRORS
+
 # --- Pedido ---
 class OrderBase(SQLModel):
-    status: str = "pending" # pending, paid, shipped, cancelled
+    status: str = "pending" # pending, paid, shipped, cancelled, expired
 
 class Order(OrderBase, table=True):
+    # Histórico do usuário: filtro por user_id e ordenação por created_at
+    __table_args__ = (
+        Index("ix_order_user_id_created_at", "user_id", "created_at"),
+        # Varredura de reservas vencidas: status = 'pending' AND expires_at <= agora
+        Index("ix_order_status_expires_at", "status", "expires_at"),
+        # Exportação e relatórios por status em um intervalo de criação
+        Index("ix_order_status_created_at", "status", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Fim da reserva de estoque de um pedido pendente (None = sem prazo)
+    expires_at: Optional[datetime] = None
+    paid_at: Optional[datetime] = None  # dia da venda nos relatórios
     user_id: Optional[int] = Field(foreign_key="user.id")
     
     user: Optional[User] = Relationship(back_populates="orders")
@@ -71,4 +115,75 @@ class OrderItemRead(SQLModel):
 class OrderRead(OrderBase):
     id: int
     created_at: datetime
+    expires_at: Optional[datetime] = None
+    paid_at: Optional[datetime] = None
     items: List[OrderItemRead]
+
+# --- Outbox de Emails ---
+class EmailOutbox(SQLModel, table=True):
+    """Email pendente, gravado na mesma transação do usuário/pedido."""
+    __table_args__ = (Index("ix_emailoutbox_status_next_attempt", "status", "next_attempt_at"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    recipient: str
+    subject: str
+    body: str = ""
+    status: str = "pending" # pending, sending, sent, failed
+    attempts: int = 0
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    claim_token: Optional[str] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    sent_at: Optional[datetime] = None
+
+# --- Chaves de idempotência ---
+class IdempotencyKey(SQLModel, table=True):
+    """Resposta gravada de uma requisição com `Idempotency-Key`, reenviada nas repetições."""
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotencykey_user_key"),
+        Index("ix_idempotencykey_expires_at", "expires_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int
+    key: str
+    fingerprint: str  # método, rota e corpo da requisição original
+    status: str = "in_progress" # in_progress, done
+    response_status: Optional[int] = None
+    response_body: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime
+
+# --- Agregados de vendas (mantidos no pagamento, lidos pelos relatórios) ---
+class DailySales(SQLModel, table=True):
+    """Receita do dia (UTC) dos pedidos pagos."""
+    day: date = Field(primary_key=True)
+    orders: int = 0
+    units: int = 0
+    revenue: float = 0.0
+
+class BookSales(SQLModel, table=True):
+    """Vendas acumuladas por livro. Sem FK: o histórico sobrevive à remoção do livro."""
+    __table_args__ = (
+        Index("ix_booksales_units", "units"),
+        Index("ix_booksales_revenue", "revenue"),
+    )
+
+    book_id: int = Field(primary_key=True)
+    orders: int = 0
+    units: int = 0
+    revenue: float = 0.0
+
+class TopBookRead(SQLModel):
+    book_id: int
+    title: str
+    author: str
+    orders: int
+    units: int
+    revenue: float
+
+class AuthorSalesRead(SQLModel):
+    author: str
+    books: int
+    units: int
+    revenue: float
@@ -1,33 +1,129 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.database import get_session
+from app.core.bulk_import import BookImporter, detect_format, iter_lines, iter_records
+from app.core.cache import MISS
+from app.core.catalog import (
+    BOOK_COLUMNS, CATALOG_PIN, LIST_TAG, book_key, book_tag, catalog_entry, catalog_version,
+    get_catalog_cache, invalidate_books, list_key, may_cache, not_modified
+)
+from app.core.database import dialect_name, get_session, routed_read_session
+from app.core.export import export_response
+from app.core.fast_json import FastJSONResponse, dumps, rows_to_dicts
+from app.core.rate_limit import limit_catalog
+from app.core.pagination import NEXT_CURSOR_HEADER, apply_keyset, decode_cursor, split_page
+from app.core.search import apply_search
+from app.core.typeahead import ensure_loaded, typeahead_index
 from app.core.deps import get_current_user, get_current_active_superuser
-from app.models import Book, BookCreate, BookRead, User
+from app.models import Book, BookCreate, BookRead, BookSuggestion, BulkImportResult, User
 
 router = APIRouter()
 
-@router.get("/", response_model=List[BookRead])
-def read_books(
-    session: Session = Depends(get_session),
+# Ordenações estáveis suportadas pela paginação por cursor
+BOOK_SORTS = {"id": Book.id, "title": Book.title, "price": Book.price}
+
+async def _query_books(session: AsyncSession, offset: int, limit: int, search: Optional[str],
+                 sort: Optional[str], cursor: Optional[str]):
+    """Executa a listagem no banco e retorna (linhas de BOOK_COLUMNS, próximo cursor)."""
+    query = select(*(getattr(Book, column) for column in BOOK_COLUMNS))
+    if search and sort is None:
+        query = apply_search(query, search, dialect_name(session))
+        return (await session.exec(query.offset(offset).limit(limit))).all(), None
+
+    sort = sort or "id"
+    if search:
+        query = apply_search(query, search, dialect_name(session), rank=False)
+    position = decode_cursor(cursor, sort) if cursor else None
+    query = apply_keyset(query, BOOK_SORTS[sort], Book.id, position)
+
+    rows = (await session.exec(query.offset(offset).limit(limit + 1))).all()
+    return split_page(rows, limit, sort, sort)
+
+async def get_catalog_session(primary: AsyncSession = Depends(get_session)):
+    """Leituras do catálogo em uma réplica, exceto logo após uma escrita no catálogo neste processo."""
+    async with routed_read_session(primary, CATALOG_PIN) as session:
+        yield session
+
+def _not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@router.get("/", response_model=List[BookRead], dependencies=[Depends(limit_catalog)])
+async def read_books(
+    request: Request,
+    session: AsyncSession = Depends(get_catalog_session),
     offset: int = 0,
-    limit: int = Query(default=100, le=100),
-    search: Optional[str] = None
+    limit: int = Query(default=100, ge=1, le=100),
+    search: Optional[str] = None,
+    sort: Optional[Literal["id", "title", "price"]] = None,
+    cursor: Optional[str] = None,
 ):
     """
-    Lista livros com paginação e busca simples por título.
+    Lista livros com paginação e busca textual (título, autor e descrição).
+
+    Com `search` e sem `sort`, os resultados vêm ordenados por relevância
+    (paginação por offset). Nos demais casos a ordenação é estável por
+    `sort` + id e o header `X-Next-Cursor` traz o cursor da próxima página,
+    que deve ser enviado de volta em `cursor`.
+
+    O corpo é montado das tuplas de colunas e serializado uma vez com orjson;
+    o cache guarda os bytes prontos (com a versão do catálogo e o ETag), então
+    um hit não serializa nada e um `If-None-Match` atual vira `304` sem ler
+    livros. Com réplicas configuradas, a leitura vai para uma delas.
     """
-    query = select(Book)
-    if search:
-        query = query.where(Book.title.contains(search))
-    book_list = session.exec(query.offset(offset).limit(limit)).all()
-    return book_list
+    key = list_key(offset=offset, limit=limit, search=search, sort=sort, cursor=cursor)
+    version = await catalog_version(session)
+    cache = get_catalog_cache()
+    entry = cache.get(key)
+    if entry is MISS or entry.version < version:
+        generation = cache.generation()
+        rows, next_cursor = await _query_books(session, offset, limit, search, sort, cursor)
+        entry = catalog_entry(version, dumps(rows_to_dicts(BOOK_COLUMNS, rows)), next_cursor)
+        tags = [LIST_TAG] + [book_tag(row.id) for row in rows]
+        if may_cache(session):
+            cache.set(key, entry, tags=tags, generation=generation)
+
+    if not_modified(request, entry.etag):
+        return _not_modified_response(entry.etag)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if entry.next_cursor:
+        headers[NEXT_CURSOR_HEADER] = entry.next_cursor
+    return FastJSONResponse(entry.body, headers=headers)
+
+@router.get("/export", response_class=StreamingResponse, dependencies=[Depends(limit_catalog)])
+async def export_books(
+    session: AsyncSession = Depends(get_session),
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+):
+    """
+    Exporta o catálogo inteiro em NDJSON ou CSV (opcionalmente gzip),
+    em streaming a partir de um cursor no banco, em ordem de id.
+    """
+    query = select(*(getattr(Book, column) for column in BOOK_COLUMNS)).order_by(Book.id)
+    return export_response(session, query, BOOK_COLUMNS, format, gzip, "books")
+
+@router.get("/suggest", response_model=List[BookSuggestion], dependencies=[Depends(limit_catalog)])
+async def suggest_books(
+    session: AsyncSession = Depends(get_catalog_session),
+    q: str = "",
+    limit: int = Query(default=10, ge=1, le=20),
+):
+    """
+    Sugestões para o autocompletar: livros com uma palavra do título ou do
+    autor começando por `q` (sem diferenciar maiúsculas nem acentos).
+    Responde do índice em memória; o banco só é lido se o índice ainda não
+    foi montado neste processo.
+    """
+    await ensure_loaded(session)
+    return FastJSONResponse(typeahead_index.suggest(q, limit))
 
 @router.post("/", response_model=BookRead)
-def create_book(
+async def create_book(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     book_in: BookCreate,
     current_user: User = Depends(get_current_active_superuser),
 ):
@@ -36,28 +132,70 @@ def create_book(
     """
     book = Book.from_orm(book_in)
     session.add(book)
-    session.commit()
-    session.refresh(book)
+    await session.commit()
+    await session.refresh(book)
+    invalidate_books(book.id)
+    typeahead_index.add(book.id, book.title, book.author)
     return book
 
-@router.get("/{book_id}", response_model=BookRead)
-def read_book(
+@router.post("/bulk", response_model=BulkImportResult)
+async def import_books(
     *,
-    session: Session = Depends(get_session),
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    format: Optional[Literal["ndjson", "csv"]] = None,
+    upsert: bool = True,
+    current_user: User = Depends(get_current_active_superuser),
+):
+    """
+    Importa livros em massa (Apenas Admin).
+
+    O corpo é NDJSON (um livro por linha) ou CSV com cabeçalho, lido em
+    streaming e gravado em lotes. Com `upsert`, um livro com mesmo título e
+    autor é atualizado em vez de duplicado (melhor esforço: título e autor
+    não são únicos, ver `app.core.bulk_import`). Linhas inválidas não interrompem
+    a importação: vão para `errors` com o número da linha.
+    """
+    fmt = format or detect_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Envie NDJSON (application/x-ndjson) ou CSV (text/csv)"
+        )
+    importer = BookImporter(session, upsert=upsert)
+    return await importer.run(iter_records(iter_lines(request.stream()), fmt))
+
+@router.get("/{book_id}", response_model=BookRead, dependencies=[Depends(limit_catalog)])
+async def read_book(
+    *,
+    request: Request,
+    session: AsyncSession = Depends(get_catalog_session),
     book_id: int,
 ):
     """
-    Obtém detalhes de um livro pelo ID.
+    Obtém detalhes de um livro pelo ID. Aceita `If-None-Match` (`304`
+    enquanto o livro não muda; um livro inexistente é sempre `404`).
     """
-    book = session.get(Book, book_id)
-    if not book:
-        raise HTTPException(status_code=404, detail="Livro não encontrado")
-    return book
+    version = await catalog_version(session)
+    cache = get_catalog_cache()
+    entry = cache.get(book_key(book_id))
+    if entry is MISS or entry.version < version:
+        generation = cache.generation()
+        book = await session.get(Book, book_id)
+        if not book:
+            raise HTTPException(status_code=404, detail="Livro não encontrado")
+        entry = catalog_entry(version, dumps(BookRead.model_validate(book).model_dump()))
+        if may_cache(session):
+            cache.set(book_key(book_id), entry, tags=[book_tag(book_id)], generation=generation)
+
+    if not_modified(request, entry.etag):
+        return _not_modified_response(entry.etag)
+    return FastJSONResponse(entry.body, headers={"ETag": entry.etag, "Cache-Control": "no-cache"})
 
 @router.patch("/{book_id}", response_model=BookRead)
-def update_book(
+async def update_book(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     book_id: int,
     book_in: BookCreate, # Usando BookCreate para simplificar, mas poderia ser BookUpdate
     current_user: User = Depends(get_current_active_superuser),
@@ -65,7 +203,7 @@ def update_book(
     """
     Atualiza um livro (Apenas Admin).
     """
-    db_book = session.get(Book, book_id)
+    db_book = await session.get(Book, book_id)
     if not db_book:
         raise HTTPException(status_code=404, detail="Livro não encontrado")
     
@@ -74,24 +212,28 @@ def update_book(
         setattr(db_book, key, value)
         
     session.add(db_book)
-    session.commit()
-    session.refresh(db_book)
+    await session.commit()
+    await session.refresh(db_book)
+    invalidate_books(book_id)
+    typeahead_index.add(book_id, db_book.title, db_book.author)
     return db_book
 
 @router.delete("/{book_id}")
-def delete_book(
+async def delete_book(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     book_id: int,
     current_user: User = Depends(get_current_active_superuser),
 ):
     """
     Remove um livro (Apenas Admin).
     """
-    book = session.get(Book, book_id)
+    book = await session.get(Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Livro não encontrado")
     
-    session.delete(book)
-    session.commit()
+    await session.delete(book)
+    await session.commit()
+    invalidate_books(book_id)
+    typeahead_index.remove(book_id)
     return {"ok": True}
@@ -0,0 +1,56 @@
+from typing import Any, Dict
+from fastapi import APIRouter, Depends
+
+from app.core.cache import get_caches
+from app.core.database import pool_stats, replicas
+from app.core.deps import get_current_active_superuser
+from app.core.rate_limit import get_backend
+from app.core.security import password_hasher
+from app.models import User
+
+router = APIRouter()
+
+@router.get("/cache")
+async def read_cache_stats(
+    current_user: User = Depends(get_current_active_superuser),
+) -> Dict[str, Any]:
+    """
+    Estatísticas dos caches em processo (hits, misses, evictions) (Apenas Admin).
+    """
+    return {name: cache.stats() for name, cache in get_caches().items()}
+
+@router.get("/password-hasher")
+async def read_password_hasher_stats(
+    current_user: User = Depends(get_current_active_superuser),
+) -> Dict[str, int]:
+    """
+    Ocupação do pool de hashing de senhas (Apenas Admin).
+    """
+    return password_hasher.stats()
+
+@router.get("/database")
+async def read_database_pool_stats(
+    current_user: User = Depends(get_current_active_superuser),
+) -> Dict[str, Any]:
+    """
+    Conexões em uso e tempo de espera por conexão em cada pool (Apenas Admin).
+    """
+    return pool_stats()
+
+@router.get("/replicas")
+async def read_replica_stats(
+    current_user: User = Depends(get_current_active_superuser),
+) -> Dict[str, Any]:
+    """
+    Réplicas de leitura, saúde de cada uma e leituras roteadas (Apenas Admin).
+    """
+    return replicas.stats()
+
+@router.get("/rate-limit")
+async def read_rate_limit_stats(
+    current_user: User = Depends(get_current_active_superuser),
+) -> Dict[str, Any]:
+    """
+    Buckets em memória, requisições permitidas e recusadas (Apenas Admin).
+    """
+    return get_backend().stats()
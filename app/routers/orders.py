@@ -1,108 +1,256 @@
-from typing import List, Any
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlmodel import Session, select
-from pydantic import BaseModel
+from datetime import datetime, timedelta, timezone
+from typing import List, Any, Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import selectinload
+from sqlalchemy import or_, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from pydantic import BaseModel, Field
 
-from app.core.utils import send_email_log
-from app.core.database import get_session
-from app.core.deps import get_current_user
-from app.models import Order, OrderItem, OrderRead, User, Book
+from app.core.analytics import record_sale
+from app.core.catalog import BOOK_COLUMNS, invalidate_stock
+from app.core.config import settings
+from app.core.database import get_session, pin_to_primary, routed_read_session
+from app.core.deps import get_current_active_superuser, get_current_user
+from app.core.export import export_response
+from app.core.fast_json import FastJSONResponse, rows_to_dicts
+from app.core.idempotency import IDEMPOTENCY_HEADER, record_response, request_fingerprint, run_idempotent
+from app.core.inventory import merge_items, release_holds, reserve_stock
+from app.core.outbox import enqueue_email
+from app.core.pagination import NEXT_CURSOR_HEADER, apply_keyset, decode_cursor, split_page
+from app.models import Book, Order, OrderItem, OrderRead, User
 
 router = APIRouter()
 
 # Schema de entrada para criação de pedido
 class OrderItemInput(BaseModel):
     book_id: int
-    quantity: int
+    quantity: int = Field(gt=0)
 
 class OrderCreateRequest(BaseModel):
     items: List[OrderItemInput]
 
-@router.post("/", response_model=OrderRead)
-def create_order(
-    *,
-    session: Session = Depends(get_session),
-    order_in: OrderCreateRequest,
+def _writer_key(user: User) -> str:
+    return f"user:{user.id}"
+
+async def get_history_session(
     current_user: User = Depends(get_current_user),
-    background_tasks: BackgroundTasks
+    primary: AsyncSession = Depends(get_session),
 ):
+    """Histórico em uma réplica, exceto logo após o usuário criar ou pagar um pedido."""
+    async with routed_read_session(primary, _writer_key(current_user)) as session:
+        yield session
+
+# Carrega itens e livros em duas queries extras (total constante), em vez de
+# uma query por pedido e outra por item na serialização do OrderRead
+ORDER_EAGER_LOAD = selectinload(Order.items).selectinload(OrderItem.book)
+
+def _naive_utc(value: datetime) -> datetime:
+    """Datas com fuso são convertidas para UTC ingênuo, como `created_at` é gravado."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+async def _load_order(session: AsyncSession, order_id: int) -> Order:
+    query = (
+        select(Order)
+        .where(Order.id == order_id)
+        .options(ORDER_EAGER_LOAD)
+        .execution_options(populate_existing=True)
+    )
+    return (await session.exec(query)).one()
+
+async def _commit_order(session: AsyncSession, order_id: int) -> Order:
     """
-    Cria um pedido. Verifica estoque, deduz quantidades e gera itens do pedido.
+    Carrega o pedido para a resposta e faz o commit. A resposta é gravada na
+    Idempotency-Key (se houver) antes, na mesma transação.
     """
+    await session.flush()
+    order = await _load_order(session, order_id)
+    await record_response(session, order)
+    await session.commit()
+    return order
+
+# Header opcional das rotas que alteram pedidos: repetições com a mesma chave
+# recebem a resposta original em vez de criar/pagar de novo
+IdempotencyKeyHeader = Header(default=None, alias=IDEMPOTENCY_HEADER, max_length=255)
+
+async def _create_order(session: AsyncSession, order_in: OrderCreateRequest, current_user: User) -> Order:
+    """Reserva o estoque, cria o pedido e seus itens e enfileira o email."""
     if not order_in.items:
         raise HTTPException(status_code=400, detail="Pedido deve conter pelo menos um item")
 
-    # 1. Criar o pedido (status pendente)
-    order = Order(user_id=current_user.id, status="pending")
+    # 1. Baixa de estoque atômica (falha sem alterar nada)
+    quantities = merge_items(order_in.items)
+    books = await reserve_stock(session, quantities)
+
+    # 2. Criar o pedido (status pendente) e seus itens
+    order = Order(
+        user_id=current_user.id,
+        status="pending",
+        expires_at=datetime.utcnow() + timedelta(seconds=settings.ORDER_HOLD_TTL_SECONDS),
+    )
     session.add(order)
-    
-    # Precisamos commitar o Order antes para ter items? Depende se usamos list append.
-    # Vamos validar tudo antes de commitar qualquer coisa para atomicidade.
-    
-    # Mas para adicionar OrderItem com order_id, precisamos do order. 
-    # Session SQLModel gerencia isso se adicionarmos aos relacionamentos.
 
     total_value = 0.0
-
-    for item_in in order_in.items:
-        book = session.get(Book, item_in.book_id)
-        if not book:
-            raise HTTPException(status_code=404, detail=f"Livro {item_in.book_id} não encontrado")
-        
-        if book.stock_quantity < item_in.quantity:
-             raise HTTPException(
-                status_code=400, 
-                detail=f"Estoque insuficiente para o livro '{book.title}'. Restam apenas {book.stock_quantity}."
-            )
-        
-        # Deduzir estoque
-        book.stock_quantity -= item_in.quantity
-        session.add(book)
-        
-        # Criar item do pedido
+    for book_id, quantity in quantities.items():
+        book = books[book_id]
         order_item = OrderItem(
             order=order, # Link automatico sqlmodel
             book=book,   # Link automatico sqlmodel
-            quantity=item_in.quantity,
+            quantity=quantity,
             item_price=book.price
         )
         session.add(order_item)
-        total_value += book.price * item_in.quantity
-    
-    session.commit()
-    session.refresh(order)
+        total_value += book.price * quantity
+
+    # Flush para obter o id do pedido usado no email
+    await session.flush()
 
-    # Notificar usuário
-    background_tasks.add_task(
-        send_email_log,
+    # Notificar usuário (outbox, na mesma transação do pedido)
+    enqueue_email(
+        session,
         current_user.email,
         f"Confirmação de Pedido #{order.id}",
-        f"Seu pedido no valor de R$ {total_value:.2f} foi recebido e está aguardando pagamento."
+        f"Seu pedido no valor de R$ {total_value:.2f} foi recebido e está aguardando pagamento. "
+        f"Os itens ficam reservados até {order.expires_at:%d/%m/%Y %H:%M} (UTC)."
     )
 
+    order = await _commit_order(session, order.id)
+    invalidate_stock(*quantities)
     return order
 
-@router.get("/", response_model=List[OrderRead])
-def read_orders(
-    session: Session = Depends(get_session),
+@router.post("/", response_model=OrderRead)
+async def create_order(
+    *,
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    order_in: OrderCreateRequest,
     current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = IdempotencyKeyHeader,
 ):
     """
-    Lista os pedidos do usuário atual.
+    Cria um pedido. Reserva o estoque de todos os itens de uma vez
+    (linhas repetidas do mesmo livro são somadas) e gera os itens do pedido,
+    tudo em uma única transação. A reserva vale por `ORDER_HOLD_TTL_SECONDS`:
+    se o pedido não for pago até `expires_at`, o estoque volta ao catálogo.
+
+    Com o header `Idempotency-Key`, repetições da mesma requisição devolvem
+    o pedido já criado em vez de criar outro.
     """
-    return current_user.orders
+    pin_to_primary(_writer_key(current_user))
+    if idempotency_key is None:
+        return await _create_order(session, order_in, current_user)
+    return await run_idempotent(
+        session,
+        current_user.id,
+        idempotency_key,
+        request_fingerprint(request.method, request.url.path, order_in),
+        lambda: _create_order(session, order_in, current_user),
+        OrderRead,
+    )
 
-@router.post("/{order_id}/pay", response_model=OrderRead)
-def pay_order(
-    *,
-    session: Session = Depends(get_session),
-    order_id: int,
+# Campos do OrderRead e do OrderItemRead lidos como tuplas na listagem
+ORDER_COLUMNS = ["id", "status", "created_at", "expires_at", "paid_at"]
+ITEM_COLUMNS = ["book_id", "quantity", "item_price"]
+
+async def _order_list_payload(session: AsyncSession, rows) -> List[dict]:
+    """Monta os OrderRead (com itens e livros) das linhas de pedido, em uma query."""
+    orders = rows_to_dicts(ORDER_COLUMNS, rows)
+    by_id = {}
+    for order in orders:
+        order["items"] = []
+        by_id[order["id"]] = order
+    if not by_id:
+        return orders
+
+    book_columns = [getattr(Book, column) for column in BOOK_COLUMNS]
+    items = await session.exec(
+        select(OrderItem.order_id, *(getattr(OrderItem, column) for column in ITEM_COLUMNS), *book_columns)
+        .join(Book, Book.id == OrderItem.book_id)
+        .where(OrderItem.order_id.in_(list(by_id)))
+        .order_by(OrderItem.order_id, OrderItem.book_id)
+    )
+    split = 1 + len(ITEM_COLUMNS)
+    for row in items:
+        item = dict(zip(ITEM_COLUMNS, row[1:split]))
+        item["book"] = dict(zip(BOOK_COLUMNS, row[split:]))
+        by_id[row[0]]["items"].append(item)
+    return orders
+
+@router.get("/", response_model=List[OrderRead])
+async def read_orders(
+    session: AsyncSession = Depends(get_history_session),
     current_user: User = Depends(get_current_user),
+    status: Optional[Literal["pending", "paid", "shipped", "cancelled", "expired"]] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    limit: int = Query(default=50, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    """
+    Lista os pedidos do usuário atual, do mais recente para o mais antigo,
+    com filtros por status e intervalo de criação (`created_from` inclusivo,
+    `created_to` exclusivo). O header `X-Next-Cursor` traz o cursor da
+    próxima página. Pedidos, itens e livros vêm em duas queries, lidos como
+    tuplas e serializados direto em JSON (sem ORM nem revalidação).
+    Com réplicas configuradas, lê de uma delas, exceto por alguns segundos
+    depois de o usuário criar ou pagar um pedido (ler a própria escrita).
+    """
+    query = select(*(getattr(Order, column) for column in ORDER_COLUMNS)).where(Order.user_id == current_user.id)
+    if status:
+        query = query.where(Order.status == status)
+    if created_from:
+        query = query.where(Order.created_at >= _naive_utc(created_from))
+    if created_to:
+        query = query.where(Order.created_at < _naive_utc(created_to))
+
+    position = decode_cursor(cursor, "created_at") if cursor else None
+    query = apply_keyset(query, Order.created_at, Order.id, position, descending=True)
+
+    rows = (await session.exec(query.limit(limit + 1))).all()
+    rows, next_cursor = split_page(rows, limit, "created_at", "created_at")
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return FastJSONResponse(await _order_list_payload(session, rows), headers=headers)
+
+# Uma linha por item de pedido (pedido sem itens sai com as colunas do item vazias)
+EXPORT_COLUMNS = ["order_id", "user_id", "status", "created_at", "book_id", "quantity", "item_price"]
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_orders(
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_active_superuser),
+    status: Optional[Literal["pending", "paid", "shipped", "cancelled", "expired"]] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
 ):
     """
-    Simula o pagamento de um pedido.
+    Exporta os pedidos de todos os usuários, um item por linha, em NDJSON ou
+    CSV (opcionalmente gzip), em streaming (Apenas Admin). Aceita os mesmos
+    filtros da listagem.
     """
-    order = session.get(Order, order_id)
+    query = (
+        select(
+            Order.id, Order.user_id, Order.status, Order.created_at,
+            OrderItem.book_id, OrderItem.quantity, OrderItem.item_price,
+        )
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .order_by(Order.id, OrderItem.book_id)
+    )
+    if status:
+        query = query.where(Order.status == status)
+    if created_from:
+        query = query.where(Order.created_at >= _naive_utc(created_from))
+    if created_to:
+        query = query.where(Order.created_at < _naive_utc(created_to))
+    return export_response(session, query, EXPORT_COLUMNS, format, gzip, "orders")
+
+async def _pay_order(session: AsyncSession, order_id: int, current_user: User) -> Order:
+    """Converte a reserva do pedido em venda (`pending -> paid`)."""
+    order = await session.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
     
@@ -111,9 +259,60 @@ def pay_order(
         
     if order.status == "paid":
         raise HTTPException(status_code=400, detail="Pedido já está pago")
-        
-    order.status = "paid"
-    session.add(order)
-    session.commit()
-    session.refresh(order)
-    return order
+
+    expired_detail = "A reserva do pedido expirou, faça um novo pedido"
+    if order.status == "expired":
+        raise HTTPException(status_code=409, detail=expired_detail)
+    if order.status != "pending":
+        raise HTTPException(status_code=400, detail="Apenas pedidos pendentes podem ser pagos")
+
+    now = datetime.utcnow()
+    result = await session.exec(
+        update(Order)
+        .where(
+            Order.id == order_id,
+            Order.status == "pending",
+            or_(Order.expires_at.is_(None), Order.expires_at > now),
+        )
+        .values(status="paid", expires_at=None, paid_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        # Reserva vencida ainda não varrida: devolve o estoque agora
+        _, book_ids = await release_holds(session, [order_id])
+        await session.commit()
+        invalidate_stock(*book_ids)
+        raise HTTPException(status_code=409, detail=expired_detail)
+
+    # Relatórios: agregados de vendas na mesma transação do pagamento
+    await record_sale(session, order_id, now)
+    return await _commit_order(session, order_id)
+
+@router.post("/{order_id}/pay", response_model=OrderRead)
+async def pay_order(
+    *,
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    order_id: int,
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = IdempotencyKeyHeader,
+):
+    """
+    Simula o pagamento de um pedido, convertendo a reserva de estoque em venda.
+    A troca `pending -> paid` é condicional: um pedido cuja reserva já venceu
+    (ou que a varredura expirou ao mesmo tempo) não pode mais ser pago.
+
+    Com o header `Idempotency-Key`, uma repetição devolve a resposta do
+    primeiro pagamento em vez de `400 Pedido já está pago`.
+    """
+    pin_to_primary(_writer_key(current_user))
+    if idempotency_key is None:
+        return await _pay_order(session, order_id, current_user)
+    return await run_idempotent(
+        session,
+        current_user.id,
+        idempotency_key,
+        request_fingerprint(request.method, request.url.path),
+        lambda: _pay_order(session, order_id, current_user),
+        OrderRead,
+    )
@@ -0,0 +1,74 @@
+from datetime import date
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.database import get_session
+from app.core.deps import get_current_active_superuser
+from app.models import AuthorSalesRead, Book, BookSales, DailySales, TopBookRead
+
+# Todas as rotas leem só os agregados de app.core.analytics, nunca o histórico de pedidos
+router = APIRouter(dependencies=[Depends(get_current_active_superuser)])
+
+@router.get("/revenue", response_model=List[DailySales])
+async def read_daily_revenue(
+    session: AsyncSession = Depends(get_session),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(default=90, ge=1, le=366),
+):
+    """
+    Receita, pedidos e unidades vendidas por dia (UTC), do mais recente para
+    o mais antigo. `date_from` e `date_to` são inclusivos (Apenas Admin).
+    """
+    query = select(DailySales)
+    if date_from:
+        query = query.where(DailySales.day >= date_from)
+    if date_to:
+        query = query.where(DailySales.day <= date_to)
+    return (await session.exec(query.order_by(DailySales.day.desc()).limit(limit))).all()
+
+@router.get("/top-books", response_model=List[TopBookRead])
+async def read_top_books(
+    session: AsyncSession = Depends(get_session),
+    by: Literal["units", "revenue"] = "units",
+    limit: int = Query(default=10, ge=1, le=100),
+):
+    """
+    Livros mais vendidos por unidades ou receita (Apenas Admin). Livros
+    removidos do catálogo não aparecem.
+    """
+    order_column = BookSales.units if by == "units" else BookSales.revenue
+    rows = (await session.exec(
+        select(BookSales.book_id, Book.title, Book.author, BookSales.orders, BookSales.units, BookSales.revenue)
+        .join(Book, Book.id == BookSales.book_id)
+        .order_by(order_column.desc(), BookSales.book_id)
+        .limit(limit)
+    )).all()
+    return [TopBookRead(**row._mapping) for row in rows]
+
+@router.get("/authors", response_model=List[AuthorSalesRead])
+async def read_author_sales(
+    session: AsyncSession = Depends(get_session),
+    limit: int = Query(default=20, ge=1, le=100),
+):
+    """
+    Unidades e receita por autor, somando os agregados por livro (Apenas Admin).
+    O custo depende do tamanho do catálogo, não do número de pedidos.
+    """
+    units = func.sum(BookSales.units)
+    rows = (await session.exec(
+        select(
+            Book.author,
+            func.count(BookSales.book_id).label("books"),
+            units.label("units"),
+            func.sum(BookSales.revenue).label("revenue"),
+        )
+        .join(Book, Book.id == BookSales.book_id)
+        .group_by(Book.author)
+        .order_by(units.desc(), Book.author)
+        .limit(limit)
+    )).all()
+    return [AuthorSalesRead(**row._mapping) for row in rows]
@@ -0,0 +1,9 @@
+"""
+Benchmarks das jornadas principais da API (catálogo, cadastro/login,
+checkout, pagamento e histórico).
+
+    python -m benchmarks                           # app em processo (SQLite temporário)
+    python -m benchmarks --url http://127.0.0.1:8000
+    python -m benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks --baseline benchmarks/baseline.json --threshold 0.2
+"""
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+import httpx
+
+from benchmarks.harness import BenchConfig, RateLimited, compare, run_benchmarks
+from benchmarks.scenarios import SCENARIOS
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks das jornadas principais da API")
+    parser.add_argument("--url", help="API já rodando (ex.: http://127.0.0.1:8000); sem isso, app em processo")
+    parser.add_argument("--catalog-size", type=int, default=1000, help="livros criados antes da medição")
+    parser.add_argument("--users", type=int, default=10, help="compradores criados antes da medição")
+    parser.add_argument("--requests", type=int, default=200, help="iterações por cenário")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="roda só este cenário (repetível)")
+    parser.add_argument("--bcrypt-rounds", type=int, help="work factor do bcrypt no modo em processo")
+    parser.add_argument("--output", help="grava o relatório JSON neste arquivo")
+    parser.add_argument("--save-baseline", help="grava o relatório como baseline")
+    parser.add_argument("--baseline", help="compara com este baseline e falha em caso de regressão")
+    parser.add_argument("--threshold", type=float, default=0.2, help="tolerância de regressão (0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+
+async def run(args) -> dict:
+    config = BenchConfig(
+        catalog_size=args.catalog_size,
+        users=args.users,
+        requests=args.requests,
+        concurrency=args.concurrency,
+    )
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            return await run_benchmarks(client, SCENARIOS, config, only=args.scenario)
+
+    # Em processo: banco SQLite temporário, sem log de SQL e sem rate limit
+    # (todos os clientes simulados saem do mesmo "IP")
+    workdir = tempfile.mkdtemp(prefix="bookmarket-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("DB_ECHO", "false")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+
+    from app.core.database import create_db_and_tables
+    from app.core.security import password_hasher
+    from app.main import app
+
+    create_db_and_tables()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return await run_benchmarks(client, SCENARIOS, config, only=args.scenario)
+    finally:
+        password_hasher.shutdown()
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    try:
+        report = asyncio.run(run(args))
+    except RateLimited as exc:
+        print(f"Benchmark interrompido: {exc}", file=sys.stderr)
+        return 2
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as fp:
+            fp.write(output + "\n")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fp:
+            problems = compare(report, json.load(fp), args.threshold)
+        if problems:
+            print("\nRegressões em relação ao baseline:", file=sys.stderr)
+            for problem in problems:
+                print(f"  - {problem}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
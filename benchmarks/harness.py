@@ -0,0 +1,192 @@
+"""
+Execução dos cenários, estatísticas de latência e comparação com o baseline.
+"""
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+API = "/api/v1"
+
+RATE_LIMITED_HINT = (
+    "servidor respondeu 429 (rate limiting): rode a API medida com RATE_LIMIT_ENABLED=false, "
+    "já que todos os clientes simulados saem do mesmo IP"
+)
+
+
+class RateLimited(RuntimeError):
+    """O servidor medido está limitando as requisições: a medição não vale e é interrompida."""
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Percentil por posição (nearest-rank) de uma lista de amostras."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+@dataclass
+class BenchConfig:
+    catalog_size: int = 1000
+    users: int = 10
+    requests: int = 200  # requisições por cenário
+    concurrency: int = 10
+    seed: int = 42
+
+
+@dataclass
+class ScenarioResult:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        count = len(self.latencies) + self.errors
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "rps": round(count / self.elapsed, 2) if self.elapsed else 0.0,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 3),
+        }
+
+
+class BenchContext:
+    """Estado compartilhado pelos cenários: tokens, livros e pedidos criados."""
+
+    def __init__(self, client: httpx.AsyncClient, config: BenchConfig):
+        self.client = client
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.admin_headers: Dict[str, str] = {}
+        self.user_headers: List[Dict[str, str]] = []
+        self.book_ids: List[int] = []
+        self.search_terms: List[str] = []
+        self.pending_orders: List[tuple] = []  # (headers, order_id)
+
+    async def request(self, method: str, url: str, expected: int = 200, **kwargs) -> httpx.Response:
+        response = await self.client.request(method, url, **kwargs)
+        if response.status_code == 429:
+            raise RateLimited(f"{method} {url}: {RATE_LIMITED_HINT}")
+        if response.status_code != expected:
+            raise RuntimeError(f"{method} {url}: {response.status_code} {response.text[:200]}")
+        return response
+
+    async def login(self, email: str, password: str, **extra) -> Dict[str, str]:
+        response = await self.client.post(f"{API}/auth/register", json={"email": email, "password": password, **extra})
+        if response.status_code == 429:
+            raise RateLimited(f"POST {API}/auth/register: {RATE_LIMITED_HINT}")
+        response = await self.request(
+            "POST", f"{API}/auth/token", data={"username": email, "password": password}
+        )
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+Scenario = Callable[[BenchContext], Awaitable[None]]
+
+
+async def seed(ctx: BenchContext) -> None:
+    """Cria o admin, os compradores e o catálogo (via importação em massa)."""
+    run_id = uuid.uuid4().hex[:8]
+    ctx.admin_headers = await ctx.login(f"bench-admin-{run_id}@example.com", "bench", is_superuser=True)
+    ctx.user_headers = [
+        await ctx.login(f"bench-{run_id}-{i}@example.com", "bench") for i in range(ctx.config.users)
+    ]
+
+    words = ["aventura", "história", "romance", "ciência", "mistério", "viagem", "poesia", "guerra"]
+    ctx.search_terms = words
+    lines = []
+    for i in range(ctx.config.catalog_size):
+        word = words[i % len(words)]
+        lines.append(json.dumps({
+            "title": f"Livro {run_id} {i} {word}",
+            "author": f"Autor {i % 97}",
+            "description": f"Uma obra sobre {word} e {words[(i * 7) % len(words)]}.",
+            "price": round(10 + (i % 90) + 0.9, 2),
+            "stock_quantity": 1_000_000,
+        }))
+    await ctx.request(
+        "POST", f"{API}/books/bulk",
+        content="\n".join(lines).encode(),
+        headers={**ctx.admin_headers, "Content-Type": "application/x-ndjson"},
+    )
+
+    cursor = None
+    while len(ctx.book_ids) < ctx.config.catalog_size:
+        params = {"limit": 100, "search": run_id, "sort": "id"}
+        if cursor:
+            params["cursor"] = cursor
+        response = await ctx.request("GET", f"{API}/books/", params=params)
+        ctx.book_ids.extend(book["id"] for book in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+
+async def run_scenario(ctx: BenchContext, scenario: Scenario) -> ScenarioResult:
+    """Executa `config.requests` iterações do cenário com `config.concurrency` workers."""
+    result = ScenarioResult()
+    remaining = ctx.config.requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                await scenario(ctx)
+            except RateLimited:
+                raise
+            except Exception:
+                result.errors += 1
+            else:
+                result.latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(ctx.config.concurrency)))
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+async def run_benchmarks(
+    client: httpx.AsyncClient,
+    scenarios: Dict[str, Scenario],
+    config: BenchConfig,
+    only: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    ctx = BenchContext(client, config)
+    await seed(ctx)
+    report: Dict[str, Any] = {"config": config.__dict__, "scenarios": {}}
+    for name, scenario in scenarios.items():
+        if only and name not in only:
+            continue
+        report["scenarios"][name] = (await run_scenario(ctx, scenario)).summary()
+    return report
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Regressões em relação ao baseline: p95 mais de `threshold` acima, vazão
+    mais de `threshold` abaixo ou erros onde antes não havia.
+    """
+    problems = []
+    for name, base in baseline.get("scenarios", {}).items():
+        current = report["scenarios"].get(name)
+        if current is None:
+            continue
+        if base["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            problems.append(f"{name}: p95 {current['p95_ms']} ms > baseline {base['p95_ms']} ms")
+        if base["rps"] and current["rps"] < base["rps"] * (1 - threshold):
+            problems.append(f"{name}: {current['rps']} req/s < baseline {base['rps']} req/s")
+        if current["errors"] and not base["errors"]:
+            problems.append(f"{name}: {current['errors']} erro(s)")
+    return problems
@@ -0,0 +1,61 @@
+"""
+Cenários das jornadas principais. Cada um é uma iteração medida.
+"""
+import uuid
+
+from benchmarks.harness import API, BenchContext
+
+
+async def browse(ctx: BenchContext) -> None:
+    """Catálogo anônimo: página por offset e, às vezes, ordenação por preço."""
+    if ctx.random.random() < 0.5:
+        offset = ctx.random.randrange(0, max(1, ctx.config.catalog_size - 20))
+        await ctx.request("GET", f"{API}/books/", params={"offset": offset, "limit": 20})
+    else:
+        await ctx.request("GET", f"{API}/books/", params={"sort": "price", "limit": 20})
+
+
+async def book_detail(ctx: BenchContext) -> None:
+    await ctx.request("GET", f"{API}/books/{ctx.random.choice(ctx.book_ids)}")
+
+
+async def search(ctx: BenchContext) -> None:
+    term = ctx.random.choice(ctx.search_terms)
+    await ctx.request("GET", f"{API}/books/", params={"search": term[: ctx.random.randint(3, len(term))]})
+
+
+async def register_login(ctx: BenchContext) -> None:
+    await ctx.login(f"bench-{uuid.uuid4().hex}@example.com", "bench")
+
+
+async def checkout(ctx: BenchContext) -> None:
+    headers = ctx.random.choice(ctx.user_headers)
+    items = [
+        {"book_id": book_id, "quantity": ctx.random.randint(1, 3)}
+        for book_id in ctx.random.sample(ctx.book_ids, k=min(len(ctx.book_ids), ctx.random.randint(1, 3)))
+    ]
+    response = await ctx.request("POST", f"{API}/orders/", json={"items": items}, headers=headers)
+    ctx.pending_orders.append((headers, response.json()["id"]))
+
+
+async def pay(ctx: BenchContext) -> None:
+    if not ctx.pending_orders:
+        await checkout(ctx)
+    headers, order_id = ctx.pending_orders.pop()
+    await ctx.request("POST", f"{API}/orders/{order_id}/pay", headers=headers)
+
+
+async def order_history(ctx: BenchContext) -> None:
+    await ctx.request("GET", f"{API}/orders/", params={"limit": 20}, headers=ctx.random.choice(ctx.user_headers))
+
+
+# Ordem de execução: checkout antes de pay, que consome os pedidos pendentes
+SCENARIOS = {
+    "browse": browse,
+    "book_detail": book_detail,
+    "search": search,
+    "register_login": register_login,
+    "checkout": checkout,
+    "pay": pay,
+    "order_history": order_history,
+}
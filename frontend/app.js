@@ -78,6 +78,35 @@ searchInput.addEventListener('input', (e) => {
     });
 });
 
+// Autocompletar: sugestões do índice em memória da API, após uma pausa na digitação
+const searchSuggestions = document.getElementById('search-suggestions');
+let suggestTimer;
+
+searchInput.addEventListener('input', (e) => {
+    clearTimeout(suggestTimer);
+    const term = e.target.value.trim();
+    if (!term) {
+        searchSuggestions.innerHTML = '';
+        return;
+    }
+    suggestTimer = setTimeout(async () => {
+        try {
+            const response = await fetch(`${API_URL}/books/suggest?q=${encodeURIComponent(term)}&limit=8`);
+            if (!response.ok) return;
+            const suggestions = await response.json();
+            searchSuggestions.innerHTML = '';
+            suggestions.forEach(book => {
+                const option = document.createElement('option');
+                option.value = book.title;
+                option.label = book.author;
+                searchSuggestions.appendChild(option);
+            });
+        } catch (err) {
+            console.error('Erro ao buscar sugestões');
+        }
+    }, 150);
+});
+
 // Init
 if (token) {
     showDashboard();
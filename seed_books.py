@@ -2,6 +2,8 @@
 Script para popular o banco de dados com livros de exemplo.
 Execute: python seed_books.py
 """
+import json
+
 import requests
 
 API_URL = "http://127.0.0.1:8000/api/v1"
@@ -119,23 +121,31 @@ BOOKS = [
     }
 ]
 
-def add_books(token):
+def iter_ndjson(books):
+    # Uma linha JSON por livro: a API lê o corpo em streaming
+    for book in books:
+        yield (json.dumps(book, ensure_ascii=False) + "\n").encode("utf-8")
+
+def add_books(token, books=BOOKS):
     headers = {
         "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
+        "Content-Type": "application/x-ndjson"
     }
     
     print("\n📚 Adicionando livros ao catálogo...\n")
     
-    for book in BOOKS:
-        try:
-            response = requests.post(f"{API_URL}/books/", json=book, headers=headers)
-            if response.status_code == 200:
-                print(f"✅ '{book['title']}' adicionado com sucesso!")
-            else:
-                print(f"⚠️  Erro ao adicionar '{book['title']}': {response.text}")
-        except Exception as e:
-            print(f"❌ Erro ao adicionar '{book['title']}': {e}")
+    try:
+        # Uma única requisição; livros já existentes (título + autor) são atualizados
+        response = requests.post(f"{API_URL}/books/bulk", data=iter_ndjson(books), headers=headers)
+        if response.status_code == 200:
+            report = response.json()
+            print(f"✅ {report['inserted']} livro(s) adicionado(s), {report['updated']} atualizado(s)")
+            for error in report["errors"]:
+                print(f"⚠️  Linha {error['row']}: {error['detail']}")
+        else:
+            print(f"⚠️  Erro ao importar livros: {response.text}")
+    except Exception as e:
+        print(f"❌ Erro ao importar livros: {e}")
     
     print("\n🎉 Processo concluído!")
 
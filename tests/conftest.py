@@ -1,36 +1,115 @@
+import contextlib
+import os
 import pytest
-from typing import Generator
 from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlmodel import Session, SQLModel, create_engine
-from sqlmodel.pool import StaticPool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+# Work factor mínimo do bcrypt para os testes não ficarem lentos
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# Os testes fazem muitos logins do mesmo IP; test_rate_limit liga o limite
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
 
 from app.main import app
-from app.core.database import get_session
+from app.core.cache import clear_caches
+from app.core.database import apply_sqlite_pragmas, async_database_url, get_session
+from app.core.query_tracer import observe_requests
+from app.core.rate_limit import get_backend
+from app.core.typeahead import typeahead_index
+
+@pytest.fixture(name="engine")
+def engine_fixture(tmp_path):
+    """
+    Banco SQLite em arquivo temporário (isolado por teste). Um arquivo, e não
+    memória, para que a engine síncrona dos testes e a assíncrona da API
+    enxerguem os mesmos dados.
+    """
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.db'}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+    )
+    apply_sqlite_pragmas(engine)
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
 
-# Banco de dados em memória para testes (isolado e rápido)
-engine = create_engine(
-    "sqlite://", 
-    connect_args={"check_same_thread": False}, 
-    poolclass=StaticPool
-)
+@pytest.fixture(name="async_engine")
+def async_engine_fixture(engine):
+    """
+    Engine assíncrona sobre o mesmo arquivo. NullPool porque o TestClient
+    abre um event loop por requisição e conexões aiosqlite não devem
+    atravessar loops.
+    """
+    async_engine = create_async_engine(
+        async_database_url(engine.url.render_as_string()),
+        connect_args={"timeout": 30},
+        poolclass=NullPool,
+    )
+    apply_sqlite_pragmas(async_engine)
+    yield async_engine
+    async_engine.sync_engine.dispose()
 
 @pytest.fixture(name="session")
-def session_fixture():
-    """Cria as tabelas e retorna uma sessão para o teste."""
-    SQLModel.metadata.create_all(engine)
+def session_fixture(engine):
+    """Sessão síncrona para preparar e verificar dados nos testes."""
     with Session(engine) as session:
         yield session
-    SQLModel.metadata.drop_all(engine)
 
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
+def client_fixture(async_engine):
     """
-    Substitui a dependência get_session pela sessão de teste e retorna o client.
+    Substitui a dependência get_session por sessões no banco de teste e retorna o client.
     """
-    def get_session_override():
-        return session
+    async def get_session_override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
 
     app.dependency_overrides[get_session] = get_session_override
+    clear_caches()
+    get_backend().clear()
+    typeahead_index.clear()
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
+    clear_caches()
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "query_budget(n): nenhuma requisição do teste pode passar de n queries"
+    )
+
+@contextlib.contextmanager
+def assert_query_budget(limit: int):
+    """Coleta (método, rota, trace) das requisições do bloco e falha se alguma passar de `limit` queries."""
+    requests = []
+    with observe_requests(lambda method, route, trace: requests.append((method, route, trace))):
+        yield requests
+    over = [(method, route, trace) for method, route, trace in requests if trace.queries > limit]
+    if over:
+        lines = [f"Budget de {limit} queries por requisição estourado:"]
+        for method, route, trace in over:
+            lines.append(f"  {method} {route}: {trace.queries} queries")
+            for statement, count in trace.shapes.most_common(3):
+                lines.append(f"    {count}x {' '.join(statement.split())[:200]}")
+        pytest.fail("\n".join(lines))
+
+@pytest.fixture(name="query_budget")
+def query_budget_fixture():
+    """
+    Limite de queries por requisição em um bloco do teste:
+
+        with query_budget(3) as requests:
+            client.get("/api/v1/orders/", headers=headers)
+    """
+    return assert_query_budget
+
+@pytest.fixture(autouse=True)
+def _query_budget_marker(request):
+    marker = request.node.get_closest_marker("query_budget")
+    if marker is None:
+        yield
+        return
+    with assert_query_budget(marker.args[0]):
+        yield
@@ -0,0 +1,57 @@
+import gzip
+import re
+
+from fastapi.testclient import TestClient
+
+from app.core.assets import build_assets, negotiate, write_assets
+
+
+def test_index_references_fingerprinted_immutable_assets(client: TestClient):
+    index = client.get("/")
+    assert index.headers["cache-control"] == "no-cache"
+    script = re.search(r'/static/app\.[0-9a-f]{12}\.js', index.text).group(0)
+    assert re.search(r'/static/style\.[0-9a-f]{12}\.css', index.text)
+
+    resp = client.get(script, headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["vary"] == "Accept-Encoding"
+    assert resp.headers["content-type"].startswith("text/javascript")
+
+    cached = client.get(script, headers={"Accept-Encoding": "gzip", "If-None-Match": resp.headers["etag"]})
+    assert cached.status_code == 304
+
+    plain = client.get(script, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] != resp.headers["etag"]
+    assert plain.content == resp.content  # httpx descomprime o gzip
+
+
+def test_negotiate_prefers_brotli_and_respects_q_zero():
+    assert negotiate("gzip, deflate, br", {"identity", "gzip", "br"}) == "br"
+    assert negotiate("gzip, br;q=0", {"identity", "gzip", "br"}) == "gzip"
+    assert negotiate("br", {"identity", "gzip"}) == "identity"
+    assert negotiate("", {"identity", "gzip"}) == "identity"
+
+
+def test_build_and_write_assets(tmp_path):
+    source = tmp_path / "src"
+    (source / "js").mkdir(parents=True)
+    (source / "js" / "app.js").write_text("console.log('x');\n" * 200)
+    (source / "index.html").write_text('<script src="/static/js/app.js"></script>')
+
+    bundle = build_assets(str(source))
+    fingerprinted = bundle.manifest["js/app.js"]
+    assert re.fullmatch(r"js/app\.[0-9a-f]{12}\.js", fingerprinted)
+
+    output = tmp_path / "out"
+    write_assets(bundle, str(output))
+    assert (output / "index.html").read_text() == f'<script src="/static/{fingerprinted}"></script>'
+    assert gzip.decompress((output / (fingerprinted + ".gz")).read_bytes()) == (source / "js" / "app.js").read_bytes()
+
+
+def test_large_api_responses_are_gzipped(client: TestClient):
+    resp = client.get("/api/v1/openapi.json", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.json()["info"]["title"]
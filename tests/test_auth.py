@@ -1,4 +1,15 @@
+import asyncio
+
+import pytest
 from fastapi.testclient import TestClient
+from passlib.exc import UnknownHashError
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+from app.core.cache import clear_caches
+from app.core.config import settings
+from app.core.security import password_hasher
+from app.models import User
 
 def test_register_user(client: TestClient):
     response = client.post(
@@ -43,3 +54,67 @@ def test_login_wrong_password(client: TestClient):
         data={"username": "wrong@example.com", "password": "wrongpassword"}
     )
     assert response.status_code == 400
+
+def get_token(client: TestClient, email: str) -> dict:
+    client.post(
+        "/api/v1/auth/register",
+        json={"email": email, "password": "password123"}
+    )
+    resp = client.post(
+        "/api/v1/auth/token",
+        data={"username": email, "password": "password123"}
+    )
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+def test_current_user_is_cached(client: TestClient, session: Session):
+    headers = get_token(client, "cached@example.com")
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+
+    # Remoção direta via SQL não dispara invalidação: o usuário vem do cache
+    session.exec(text("DELETE FROM user WHERE email = 'cached@example.com'"))
+    session.commit()
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+
+def test_deactivated_user_is_invalidated(client: TestClient, session: Session):
+    headers = get_token(client, "inactive@example.com")
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 200
+
+    user = session.exec(select(User).where(User.email == "inactive@example.com")).one()
+    user.is_active = False
+    session.add(user)
+    session.commit()
+
+    response = client.get("/api/v1/auth/me", headers=headers)
+    assert response.status_code == 400
+
+def test_trust_token_claims(client: TestClient, session: Session, monkeypatch):
+    headers = get_token(client, "claims@example.com")
+    monkeypatch.setattr(settings, "TRUST_TOKEN_CLAIMS", True)
+    clear_caches()
+
+    session.exec(text("DELETE FROM user WHERE email = 'claims@example.com'"))
+    session.commit()
+    response = client.get("/api/v1/auth/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["email"] == "claims@example.com"
+
+def test_password_hasher_stats(client: TestClient, session: Session):
+    get_token(client, "hasher@example.com")
+    user = session.exec(select(User).where(User.email == "hasher@example.com")).one()
+    user.is_superuser = True
+    session.add(user)
+    session.commit()
+    headers = get_token(client, "hasher@example.com")
+
+    stats = client.get("/api/v1/ops/password-hasher", headers=headers).json()
+    assert stats["completed"] >= 3
+    assert stats["in_flight"] == 0
+    assert stats["queued"] == 0
+
+    # Falhas (ex.: hash corrompido no banco) não contam como concluídas
+    with pytest.raises(UnknownHashError):
+        asyncio.run(password_hasher.verify("senha", "hash-invalido"))
+    after = client.get("/api/v1/ops/password-hasher", headers=headers).json()
+    assert after["failed"] == stats["failed"] + 1
+    assert after["completed"] == stats["completed"]
+    assert after["in_flight"] == 0
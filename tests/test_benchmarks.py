@@ -0,0 +1,53 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.main import app
+from benchmarks.harness import BenchConfig, RateLimited, compare, percentile, run_benchmarks
+from benchmarks.scenarios import SCENARIOS
+
+
+def test_percentile_nearest_rank():
+    samples = [float(i) for i in range(1, 101)]
+    assert percentile(samples, 50) == 50.0
+    assert percentile(samples, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+def test_compare_flags_regressions():
+    baseline = {"scenarios": {"browse": {"p95_ms": 10.0, "rps": 100.0, "errors": 0}}}
+    ok = {"scenarios": {"browse": {"p95_ms": 11.0, "rps": 95.0, "errors": 0}}}
+    slow = {"scenarios": {"browse": {"p95_ms": 13.0, "rps": 70.0, "errors": 2}}}
+
+    assert compare(ok, baseline, 0.2) == []
+    assert len(compare(slow, baseline, 0.2)) == 3
+
+
+def test_smoke_run_all_scenarios(client):
+    # `client` instala o override de sessão para o banco de teste
+    config = BenchConfig(catalog_size=20, users=2, requests=4, concurrency=2)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            return await run_benchmarks(http, SCENARIOS, config)
+
+    report = asyncio.run(run())
+    assert set(report["scenarios"]) == set(SCENARIOS)
+    for name, summary in report["scenarios"].items():
+        assert summary["errors"] == 0, name
+        assert summary["requests"] == 4
+
+
+def test_rate_limited_server_aborts_run():
+    def limited(request):
+        return httpx.Response(429, json={"detail": "Too Many Requests"})
+
+    async def run():
+        transport = httpx.MockTransport(limited)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            return await run_benchmarks(http, SCENARIOS, BenchConfig(catalog_size=1, users=1, requests=1))
+
+    with pytest.raises(RateLimited, match="RATE_LIMIT_ENABLED=false"):
+        asyncio.run(run())
@@ -0,0 +1,376 @@
+import asyncio
+import csv
+import io
+import json
+
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from app.core.catalog import STOCK_ONLY
+from app.core.config import settings
+from app.core.pagination import encode_cursor
+from app.core import typeahead
+from app.core.typeahead import TypeaheadIndex, TypeaheadRefresher, ensure_loaded
+from app.models import Book, CatalogVersion
+
+def get_admin_headers(client: TestClient, email: str = "admin@example.com") -> dict:
+    # Helper para registrar e logar um admin
+    client.post(
+        "/api/v1/auth/register",
+        json={"email": email, "password": "pass", "is_superuser": True}
+    )
+    resp = client.post(
+        "/api/v1/auth/token",
+        data={"username": email, "password": "pass"}
+    )
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+def create_book(client: TestClient, headers: dict, **fields) -> dict:
+    data = {"author": "Autor", "price": 10.0, "stock_quantity": 5}
+    data.update(fields)
+    resp = client.post("/api/v1/books/", json=data, headers=headers)
+    assert resp.status_code == 200
+    return resp.json()
+
+def test_search_title_author_and_description(client: TestClient):
+    headers = get_admin_headers(client)
+    hobbit = create_book(client, headers, title="O Hobbit", author="J.R.R. Tolkien")
+    anel = create_book(
+        client, headers, title="A Sociedade do Anel", author="Outro",
+        description="Continuação do universo de Tolkien"
+    )
+    create_book(client, headers, title="Dom Casmurro", author="Machado de Assis")
+
+    resp = client.get("/api/v1/books/", params={"search": "tolkien"})
+    assert resp.status_code == 200
+    ids = [book["id"] for book in resp.json()]
+    assert set(ids) == {hobbit["id"], anel["id"]}
+
+    # Prefixo e acentos são ignorados
+    resp = client.get("/api/v1/books/", params={"search": "casmu"})
+    assert [book["title"] for book in resp.json()] == ["Dom Casmurro"]
+
+def test_search_ranks_by_relevance(client: TestClient):
+    headers = get_admin_headers(client)
+    create_book(client, headers, title="Receitas", description="Um livro que cita python uma vez")
+    best = create_book(client, headers, title="Python Python", author="Python")
+
+    resp = client.get("/api/v1/books/", params={"search": "python"})
+    assert resp.json()[0]["id"] == best["id"]
+
+def test_search_index_follows_updates_and_deletes(client: TestClient):
+    headers = get_admin_headers(client)
+    book = create_book(client, headers, title="Titulo Antigo")
+
+    client.patch(
+        f"/api/v1/books/{book['id']}",
+        json={"title": "Titulo Novo", "author": "Autor", "price": 10.0},
+        headers=headers
+    )
+    assert client.get("/api/v1/books/", params={"search": "antigo"}).json() == []
+    assert len(client.get("/api/v1/books/", params={"search": "novo"}).json()) == 1
+
+    client.delete(f"/api/v1/books/{book['id']}", headers=headers)
+    assert client.get("/api/v1/books/", params={"search": "novo"}).json() == []
+
+def test_cursor_pagination_by_price(client: TestClient):
+    headers = get_admin_headers(client)
+    prices = [30.0, 10.0, 20.0, 10.0, 50.0]
+    for i, price in enumerate(prices):
+        create_book(client, headers, title=f"Livro {i}", price=price)
+
+    seen = []
+    params = {"sort": "price", "limit": 2}
+    while True:
+        resp = client.get("/api/v1/books/", params=params)
+        assert resp.status_code == 200
+        seen.extend(resp.json())
+        next_cursor = resp.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            break
+        params["cursor"] = next_cursor
+
+    assert [book["price"] for book in seen] == sorted(prices)
+    assert len({book["id"] for book in seen}) == len(prices)
+
+def test_cursor_must_match_sort(client: TestClient):
+    headers = get_admin_headers(client)
+    for i in range(3):
+        create_book(client, headers, title=f"Livro {i}")
+
+    resp = client.get("/api/v1/books/", params={"sort": "title", "limit": 1})
+    cursor = resp.headers["X-Next-Cursor"]
+
+    resp = client.get("/api/v1/books/", params={"sort": "price", "cursor": cursor})
+    assert resp.status_code == 400
+    resp = client.get("/api/v1/books/", params={"cursor": "lixo"})
+    assert resp.status_code == 400
+
+    # Valor adulterado (tipo errado para a coluna) e limites inválidos
+    tampered = encode_cursor("price", "abc", 1)
+    assert client.get("/api/v1/books/", params={"sort": "price", "cursor": tampered}).status_code == 400
+    assert client.get("/api/v1/books/", params={"sort": "title", "cursor": encode_cursor("title", 5, 1)}).status_code == 400
+    assert client.get("/api/v1/books/", params={"limit": 0}).status_code == 422
+    assert client.get("/api/v1/books/", params={"limit": -1}).status_code == 422
+
+def test_cursor_pagination_by_title(client: TestClient):
+    headers = get_admin_headers(client)
+    titles = ["Carmen", "Alice", "Beto", "Alice", "Dora"]
+    for title in titles:
+        create_book(client, headers, title=title)
+
+    seen = []
+    params = {"sort": "title", "limit": 2}
+    while True:
+        resp = client.get("/api/v1/books/", params=params)
+        assert resp.status_code == 200
+        seen.extend(resp.json())
+        next_cursor = resp.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            break
+        params["cursor"] = next_cursor
+
+    assert [book["title"] for book in seen] == sorted(titles)
+    assert len({book["id"] for book in seen}) == len(titles)
+
+def test_catalog_cache_hits_and_invalidation(client: TestClient):
+    headers = get_admin_headers(client)
+    book = create_book(client, headers, title="Cacheado", stock_quantity=3)
+
+    before = client.get("/api/v1/ops/cache", headers=headers).json()["catalog"]
+    client.get(f"/api/v1/books/{book['id']}")
+    client.get(f"/api/v1/books/{book['id']}")
+    after = client.get("/api/v1/ops/cache", headers=headers).json()["catalog"]
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 1
+
+    # Edição invalida o livro e as listagens
+    client.get("/api/v1/books/")
+    client.patch(
+        f"/api/v1/books/{book['id']}",
+        json={"title": "Editado", "author": "Autor", "price": 12.0, "stock_quantity": 3},
+        headers=headers
+    )
+    assert client.get(f"/api/v1/books/{book['id']}").json()["title"] == "Editado"
+    assert client.get("/api/v1/books/").json()[0]["price"] == 12.0
+
+    # Baixa de estoque por pedido também invalida
+    client.post(
+        "/api/v1/orders/",
+        json={"items": [{"book_id": book["id"], "quantity": 2}]},
+        headers=headers
+    )
+    assert client.get(f"/api/v1/books/{book['id']}").json()["stock_quantity"] == 1
+    assert client.get("/api/v1/books/").json()[0]["stock_quantity"] == 1
+
+def test_bulk_import_ndjson_upserts_and_reports_errors(client: TestClient, monkeypatch):
+    headers = get_admin_headers(client, email="bulk@example.com")
+    existing = create_book(client, headers, title="Dom Casmurro", author="Machado de Assis", price=30.0)
+    # Lotes pequenos para exercitar várias transações
+    monkeypatch.setattr(settings, "BULK_IMPORT_BATCH_SIZE", 2)
+
+    lines = [
+        {"title": "Dom Casmurro", "author": "Machado de Assis", "price": 35.0, "stock_quantity": 7},
+        {"title": "Iracema", "author": "José de Alencar", "price": 20.0},
+        {"title": "Sem preço", "author": "Ninguém"},
+        "{não é json",
+        {"title": "O Cortiço", "author": "Aluísio Azevedo", "price": 25.0, "stock_quantity": 3},
+        {"title": "Iracema", "author": "José de Alencar", "price": 22.0},
+    ]
+    body = "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+    resp = client.post(
+        "/api/v1/books/bulk",
+        content=body.encode(),
+        headers={**headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert resp.status_code == 200
+    report = resp.json()
+    assert (report["received"], report["inserted"], report["updated"], report["failed"]) == (6, 2, 2, 2)
+    assert [error["row"] for error in report["errors"]] == [3, 4]
+    assert "price" in report["errors"][0]["detail"]
+
+    assert client.get(f"/api/v1/books/{existing['id']}").json()["stock_quantity"] == 7
+    titles = [book["title"] for book in client.get("/api/v1/books/").json()]
+    assert sorted(titles) == ["Dom Casmurro", "Iracema", "O Cortiço"]
+    iracema = client.get("/api/v1/books/", params={"search": "iracema"}).json()
+    assert [book["price"] for book in iracema] == [22.0]
+
+def test_bulk_import_upsert_updates_oldest_duplicate(client: TestClient):
+    headers = get_admin_headers(client, email="dup@example.com")
+    # Título e autor não são únicos: o upsert atualiza só o livro mais antigo
+    first = create_book(client, headers, title="Helena", author="Machado de Assis", price=10.0)
+    second = create_book(client, headers, title="Helena", author="Machado de Assis", price=11.0)
+
+    body = json.dumps({"title": "Helena", "author": "Machado de Assis", "price": 15.0})
+    resp = client.post(
+        "/api/v1/books/bulk", content=body.encode(), headers={**headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert (resp.json()["inserted"], resp.json()["updated"]) == (0, 1)
+    assert client.get(f"/api/v1/books/{first['id']}").json()["price"] == 15.0
+    assert client.get(f"/api/v1/books/{second['id']}").json()["price"] == 11.0
+
+def test_bulk_import_csv_with_quoted_newlines(client: TestClient):
+    headers = get_admin_headers(client, email="csv@example.com")
+    body = (
+        "title,author,description,price,stock_quantity\r\n"
+        'Memórias Póstumas,Machado de Assis,"Defunto autor,\nnão autor defunto",40.5,2\r\n'
+        "Vidas Secas,Graciliano Ramos,,18,abc\r\n"
+        "Capitães da Areia,Jorge Amado,,27.9,4\r\n"
+    )
+    resp = client.post(
+        "/api/v1/books/bulk",
+        content=body.encode(),
+        headers={**headers, "Content-Type": "text/csv"}
+    )
+    report = resp.json()
+    assert (report["inserted"], report["failed"]) == (2, 1)
+    assert report["errors"][0]["row"] == 2
+
+    books = {book["title"]: book for book in client.get("/api/v1/books/").json()}
+    assert books["Memórias Póstumas"]["description"] == "Defunto autor,\nnão autor defunto"
+    assert books["Capitães da Areia"]["description"] is None
+
+    resp = client.post(
+        "/api/v1/books/bulk", content=b"x", headers={**headers, "Content-Type": "text/plain"}
+    )
+    assert resp.status_code == 415
+
+def test_export_books_streams_ndjson_csv_and_gzip(client: TestClient, monkeypatch):
+    headers = get_admin_headers(client, email="export@example.com")
+    for i in range(5):
+        create_book(client, headers, title=f"Livro {i}", description="a, \"b\"" if i == 0 else None)
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+
+    resp = client.get("/api/v1/books/export")
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [row["title"] for row in rows] == [f"Livro {i}" for i in range(5)]
+    assert rows[0]["description"] == "a, \"b\""
+
+    resp = client.get("/api/v1/books/export", params={"format": "csv", "gzip": True})
+    assert resp.headers["content-encoding"] == "gzip"
+    lines = list(csv.reader(io.StringIO(resp.text)))
+    assert lines[0] == ["id", "title", "author", "description", "price", "stock_quantity"]
+    assert len(lines) == 6
+    assert lines[1][3] == "a, \"b\""
+
+def test_conditional_reads_follow_catalog_version(client: TestClient, session, query_budget):
+    headers = get_admin_headers(client, email="etag@example.com")
+    book = create_book(client, headers, title="Versionado")
+
+    listing = client.get("/api/v1/books/", params={"search": "versionado"})
+    detail = client.get(f"/api/v1/books/{book['id']}")
+    assert listing.headers["etag"] != detail.headers["etag"]
+
+    # Nada mudou: 304 sem ler livros (a versão está em memória)
+    with query_budget(0):
+        again = client.get("/api/v1/books/", params={"search": "versionado"},
+                           headers={"If-None-Match": listing.headers["etag"]})
+        detail_again = client.get(f"/api/v1/books/{book['id']}",
+                                  headers={"If-None-Match": detail.headers["etag"]})
+    assert again.status_code == 304 and again.content == b""
+    assert detail_again.status_code == 304
+
+    # Baixa de estoque por um pedido muda o corpo (e o ETag), sem tocar no contador de versão
+    version = session.get(CatalogVersion, 1).version
+    client.post("/api/v1/orders/", json={"items": [{"book_id": book["id"], "quantity": 1}]}, headers=headers)
+    changed = client.get(f"/api/v1/books/{book['id']}", headers={"If-None-Match": detail.headers["etag"]})
+    assert changed.status_code == 200
+    assert changed.json()["stock_quantity"] == book["stock_quantity"] - 1
+    assert changed.headers["etag"] != detail.headers["etag"]
+    session.expire_all()
+    assert session.get(CatalogVersion, 1).version == version
+
+    # Escrita de outro processo (aqui, sessão síncrona sem invalidar o cache): a
+    # versão sobe no banco e a entrada em cache, lida na versão anterior, é descartada
+    db_book = session.get(Book, book["id"])
+    db_book.price = 99.0
+    session.add(db_book)
+    session.commit()
+    session.expire_all()
+    assert session.get(CatalogVersion, 1).version == version + 1
+    fresh = client.get(f"/api/v1/books/{book['id']}", headers={"If-None-Match": changed.headers["etag"]})
+    assert fresh.status_code == 200
+    assert fresh.json()["price"] == 99.0
+
+    # `If-None-Match: *` não vale para livro inexistente
+    assert client.get("/api/v1/books/999", headers={"If-None-Match": "*"}).status_code == 404
+    assert client.get(f"/api/v1/books/{book['id']}", headers={"If-None-Match": "*"}).status_code == 304
+
+def test_typeahead_index_prefix_accents_and_updates():
+    index = TypeaheadIndex()
+    index.build([(1, "O Senhor dos Anéis", "J. R. R. Tolkien"), (2, "Senhora", "José de Alencar")])
+
+    assert [book["id"] for book in index.suggest("senh")] == [1, 2]
+    assert [book["id"] for book in index.suggest("ANEIS")] == [1]  # início de palavra, sem acento
+    assert [book["id"] for book in index.suggest("jose de")] == [2]
+    assert index.suggest("nhor") == []  # só prefixo de palavra
+    assert index.suggest("  ") == []
+    assert len(index.suggest("s", limit=1)) == 1
+
+    index.add(2, "Iracema", "José de Alencar")
+    assert [book["id"] for book in index.suggest("senh")] == [1]
+    index.remove(1)
+    assert index.suggest("senh") == []
+    assert index.stats()["books"] == 1
+
+def test_suggest_endpoint_follows_book_writes_without_queries(client: TestClient, query_budget):
+    headers = get_admin_headers(client, email="suggest@example.com")
+    dom = create_book(client, headers, title="Dom Casmurro", author="Machado de Assis")
+    create_book(client, headers, title="Memórias Póstumas de Brás Cubas", author="Machado de Assis")
+
+    # Primeira chamada monta o índice; as seguintes não consultam o banco
+    assert len(client.get("/api/v1/books/suggest", params={"q": "machado"}).json()) == 2
+    with query_budget(0):
+        suggest = lambda q: [book["title"] for book in client.get("/api/v1/books/suggest", params={"q": q}).json()]
+        assert suggest("bras") == ["Memórias Póstumas de Brás Cubas"]
+
+    client.patch(f"/api/v1/books/{dom['id']}", json={"title": "Quincas Borba", "author": "Machado de Assis",
+                                                     "price": 10.0, "stock_quantity": 5}, headers=headers)
+    created = create_book(client, headers, title="Dom Quixote", author="Cervantes")
+    client.delete(f"/api/v1/books/{created['id']}", headers=headers)
+
+    with query_budget(0):
+        assert suggest("dom") == []
+        assert suggest("quincas") == ["Quincas Borba"]
+
+def test_typeahead_concurrent_first_requests_build_once(monkeypatch):
+    index = TypeaheadIndex()
+    builds = []
+
+    async def slow_load(session, index):
+        builds.append(session)
+        await asyncio.sleep(0.01)
+        index.build([(1, "Vidas Secas", "Graciliano Ramos")], version=1)
+
+    monkeypatch.setattr(typeahead, "load_index", slow_load)
+
+    async def run():
+        await asyncio.gather(*(ensure_loaded(f"sessão {n}", index) for n in range(5)))
+
+    asyncio.run(run())
+    assert builds == ["sessão 0"]
+    assert index.suggest("vidas")[0]["id"] == 1
+
+def test_typeahead_refresh_follows_names_not_stock(session, async_engine):
+    book = Book(title="Capitães da Areia", author="Jorge Amado", price=10.0, stock_quantity=5)
+    session.add(book)
+    session.commit()
+    index = TypeaheadIndex()
+    refresher = TypeaheadRefresher(async_engine, index=index)
+    assert asyncio.run(refresher.refresh_once()) is True
+    assert asyncio.run(refresher.refresh_once()) is False
+
+    # Estoque (como no checkout) não reconstrói o índice
+    session.exec(
+        update(Book).where(Book.id == book.id).values(stock_quantity=4).execution_options(**STOCK_ONLY)
+    )
+    session.commit()
+    assert asyncio.run(refresher.refresh_once()) is False
+
+    # Título mudou em outro processo: reconstrói
+    book.title = "Gabriela"
+    session.add(book)
+    session.commit()
+    assert asyncio.run(refresher.refresh_once()) is True
+    assert [suggestion["title"] for suggestion in index.suggest("gabri")] == ["Gabriela"]
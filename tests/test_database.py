@@ -0,0 +1,162 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.core import database, security
+from app.core.cache import MISS, clear_caches
+from app.core.catalog import get_catalog_cache, invalidate_stock, list_key
+from app.models import Book, User
+
+def test_sqlite_pragmas_applied_on_connect(engine):
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == database.settings.SQLITE_BUSY_TIMEOUT_MS
+
+def test_engine_options_use_monitored_pool_and_no_echo(tmp_path):
+    url = f"sqlite:///{tmp_path / 'pool.db'}"
+    options = database.engine_options(url, "test-pool")
+    assert options["echo"] is False
+    assert options["poolclass"] is database.MonitoredQueuePool
+
+    pool_engine = create_engine(url, **options)
+    database.register_engine("test-pool", pool_engine)
+    try:
+        held = pool_engine.connect()
+        stats = database.pool_stats()["test-pool"]
+        assert stats["in_use"] == 1
+        assert stats["size"] == database.settings.DB_POOL_SIZE
+        held.close()
+
+        for _ in range(3):
+            with pool_engine.connect():
+                pass
+        stats = database.pool_stats()["test-pool"]
+        assert stats["in_use"] == 0
+        assert stats["checkouts"] == 4
+        assert stats["wait_seconds_max"] >= 0
+    finally:
+        database._engines.pop("test-pool", None)
+        pool_engine.dispose()
+
+    # Banco em memória mantém o pool padrão do SQLAlchemy
+    assert "poolclass" not in database.engine_options("sqlite://", "memory")
+
+def test_database_stats_endpoint_requires_admin(client: TestClient, session: Session):
+    admin = User(email="dba@example.com", hashed_password="x", is_superuser=True)
+    user = User(email="nodba@example.com", hashed_password="x")
+    session.add(admin)
+    session.add(user)
+    session.commit()
+
+    resp = client.get(
+        "/api/v1/ops/database",
+        headers={"Authorization": f"Bearer {security.create_access_token(user.id)}"}
+    )
+    assert resp.status_code == 400
+
+    resp = client.get(
+        "/api/v1/ops/database",
+        headers={"Authorization": f"Bearer {security.create_access_token(admin.id)}"}
+    )
+    assert resp.status_code == 200
+    assert {"sync", "async"} <= set(resp.json())
+    assert "checkouts" in resp.json()["async"]
+
+def _replica_engine(path):
+    """Banco SQLite separado fazendo o papel de réplica (mesmo schema, dados próprios)."""
+    sync_engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(sync_engine)
+    replica = create_async_engine(database.async_database_url(f"sqlite:///{path}"), poolclass=NullPool)
+    return sync_engine, replica
+
+def test_replica_set_round_robin_skips_unhealthy(tmp_path):
+    _, first = _replica_engine(tmp_path / "r1.db")
+    _, second = _replica_engine(tmp_path / "r2.db")
+    broken = create_async_engine(
+        database.async_database_url(f"sqlite:///{tmp_path / 'ausente' / 'r3.db'}"), poolclass=NullPool
+    )
+    replicas = database.ReplicaSet([first, second, broken])
+
+    assert asyncio.run(replicas.check_health()) == 2
+    chosen = [replicas.choose() for _ in range(4)]
+    assert chosen == [first, second, first, second]
+    assert replicas.stats()["replicas"][2]["healthy"] is False
+
+    replicas.mark_down(first)
+    assert {replicas.choose() for _ in range(3)} == {second}
+    replicas.mark_down(second)
+    assert replicas.choose() is None  # tudo no primário
+
+    assert asyncio.run(replicas.check_health()) == 2
+
+def test_reads_routed_to_replica_and_writers_pinned_to_primary(client: TestClient, session: Session, tmp_path, monkeypatch):
+    replica_sync, replica = _replica_engine(tmp_path / "replica.db")
+    with Session(replica_sync) as replica_session:
+        replica_session.add(Book(title="Só na réplica", author="R", price=1.0, stock_quantity=1))
+        replica_session.commit()
+    monkeypatch.setattr(database, "replicas", database.ReplicaSet([replica]))
+
+    # Catálogo: lido da réplica
+    assert [book["title"] for book in client.get("/api/v1/books/").json()] == ["Só na réplica"]
+
+    book = Book(title="Primário", author="P", price=10.0, stock_quantity=5)
+    session.add(book)
+    session.commit()
+    client.post("/api/v1/auth/register", json={"email": "replica@example.com", "password": "pass"})
+    token = client.post("/api/v1/auth/token", data={"username": "replica@example.com", "password": "pass"}).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+    # Quem acabou de criar um pedido lê o histórico do primário
+    assert client.post("/api/v1/orders/", json={"items": [{"book_id": book.id, "quantity": 1}]}, headers=headers).status_code == 200
+    assert len(client.get("/api/v1/orders/", headers=headers).json()) == 1
+
+    # Sem escrita recente, o histórico vem da réplica (que não tem o pedido)
+    database._primary_pins.clear()
+    assert client.get("/api/v1/orders/", headers=headers).json() == []
+    assert database.replicas.stats()["reads"] == 2
+
+    # Escrita no catálogo neste processo: o catálogo volta a ser lido do primário
+    session.add(Book(title="Recém-criado", author="P", price=5.0, stock_quantity=1))
+    session.commit()
+    assert "Recém-criado" in [book["title"] for book in client.get("/api/v1/books/").json()]
+
+    # Leitura de réplica logo após uma invalidação é servida, mas não vai para o cache
+    database._primary_pins.clear()
+    invalidate_stock(book.id)
+    assert [book["title"] for book in client.get("/api/v1/books/").json()] == ["Só na réplica"]
+    key = list_key(offset=0, limit=100, search=None, sort=None, cursor=None)
+    assert get_catalog_cache().get(key) is MISS
+
+def test_broken_replica_falls_back_to_primary(client: TestClient, session: Session, tmp_path, monkeypatch):
+    broken = create_async_engine(
+        database.async_database_url(f"sqlite:///{tmp_path / 'ausente' / 'replica.db'}"), poolclass=NullPool
+    )
+    monkeypatch.setattr(database, "replicas", database.ReplicaSet([broken]))
+    book = Book(title="No primário", author="P", price=10.0, stock_quantity=5)
+    session.add(book)
+    session.commit()
+    database._primary_pins.clear()
+
+    resp = client.get("/api/v1/books/")
+    assert resp.status_code == 200
+    assert [book["title"] for book in resp.json()] == ["No primário"]
+    assert database.replicas.stats()["replicas"][0]["healthy"] is False
+
+    # Com a réplica fora do rodízio, as próximas leituras já vão direto ao primário
+    assert client.get(f"/api/v1/books/{book.id}").json()["title"] == "No primário"
+    # A resposta veio do primário, então pode ir para o cache
+    key = list_key(offset=0, limit=100, search=None, sort=None, cursor=None)
+    assert get_catalog_cache().get(key) is not MISS
+
+    # Réplica escolhida ainda marcada como saudável: cada leitura falha nela e é refeita no primário
+    clear_caches()  # também limpa as fixações no primário
+    database.replicas._healthy[id(broken)] = True
+    assert client.get(f"/api/v1/books/{book.id}").status_code == 200
+    database.replicas._healthy[id(broken)] = True
+    assert client.get("/api/v1/books/suggest", params={"q": "prim"}).json()[0]["id"] == book.id
+    assert database.replicas.stats()["replicas"][0]["healthy"] is False
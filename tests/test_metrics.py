@@ -0,0 +1,37 @@
+from fastapi.testclient import TestClient
+
+from app.core.metrics import Histogram, LATENCY, REQUEST_QUERIES, REQUESTS
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_latency_seconds", "Teste.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, ("/x",))
+
+    lines = histogram.render()
+    assert 'test_latency_seconds_bucket{route="/x",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{route="/x",le="1.0"} 3' in lines
+    assert 'test_latency_seconds_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_count{route="/x"} 4' in lines
+    assert 'test_latency_seconds_sum{route="/x"} 4.05' in lines
+
+def test_metrics_by_route_template_with_db_stats(client: TestClient):
+    labels = ("GET", "/api/v1/books/{book_id}")
+    before = LATENCY.count(labels)
+    missing_before = REQUESTS.value(labels + ("404",))
+
+    assert client.get("/api/v1/books/999").status_code == 404
+    assert client.get("/api/v1/books/998").status_code == 404
+
+    assert LATENCY.count(labels) == before + 2
+    assert REQUESTS.value(labels + ("404",)) == missing_before + 2
+    # Cada busca por id faz ao menos um SELECT
+    assert REQUEST_QUERIES.sum(labels) >= 2
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = resp.text
+    assert 'http_requests_total{method="GET",route="/api/v1/books/{book_id}",status="404"}' in body
+    assert "# TYPE http_request_db_queries histogram" in body
+    assert 'threadpool_workers{state="in_use"}' in body
+    assert "http_requests_in_flight 0" in body
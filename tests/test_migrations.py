@@ -0,0 +1,99 @@
+import pytest
+from sqlalchemy import inspect, text
+from sqlmodel import SQLModel, create_engine
+
+from app.core.config import settings
+from app.core.migrations import LATEST_VERSION, check_schema, current_version, migrate
+
+# Schema da primeira versão do projeto, criado pelo antigo create_all
+LEGACY_SCHEMA = [
+    "CREATE TABLE user (email VARCHAR NOT NULL, is_active BOOLEAN NOT NULL, is_superuser BOOLEAN NOT NULL, "
+    "full_name VARCHAR, id INTEGER NOT NULL PRIMARY KEY, hashed_password VARCHAR NOT NULL)",
+    "CREATE TABLE book (title VARCHAR NOT NULL, author VARCHAR NOT NULL, description VARCHAR, "
+    "price FLOAT NOT NULL, stock_quantity INTEGER NOT NULL, id INTEGER NOT NULL PRIMARY KEY)",
+    'CREATE TABLE "order" (status VARCHAR NOT NULL, id INTEGER NOT NULL PRIMARY KEY, '
+    "created_at DATETIME NOT NULL, user_id INTEGER)",
+    "CREATE TABLE orderitem (order_id INTEGER NOT NULL, book_id INTEGER NOT NULL, quantity INTEGER NOT NULL, "
+    "item_price FLOAT NOT NULL, PRIMARY KEY (order_id, book_id))",
+    "INSERT INTO book VALUES ('Livro antigo', 'Autora', NULL, 10.0, 3, 1)",
+]
+
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        for statement in LEGACY_SCHEMA:
+            connection.execute(text(statement))
+    yield engine
+    engine.dispose()
+
+
+def test_migrate_upgrades_legacy_database(legacy_engine):
+    applied = migrate(legacy_engine)
+    assert [migration.version for migration in applied] == list(range(1, LATEST_VERSION + 1))
+
+    inspector = inspect(legacy_engine)
+    assert {"expires_at", "paid_at"} <= {column["name"] for column in inspector.get_columns("order")}
+    assert "ix_orderitem_book_id" in {index["name"] for index in inspector.get_indexes("orderitem")}
+    assert "ix_order_status_created_at" in {index["name"] for index in inspector.get_indexes("order")}
+    assert inspector.has_table("idempotencykey")
+    with legacy_engine.connect() as connection:
+        # Livros existentes entram no índice de busca
+        assert connection.execute(text("SELECT rowid FROM book_fts WHERE book_fts MATCH 'antigo'")).all() == [(1,)]
+        assert current_version(connection) == LATEST_VERSION
+
+    assert migrate(legacy_engine) == []
+
+
+def test_check_schema_refuses_outdated_database(legacy_engine, monkeypatch):
+    monkeypatch.setattr(settings, "MIGRATE_ON_STARTUP", False)
+    with pytest.raises(RuntimeError, match="python -m app.core.migrations"):
+        check_schema(legacy_engine)
+
+    migrate(legacy_engine)
+    assert check_schema(legacy_engine) == LATEST_VERSION
+
+
+def test_check_schema_migrates_when_enabled(legacy_engine, monkeypatch):
+    monkeypatch.setattr(settings, "MIGRATE_ON_STARTUP", True)
+    assert check_schema(legacy_engine) == LATEST_VERSION
+    with legacy_engine.connect() as connection:
+        assert current_version(connection) == LATEST_VERSION
+
+
+def _schema(engine):
+    """Tabelas, colunas, índices, chaves únicas e estrangeiras, para comparar dois bancos."""
+    inspector = inspect(engine)
+    return {
+        table: {
+            "columns": sorted(
+                (column["name"], str(column["type"]), column["nullable"]) for column in inspector.get_columns(table)
+            ),
+            "indexes": sorted(
+                (index["name"], tuple(index["column_names"]), bool(index["unique"]))
+                for index in inspector.get_indexes(table)
+            ),
+            "unique": sorted(
+                (constraint["name"], tuple(constraint["column_names"]))
+                for constraint in inspector.get_unique_constraints(table)
+            ),
+            "foreign_keys": sorted(
+                (tuple(fk["constrained_columns"]), fk["referred_table"], tuple(fk["referred_columns"]))
+                for fk in inspector.get_foreign_keys(table)
+            ),
+        }
+        for table in inspector.get_table_names()
+    }
+
+
+def test_migrations_from_scratch_match_models(tmp_path):
+    # As migrações são DDL congelado: um banco novo migrado precisa ficar igual aos modelos atuais
+    migrated = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    from_models = create_engine(f"sqlite:///{tmp_path / 'models.db'}")
+    migrate(migrated)
+    SQLModel.metadata.create_all(from_models)
+
+    assert _schema(migrated) == _schema(from_models)
+    migrated.dispose()
+    from_models.dispose()
@@ -1,4 +1,19 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.core import security
+from app.core.idempotency import IdempotencyKeyPurger
+from app.core.pagination import encode_cursor
+from app.core.inventory import HoldSweeper
+from app.main import app
+from app.routers import orders
+from app.models import Book, IdempotencyKey, Order, User
 
 def get_auth_token(client: TestClient, email: str = "order@example.com") -> dict:
     # Helper para registrar e logar
@@ -56,3 +71,334 @@ def test_create_order_insufficient_stock(client: TestClient):
     )
     assert resp_order.status_code == 400
     assert "Estoque insuficiente" in resp_order.json()["detail"]
+
+def test_read_orders_cursor_pagination(client: TestClient):
+    headers = get_auth_token(client, email="history@example.com")
+    resp_book = client.post(
+        "/api/v1/books/",
+        json={"title": "Popular", "author": "Me", "price": 10.0, "stock_quantity": 10},
+        headers=headers
+    )
+    book_id = resp_book.json()["id"]
+    order_ids = [
+        client.post(
+            "/api/v1/orders/",
+            json={"items": [{"book_id": book_id, "quantity": 1}]},
+            headers=headers
+        ).json()["id"]
+        for _ in range(3)
+    ]
+
+    first = client.get("/api/v1/orders/", params={"limit": 2}, headers=headers)
+    assert [order["id"] for order in first.json()] == order_ids[::-1][:2]
+
+    second = client.get(
+        "/api/v1/orders/",
+        params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]},
+        headers=headers
+    )
+    assert [order["id"] for order in second.json()] == order_ids[:1]
+    assert "X-Next-Cursor" not in second.headers
+    assert client.get("/api/v1/orders/", params={"limit": 0}, headers=headers).status_code == 422
+    tampered = encode_cursor("created_at", "ontem", order_ids[0])
+    assert client.get("/api/v1/orders/", params={"cursor": tampered}, headers=headers).status_code == 400
+
+def test_create_order_merges_duplicate_lines(client: TestClient):
+    headers = get_auth_token(client, email="dup@example.com")
+    book_id = client.post(
+        "/api/v1/books/",
+        json={"title": "Dup", "author": "Me", "price": 10.0, "stock_quantity": 5},
+        headers=headers
+    ).json()["id"]
+
+    resp = client.post(
+        "/api/v1/orders/",
+        json={"items": [{"book_id": book_id, "quantity": 2}, {"book_id": book_id, "quantity": 1}]},
+        headers=headers
+    )
+    assert resp.status_code == 200
+    assert [(i["book_id"], i["quantity"]) for i in resp.json()["items"]] == [(book_id, 3)]
+    assert client.get(f"/api/v1/books/{book_id}").json()["stock_quantity"] == 2
+
+    # A soma das linhas repetidas excede o estoque restante: nada é descontado
+    resp = client.post(
+        "/api/v1/orders/",
+        json={"items": [{"book_id": book_id, "quantity": 2}, {"book_id": book_id, "quantity": 1}]},
+        headers=headers
+    )
+    assert resp.status_code == 400
+    assert client.get(f"/api/v1/books/{book_id}").json()["stock_quantity"] == 2
+
+def test_create_order_rejects_non_positive_quantity(client: TestClient):
+    headers = get_auth_token(client, email="neg@example.com")
+    resp = client.post(
+        "/api/v1/orders/",
+        json={"items": [{"book_id": 1, "quantity": -5}]},
+        headers=headers
+    )
+    assert resp.status_code == 422
+
+def test_concurrent_orders_never_oversell(client: TestClient, session: Session):
+    # Requisições simultâneas no mesmo event loop, cada uma com sua sessão e conexão
+    user = User(email="rush@example.com", hashed_password=security.get_password_hash("pass"))
+    book = Book(title="Último Exemplar", author="Me", price=10.0, stock_quantity=5)
+    session.add(user)
+    session.add(book)
+    session.commit()
+    book_id = book.id
+    headers = {"Authorization": f"Bearer {security.create_access_token(user.id)}"}
+
+    async def rush():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            responses = await asyncio.gather(*(
+                async_client.post(
+                    "/api/v1/orders/",
+                    json={"items": [{"book_id": book_id, "quantity": 1}]},
+                    headers=headers
+                )
+                for _ in range(20)
+            ))
+        return [response.status_code for response in responses]
+
+    statuses = asyncio.run(rush())
+
+    assert statuses.count(200) == 5
+    assert statuses.count(400) == 15
+    session.expire_all()
+    assert session.get(Book, book_id).stock_quantity == 0
+
+def test_read_orders_constant_queries_and_filters(client: TestClient, query_budget):
+    headers = get_auth_token(client, email="eager@example.com")
+    book_ids = [
+        client.post(
+            "/api/v1/books/",
+            json={"title": f"Livro {i}", "author": "Me", "price": 10.0, "stock_quantity": 10},
+            headers=headers
+        ).json()["id"]
+        for i in range(3)
+    ]
+    order_ids = [
+        client.post(
+            "/api/v1/orders/",
+            json={"items": [{"book_id": book_id, "quantity": 1} for book_id in book_ids]},
+            headers=headers
+        ).json()["id"]
+        for _ in range(4)
+    ]
+    client.post(f"/api/v1/orders/{order_ids[0]}/pay", headers=headers)
+
+    # pedidos + itens com livros, independente do número de pedidos
+    with query_budget(2) as requests:
+        resp = client.get("/api/v1/orders/", headers=headers)
+
+    assert resp.status_code == 200
+    assert len(resp.json()) == 4
+    assert all(len(order["items"]) == 3 for order in resp.json())
+    assert all(item["book"]["title"] for order in resp.json() for item in order["items"])
+    assert requests[0][2].queries == 2
+
+    paid = client.get("/api/v1/orders/", params={"status": "paid"}, headers=headers).json()
+    assert [order["id"] for order in paid] == [order_ids[0]]
+    future = client.get(
+        "/api/v1/orders/", params={"created_from": "2999-01-01T00:00:00Z"}, headers=headers
+    ).json()
+    assert future == []
+
+def test_export_orders_admin_only(client: TestClient, session: Session):
+    admin = User(email="exporter@example.com", hashed_password="x", is_superuser=True)
+    buyer = User(email="buyer@example.com", hashed_password="x")
+    book = Book(title="Exportado", author="Me", price=12.5, stock_quantity=10)
+    session.add_all([admin, buyer, book])
+    session.commit()
+    buyer_headers = {"Authorization": f"Bearer {security.create_access_token(buyer.id)}"}
+    admin_headers = {"Authorization": f"Bearer {security.create_access_token(admin.id)}"}
+    for quantity in (1, 2):
+        client.post(
+            "/api/v1/orders/",
+            json={"items": [{"book_id": book.id, "quantity": quantity}]},
+            headers=buyer_headers
+        )
+
+    assert client.get("/api/v1/orders/export", headers=buyer_headers).status_code == 400
+
+    resp = client.get("/api/v1/orders/export", params={"gzip": True}, headers=admin_headers)
+    assert resp.status_code == 200
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [(row["user_id"], row["quantity"], row["item_price"]) for row in rows] == [
+        (buyer.id, 1, 12.5), (buyer.id, 2, 12.5)
+    ]
+    assert rows[0]["status"] == "pending"
+
+def test_expired_holds_return_stock_and_block_payment(client: TestClient, session: Session, async_engine):
+    headers = get_auth_token(client, email="holds@example.com")
+    book = Book(title="Carrinho Abandonado", author="Me", price=10.0, stock_quantity=5)
+    session.add(book)
+    session.commit()
+
+    order_ids = [
+        client.post(
+            "/api/v1/orders/",
+            json={"items": [{"book_id": book.id, "quantity": 2}]},
+            headers=headers
+        ).json()["id"]
+        for _ in range(2)
+    ]
+    assert client.get(f"/api/v1/books/{book.id}").json()["stock_quantity"] == 1
+
+    # Pedido pago converte a reserva em venda
+    paid = client.post(f"/api/v1/orders/{order_ids[0]}/pay", headers=headers).json()
+    assert paid["status"] == "paid"
+    assert paid["expires_at"] is None
+
+    # Vence a reserva do segundo pedido e roda a varredura
+    abandoned = session.get(Order, order_ids[1])
+    abandoned.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    session.add(abandoned)
+    session.commit()
+
+    sweeper = HoldSweeper(async_engine, batch_size=10)
+    assert asyncio.run(sweeper.sweep_once()) == 1
+    assert asyncio.run(sweeper.sweep_once()) == 0
+    assert client.get(f"/api/v1/books/{book.id}").json()["stock_quantity"] == 3
+
+    resp = client.post(f"/api/v1/orders/{order_ids[1]}/pay", headers=headers)
+    assert resp.status_code == 409
+    expired = client.get("/api/v1/orders/", params={"status": "expired"}, headers=headers).json()
+    assert [order["id"] for order in expired] == [order_ids[1]]
+
+def test_pay_after_deadline_releases_hold_immediately(client: TestClient, session: Session):
+    headers = get_auth_token(client, email="late@example.com")
+    book = Book(title="Pagamento Atrasado", author="Me", price=10.0, stock_quantity=1)
+    session.add(book)
+    session.commit()
+    order_id = client.post(
+        "/api/v1/orders/",
+        json={"items": [{"book_id": book.id, "quantity": 1}]},
+        headers=headers
+    ).json()["id"]
+
+    order = session.get(Order, order_id)
+    order.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    session.add(order)
+    session.commit()
+
+    assert client.post(f"/api/v1/orders/{order_id}/pay", headers=headers).status_code == 409
+    session.expire_all()
+    assert session.get(Order, order_id).status == "expired"
+    assert session.get(Book, book.id).stock_quantity == 1
+
+def test_idempotency_key_replays_create_and_pay(client: TestClient, session: Session):
+    headers = get_auth_token(client, email="retry@example.com")
+    book = Book(title="Repetido", author="Me", price=10.0, stock_quantity=5)
+    session.add(book)
+    session.commit()
+    payload = {"items": [{"book_id": book.id, "quantity": 2}]}
+    retry_headers = {**headers, "Idempotency-Key": "pedido-1"}
+
+    first = client.post("/api/v1/orders/", json=payload, headers=retry_headers)
+    again = client.post("/api/v1/orders/", json=payload, headers=retry_headers)
+    assert first.status_code == again.status_code == 200
+    assert again.json() == first.json()
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert client.get(f"/api/v1/books/{book.id}").json()["stock_quantity"] == 3
+    assert len(client.get("/api/v1/orders/", headers=headers).json()) == 1
+
+    # Mesma chave com outro corpo é rejeitada
+    other = {"items": [{"book_id": book.id, "quantity": 1}]}
+    assert client.post("/api/v1/orders/", json=other, headers=retry_headers).status_code == 422
+
+    # Erros 4xx também são gravados e reenviados
+    too_many = {"items": [{"book_id": book.id, "quantity": 50}]}
+    error_headers = {**headers, "Idempotency-Key": "pedido-grande"}
+    assert client.post("/api/v1/orders/", json=too_many, headers=error_headers).status_code == 400
+    replayed = client.post("/api/v1/orders/", json=too_many, headers=error_headers)
+    assert replayed.status_code == 400
+    assert replayed.headers["Idempotent-Replayed"] == "true"
+
+    order_id = first.json()["id"]
+    pay_headers = {**headers, "Idempotency-Key": "pagamento-1"}
+    paid = client.post(f"/api/v1/orders/{order_id}/pay", headers=pay_headers)
+    paid_again = client.post(f"/api/v1/orders/{order_id}/pay", headers=pay_headers)
+    assert paid.status_code == paid_again.status_code == 200
+    assert paid_again.json()["status"] == "paid"
+
+def test_idempotency_key_coalesces_concurrent_duplicates(client: TestClient, session: Session):
+    user = User(email="double@example.com", hashed_password="x")
+    book = Book(title="Clique Duplo", author="Me", price=10.0, stock_quantity=10)
+    session.add_all([user, book])
+    session.commit()
+    book_id = book.id
+    headers = {
+        "Authorization": f"Bearer {security.create_access_token(user.id)}",
+        "Idempotency-Key": "clique-duplo",
+    }
+
+    async def rush():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            return await asyncio.gather(*(
+                async_client.post(
+                    "/api/v1/orders/",
+                    json={"items": [{"book_id": book_id, "quantity": 1}]},
+                    headers=headers
+                )
+                for _ in range(5)
+            ))
+
+    responses = asyncio.run(rush())
+    assert [response.status_code for response in responses] == [200] * 5
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert sum(response.headers.get("Idempotent-Replayed") == "true" for response in responses) == 4
+    session.expire_all()
+    assert session.get(Book, book_id).stock_quantity == 9
+
+def test_idempotency_key_survives_failure_after_commit_and_releases_transient_errors(
+    client: TestClient, session: Session, monkeypatch
+):
+    headers = get_auth_token(client, email="fragile@example.com")
+    book = Book(title="Frágil", author="Me", price=10.0, stock_quantity=5)
+    session.add(book)
+    session.commit()
+    payload = {"items": [{"book_id": book.id, "quantity": 1}]}
+
+    # Falha depois do commit do pedido: a repetição recebe o pedido gravado, sem criar outro
+    def broken_invalidate(*book_ids):
+        raise RuntimeError("queda depois do commit")
+    monkeypatch.setattr(orders, "invalidate_stock", broken_invalidate)
+    committed_headers = {**headers, "Idempotency-Key": "apos-commit"}
+    failing_client = TestClient(app, raise_server_exceptions=False)
+    assert failing_client.post("/api/v1/orders/", json=payload, headers=committed_headers).status_code == 500
+    monkeypatch.undo()
+
+    replayed = client.post("/api/v1/orders/", json=payload, headers=committed_headers)
+    assert replayed.status_code == 200
+    assert replayed.headers["Idempotent-Replayed"] == "true"
+    assert len(client.get("/api/v1/orders/", headers=headers).json()) == 1
+
+    # 409 transitório não é gravado: a repetição com a mesma chave executa de novo
+    real_reserve = orders.reserve_stock
+    calls = []
+    async def conflicting_reserve(session, quantities):
+        calls.append(quantities)
+        if len(calls) == 1:
+            raise HTTPException(status_code=409, detail="Estoque alterado durante o pedido, tente novamente")
+        return await real_reserve(session, quantities)
+    monkeypatch.setattr(orders, "reserve_stock", conflicting_reserve)
+    retry_headers = {**headers, "Idempotency-Key": "conflito"}
+    assert client.post("/api/v1/orders/", json=payload, headers=retry_headers).status_code == 409
+    retried = client.post("/api/v1/orders/", json=payload, headers=retry_headers)
+    assert retried.status_code == 200
+    assert "Idempotent-Replayed" not in retried.headers
+    assert len(calls) == 2
+
+def test_idempotency_purger_removes_expired_keys(session: Session, async_engine):
+    now = datetime.utcnow()
+    session.add_all([
+        IdempotencyKey(user_id=1, key="velha", fingerprint="x", status="done", expires_at=now - timedelta(seconds=1)),
+        IdempotencyKey(user_id=1, key="nova", fingerprint="x", status="done", expires_at=now + timedelta(hours=1)),
+    ])
+    session.commit()
+
+    assert asyncio.run(IdempotencyKeyPurger(async_engine).purge_once()) == 1
+    assert [row.key for row in session.exec(select(IdempotencyKey))] == ["nova"]
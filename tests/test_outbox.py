@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.core.outbox import EmailTransport, FileTransport, OutboxDispatcher
+from app.models import EmailOutbox
+
+class MemoryTransport(EmailTransport):
+    def __init__(self, fail: bool = False):
+        self.sent = []
+        self.fail = fail
+
+    async def send(self, email: EmailOutbox) -> None:
+        if self.fail:
+            raise ConnectionError("SMTP indisponível")
+        self.sent.append((email.recipient, email.subject))
+
+def test_register_writes_outbox(client: TestClient, session: Session):
+    client.post(
+        "/api/v1/auth/register",
+        json={"email": "outbox@example.com", "password": "pass"}
+    )
+    emails = session.exec(select(EmailOutbox)).all()
+    assert [(e.recipient, e.status) for e in emails] == [("outbox@example.com", "pending")]
+
+def test_dispatcher_sends_batch(client: TestClient, session: Session, async_engine):
+    for i in range(3):
+        client.post(
+            "/api/v1/auth/register",
+            json={"email": f"user{i}@example.com", "password": "pass"}
+        )
+    transport = MemoryTransport()
+    dispatcher = OutboxDispatcher(async_engine, transport, batch_size=2, concurrency=2)
+
+    assert asyncio.run(dispatcher.dispatch_once()) == 2
+    assert asyncio.run(dispatcher.dispatch_once()) == 1
+    assert asyncio.run(dispatcher.dispatch_once()) == 0
+
+    assert sorted(recipient for recipient, _ in transport.sent) == [
+        "user0@example.com", "user1@example.com", "user2@example.com"
+    ]
+    session.expire_all()
+    assert {e.status for e in session.exec(select(EmailOutbox))} == {"sent"}
+
+def test_dispatcher_retries_with_backoff(session: Session, async_engine):
+    session.add(EmailOutbox(recipient="retry@example.com", subject="Oi"))
+    session.commit()
+    dispatcher = OutboxDispatcher(
+        async_engine, MemoryTransport(fail=True), max_attempts=2, backoff_seconds=60
+    )
+
+    assert asyncio.run(dispatcher.dispatch_once()) == 1
+    session.expire_all()
+    email = session.exec(select(EmailOutbox)).one()
+    assert email.status == "pending"
+    assert email.attempts == 1
+    assert email.next_attempt_at > datetime.utcnow() + timedelta(seconds=50)
+    assert "SMTP indisponível" in email.last_error
+
+    # Ainda em backoff: nada a enviar
+    assert asyncio.run(dispatcher.dispatch_once()) == 0
+
+    email.next_attempt_at = datetime.utcnow()
+    session.add(email)
+    session.commit()
+    asyncio.run(dispatcher.dispatch_once())
+    session.expire_all()
+    assert session.exec(select(EmailOutbox)).one().status == "failed"
+
+def test_file_transport(session: Session, async_engine, tmp_path):
+    path = tmp_path / "emails.jsonl"
+    session.add(EmailOutbox(recipient="file@example.com", subject="Pedido", body="ok"))
+    session.commit()
+
+    asyncio.run(OutboxDispatcher(async_engine, FileTransport(str(path))).dispatch_once())
+    assert '"to": "file@example.com"' in path.read_text(encoding="utf-8")
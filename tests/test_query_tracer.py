@@ -0,0 +1,53 @@
+import asyncio
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.query_tracer import QueryTracerMiddleware
+
+def test_debug_headers_report_queries(client: TestClient, monkeypatch):
+    assert "X-Query-Count" not in client.get("/api/v1/books/").headers
+
+    monkeypatch.setattr(settings, "QUERY_DEBUG_HEADERS", True)
+    resp = client.get("/api/v1/books/1")
+    assert resp.status_code == 404
+    assert int(resp.headers["X-Query-Count"]) >= 1
+    assert float(resp.headers["X-DB-Time"]) >= 0
+
+def test_slow_query_logged_with_call_site(client: TestClient, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 1e-6)
+    with caplog.at_level(logging.WARNING, logger="app.core.query_tracer"):
+        client.get("/api/v1/books/1")
+    messages = [record.getMessage() for record in caplog.records if "Query lenta" in record.getMessage()]
+    assert any("app/routers/books.py" in message for message in messages)
+
+def test_repeated_select_flagged_as_n_plus_one(engine, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "N_PLUS_ONE_THRESHOLD", 3)
+
+    async def lazy_app(scope, receive, send):
+        # Simula um relacionamento lazy: o mesmo SELECT para cada linha
+        with engine.connect() as connection:
+            for book_id in range(4):
+                connection.execute(text("SELECT * FROM book WHERE id = :id"), {"id": book_id})
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/lazy"}
+    with caplog.at_level(logging.WARNING, logger="app.core.query_tracer"):
+        asyncio.run(QueryTracerMiddleware(lazy_app)(scope, receive, send))
+    assert any("Possível N+1 em GET <unmatched>: 4×" in record.getMessage() for record in caplog.records)
+
+@pytest.mark.query_budget(4)
+def test_catalog_reads_within_budget(client: TestClient):
+    client.get("/api/v1/books/")
+    client.get("/api/v1/books/", params={"search": "tolkien"})
+    client.get("/api/v1/books/export")
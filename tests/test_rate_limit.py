@@ -0,0 +1,62 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.rate_limit import MemoryRateLimitBackend, RateLimit
+
+
+@pytest.fixture
+def rate_limited(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_AUTH_IP_BURST", 3)
+    monkeypatch.setattr(settings, "RATE_LIMIT_AUTH_ACCOUNT_BURST", 2)
+    monkeypatch.setattr(settings, "RATE_LIMIT_CATALOG_BURST", 5)
+    # Reposição lenta: o teste não pode ganhar um token enquanto faz as requisições
+    monkeypatch.setattr(settings, "RATE_LIMIT_CATALOG_PER_SECOND", 0.01)
+
+
+def test_token_bucket_refills_and_evicts(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.core.rate_limit.time.monotonic", lambda: now[0])
+    backend = MemoryRateLimitBackend(maxsize=2)
+    limit = RateLimit("test", per_second=1.0, burst=2)
+
+    assert backend.acquire("a", limit) == 0
+    assert backend.acquire("a", limit) == 0
+    assert backend.acquire("a", limit) == pytest.approx(1.0)
+    now[0] += 0.5
+    assert backend.acquire("a", limit) == pytest.approx(0.5)
+    now[0] += 0.5
+    assert backend.acquire("a", limit) == 0
+
+    backend.acquire("b", limit)
+    backend.acquire("c", limit)  # despeja "a", o menos usado
+    assert backend.stats()["keys"] == 2
+    assert backend.stats()["evictions"] == 1
+
+
+def test_login_limited_per_account(client: TestClient, rate_limited):
+    client.post("/api/v1/auth/register", json={"email": "acc@example.com", "password": "x"})
+    statuses = [
+        client.post("/api/v1/auth/token", data={"username": "ACC@example.com", "password": "wrong"}).status_code
+        for _ in range(2)
+    ]
+    # A conta já gastou um token no cadastro
+    assert statuses == [400, 429]
+
+
+def test_login_limited_per_ip_with_retry_after(client: TestClient, rate_limited):
+    responses = [
+        client.post("/api/v1/auth/token", data={"username": f"u{i}@example.com", "password": "x"})
+        for i in range(4)
+    ]
+    assert [r.status_code for r in responses] == [400, 400, 400, 429]
+    assert int(responses[-1].headers["Retry-After"]) >= 1
+
+    # O catálogo tem orçamento próprio
+    assert client.get("/api/v1/books/").status_code == 200
+
+
+def test_catalog_reads_limited(client: TestClient, rate_limited):
+    statuses = [client.get("/api/v1/books/").status_code for _ in range(6)]
+    assert statuses == [200] * 5 + [429]
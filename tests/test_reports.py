@@ -0,0 +1,80 @@
+import asyncio
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.analytics import rebuild
+from app.models import BookSales, DailySales
+
+
+def login(client: TestClient, email: str, is_superuser: bool = False) -> dict:
+    client.post("/api/v1/auth/register", json={"email": email, "password": "pass", "is_superuser": is_superuser})
+    resp = client.post("/api/v1/auth/token", data={"username": email, "password": "pass"})
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+def buy(client: TestClient, headers: dict, items: list, pay: bool = True) -> None:
+    order_id = client.post("/api/v1/orders/", json={"items": items}, headers=headers).json()["id"]
+    if pay:
+        assert client.post(f"/api/v1/orders/{order_id}/pay", headers=headers).status_code == 200
+
+
+def snapshot(session: Session):
+    session.expire_all()
+    return (
+        [(row.day, row.orders, row.units, row.revenue) for row in session.exec(select(DailySales))],
+        sorted((row.book_id, row.orders, row.units, row.revenue) for row in session.exec(select(BookSales))),
+    )
+
+
+def test_reports_follow_payments(client: TestClient, session: Session, async_engine, query_budget):
+    admin = login(client, "reports-admin@example.com", is_superuser=True)
+    buyer = login(client, "reports-buyer@example.com")
+    ids = [
+        client.post("/api/v1/books/", json={"title": title, "author": author, "price": price, "stock_quantity": 50},
+                    headers=admin).json()["id"]
+        for title, author, price in [("A", "Ana", 10.0), ("B", "Ana", 20.0), ("C", "Bia", 100.0)]
+    ]
+
+    buy(client, buyer, [{"book_id": ids[0], "quantity": 3}, {"book_id": ids[1], "quantity": 1}])
+    buy(client, buyer, [{"book_id": ids[0], "quantity": 2}])
+    buy(client, buyer, [{"book_id": ids[2], "quantity": 1}])
+    buy(client, buyer, [{"book_id": ids[2], "quantity": 5}], pay=False)  # pendente não conta
+
+    # Uma query por relatório: só os agregados, nunca o histórico de pedidos
+    with query_budget(1):
+        revenue = client.get("/api/v1/reports/revenue", headers=admin).json()
+        top = client.get("/api/v1/reports/top-books", headers=admin).json()
+        by_revenue = client.get("/api/v1/reports/top-books", params={"by": "revenue"}, headers=admin).json()
+        authors = client.get("/api/v1/reports/authors", headers=admin).json()
+
+    assert revenue == [{"day": datetime.utcnow().date().isoformat(), "orders": 3, "units": 7, "revenue": 170.0}]
+    assert [(row["book_id"], row["orders"], row["units"]) for row in top] == [
+        (ids[0], 2, 5), (ids[1], 1, 1), (ids[2], 1, 1)
+    ]
+    assert by_revenue[0]["book_id"] == ids[2]
+    assert [(row["author"], row["books"], row["units"], row["revenue"]) for row in authors] == [
+        ("Ana", 2, 6, 70.0), ("Bia", 1, 1, 100.0)
+    ]
+
+    # A reconstrução a partir dos pedidos chega aos mesmos agregados
+    incremental = snapshot(session)
+
+    async def run_rebuild():
+        async with AsyncSession(async_engine) as async_session:
+            counts = await rebuild(async_session)
+            await async_session.commit()
+        return counts
+
+    assert asyncio.run(run_rebuild()) == {"days": 1, "books": 3}
+    assert snapshot(session) == incremental
+
+
+def test_reports_admin_only(client: TestClient):
+    buyer = login(client, "reports-user@example.com")
+    assert client.get("/api/v1/reports/revenue", headers=buyer).status_code == 400
+    admin = login(client, "reports-limit@example.com", is_superuser=True)
+    for path in ("/api/v1/reports/revenue", "/api/v1/reports/top-books", "/api/v1/reports/authors"):
+        assert client.get(path, params={"limit": 0}, headers=admin).status_code == 422